@@ -0,0 +1,11 @@
+"""
+Offline benchmark suite for the mangadex wrapper
+
+Everything runs against `FakeMangaDex`, a local stand-in for the API, so the
+numbers only depend on this library and the machine. Run it from the
+repository root::
+
+    python -m benchmarks --compare benchmarks/results/2.7.1.json
+"""
+from .fixtures import Dataset, load_fixture
+from .server import FakeMangaDex
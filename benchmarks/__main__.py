@@ -0,0 +1,60 @@
+"""Command line entry point: ``python -m benchmarks``"""
+import argparse
+import json
+import os
+import sys
+
+from .runner import compare, run_suite, save_results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Offline mangadex benchmarks")
+    parser.add_argument("--iterations", type=int, default=50, help="timed calls per benchmark")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added per response")
+    parser.add_argument("--rate-limit", type=float, default=None, help="server requests per second")
+    parser.add_argument("--only", default=None, help="run benchmarks whose name contains this")
+    parser.add_argument(
+        "--output",
+        default=None,
+        help="results file, defaults to results/<version>.json (not saved with --compare)",
+    )
+    parser.add_argument("--no-save", action="store_true", help="don't write the results")
+    parser.add_argument("--compare", default=None, help="results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown, 0.2 = 20%%")
+    args = parser.parse_args(argv)
+    if (
+        args.compare
+        and args.output
+        and not args.no_save
+        and os.path.exists(args.output)
+        and os.path.samefile(args.compare, args.output)
+    ):
+        parser.error("--output would overwrite the --compare baseline")
+
+    # read the baseline first, the default output may be the same file
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf8") as f:
+            baseline = json.load(f)
+
+    report = run_suite(
+        iterations=args.iterations,
+        latency=args.latency,
+        rate_limit=args.rate_limit,
+        only=args.only,
+    )
+    # a comparison only saves to an explicit --output, not over its own baseline
+    if not args.no_save and (args.output or baseline is None):
+        print(f"results written to {save_results(report, args.output)}")
+
+    if baseline is not None:
+        regressions = compare(report, baseline, args.threshold)
+        for name, before, after, change in regressions:
+            print(f"REGRESSION {name}: {before:.1f} -> {after:.1f} ops/s ({change:+.0%})")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
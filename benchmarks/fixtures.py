@@ -0,0 +1,191 @@
+"""Deterministic MangaDex datasets built from the sample entities in fixtures/"""
+import copy
+import datetime
+import json
+import os
+import random
+import uuid
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+STATUSES = ["ongoing", "completed", "hiatus", "cancelled"]
+CONTENT_RATINGS = ["safe", "suggestive", "erotica", "pornographic"]
+LANGUAGES = ["ja", "ko", "zh", "en"]
+DEMOGRAPHICS = ["shounen", "shoujo", "josei", "seinen", None]
+
+_EPOCH = datetime.datetime(2018, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def load_fixture(name: str) -> dict:
+    """Loads one of the sample entities, e.g. ``load_fixture("manga")``"""
+    with open(os.path.join(FIXTURES_DIR, f"{name}.json"), encoding="utf8") as f:
+        return json.load(f)
+
+
+def _date(hours: float) -> str:
+    return (_EPOCH + datetime.timedelta(hours=hours)).isoformat()
+
+
+class Dataset:
+    """A generated catalog: manga, chapters, covers, authors, groups and users
+
+    Every entity is a deep copy of a sample in fixtures/ with new ids and
+    varied attributes, so decoders see the real response shape. The same
+    arguments always produce the same data.
+    """
+
+    def __init__(
+        self,
+        mangas: int = 100,
+        chapters_per_manga: int = 40,
+        groups: int = 10,
+        authors: int = 20,
+        pages: int = 12,
+        seed: int = 0,
+    ) -> None:
+        self.rng = random.Random(seed)
+        self.templates = {
+            name: load_fixture(name)
+            for name in (
+                "manga", "chapter", "author", "scanlation_group",
+                "cover_art", "user", "custom_list", "api_client",
+            )
+        }
+        self.tags = self.templates["manga"]["attributes"]["tags"]
+        self.pages = pages
+
+        self.mangas = {}
+        self.chapters = {}
+        self.feeds = {}
+        self.covers = {}
+        self.authors = {}
+        self.groups = {}
+        self.users = {}
+        self.custom_lists = {}
+
+        self.user = self.__entity("user")
+        self.user["attributes"]["username"] = "benchmark"
+        self.users[self.user["id"]] = self.user
+
+        for index in range(authors):
+            author = self.__entity("author")
+            author["attributes"]["name"] = f"Author {index}"
+            self.authors[author["id"]] = author
+        for index in range(groups):
+            group = self.__entity("scanlation_group")
+            group["attributes"]["name"] = f"Group {index}"
+            self.groups[group["id"]] = group
+
+        author_ids = list(self.authors)
+        group_ids = list(self.groups)
+        for index in range(mangas):
+            self.__add_manga(index, author_ids, group_ids, chapters_per_manga)
+
+        # the user follows every other manga and keeps one list with the rest
+        self.follows = list(self.mangas)[::2]
+        custom_list = self.__entity("custom_list")
+        custom_list["relationships"] = [
+            {"id": manga_id, "type": "manga"} for manga_id in list(self.mangas)[1::2]
+        ] + [{"id": self.user["id"], "type": "user"}]
+        self.custom_lists[custom_list["id"]] = custom_list
+
+    def new_id(self) -> str:
+        """A deterministic UUID4"""
+        return str(uuid.UUID(int=self.rng.getrandbits(128), version=4))
+
+    def __entity(self, kind: str) -> dict:
+        entity = copy.deepcopy(self.templates[kind])
+        entity["id"] = self.new_id()
+        return entity
+
+    def __add_manga(self, index, author_ids, group_ids, chapters_per_manga) -> None:
+        rng = self.rng
+        manga = self.__entity("manga")
+        attributes = manga["attributes"]
+        created = index * 7.5
+        attributes["title"] = {"en": f"Benchmark Title {index}"}
+        attributes["status"] = STATUSES[index % len(STATUSES)]
+        attributes["contentRating"] = CONTENT_RATINGS[index % len(CONTENT_RATINGS)]
+        attributes["originalLanguage"] = LANGUAGES[index % len(LANGUAGES)]
+        attributes["publicationDemographic"] = DEMOGRAPHICS[index % len(DEMOGRAPHICS)]
+        attributes["year"] = 1990 + index % 35
+        attributes["tags"] = rng.sample(self.tags, rng.randint(1, len(self.tags)))
+        attributes["createdAt"] = _date(created)
+        attributes["updatedAt"] = _date(created + rng.randint(1, 5000))
+
+        author_id = rng.choice(author_ids)
+        cover = self.__entity("cover_art")
+        cover["relationships"][0]["id"] = manga["id"]
+        self.covers[cover["id"]] = cover
+        manga["relationships"] = [
+            {"id": author_id, "type": "author"},
+            {"id": author_id, "type": "artist"},
+            {"id": cover["id"], "type": "cover_art"},
+        ]
+        self.mangas[manga["id"]] = manga
+
+        feed = []
+        for number in range(1, chapters_per_manga + 1):
+            # a second group uploads every third chapter again
+            uploads = [rng.choice(group_ids)]
+            if number % 3 == 0:
+                uploads.append(rng.choice(group_ids))
+            for group_id in uploads:
+                chapter = self.__entity("chapter")
+                published = _date(created + number * 24 + rng.random())
+                chapter["attributes"].update({
+                    "volume": str((number - 1) // 10 + 1),
+                    "chapter": str(number),
+                    "title": f"Chapter {number}",
+                    "translatedLanguage": "en" if number % 4 else "es",
+                    "pages": self.pages,
+                    "publishAt": published,
+                    "readableAt": published,
+                    "createdAt": published,
+                    "updatedAt": published,
+                })
+                chapter["relationships"] = [
+                    {"id": group_id, "type": "scanlation_group"},
+                    {"id": manga["id"], "type": "manga"},
+                    {"id": self.user["id"], "type": "user"},
+                ]
+                self.chapters[chapter["id"]] = chapter
+                feed.append(chapter["id"])
+        self.feeds[manga["id"]] = feed
+
+    def aggregate(self, manga_id: str, languages=None, groups=None) -> dict:
+        """The aggregate response of a manga"""
+        volumes = {}
+        for chapter_id in self.feeds.get(manga_id, []):
+            chapter = self.chapters[chapter_id]
+            attributes = chapter["attributes"]
+            if languages and attributes["translatedLanguage"] not in languages:
+                continue
+            if groups and chapter["relationships"][0]["id"] not in groups:
+                continue
+            volume = volumes.setdefault(
+                attributes["volume"], {"volume": attributes["volume"], "count": 0, "chapters": {}}
+            )
+            volume["count"] += 1
+            entry = volume["chapters"].get(attributes["chapter"])
+            if entry is None:
+                volume["chapters"][attributes["chapter"]] = {
+                    "chapter": attributes["chapter"], "id": chapter_id, "others": [], "count": 1,
+                }
+            else:
+                entry["others"].append(chapter_id)
+                entry["count"] += 1
+        return {"result": "ok", "volumes": volumes}
+
+    def at_home(self, chapter_id: str, base_url: str) -> dict:
+        """The at-home server response of a chapter"""
+        chapter_hash = uuid.UUID(chapter_id).hex
+        return {
+            "result": "ok",
+            "baseUrl": base_url,
+            "chapter": {
+                "hash": chapter_hash,
+                "data": [f"{page}-{chapter_hash}.png" for page in range(1, self.pages + 1)],
+                "dataSaver": [f"{page}-{chapter_hash}.jpg" for page in range(1, self.pages + 1)],
+            },
+        }
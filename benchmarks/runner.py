@@ -0,0 +1,341 @@
+"""Benchmark cases, measurement and result storage"""
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+import mangadex as md
+
+from .fixtures import Dataset
+from .server import FakeMangaDex
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+def percentile(timings: list, pct: float) -> float:
+    """Nearest rank percentile of sorted ``timings``"""
+    index = min(len(timings) - 1, max(0, int(round(pct / 100 * (len(timings) - 1)))))
+    return timings[index]
+
+
+def measure(fn, iterations: int, warmup: int = 3) -> dict:
+    """Times ``fn`` and records the peak memory it allocates
+
+    Returns:
+        dict: ops_per_sec, p50_ms, p99_ms and peak_kib
+    """
+    for _ in range(warmup):
+        fn()
+    timings = []
+    gc.collect()
+    started = time.perf_counter()
+    for _ in range(iterations):
+        call_started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - call_started)
+    elapsed = time.perf_counter() - started
+    timings.sort()
+
+    # allocations are measured on a separate call, tracing slows everything down
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "iterations": iterations,
+        "ops_per_sec": round(iterations / elapsed, 2),
+        "p50_ms": round(percentile(timings, 50) * 1000, 4),
+        "p99_ms": round(percentile(timings, 99) * 1000, 4),
+        "peak_kib": round(peak / 1024, 1),
+    }
+
+
+# statements timed in a fresh interpreter, see `measure_import`
+IMPORT_CASES = {
+    "import.mangadex": "import mangadex",
+    "import.mangadex+ApiError": "import mangadex; mangadex.ApiError",
+    "import.mangadex+Manga": "import mangadex; mangadex.Manga",
+}
+
+_IMPORT_TIMER = """
+import time, tracemalloc
+if {trace}:
+    tracemalloc.start()
+started = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - started
+print(elapsed, tracemalloc.get_traced_memory()[1] if {trace} else 0)
+"""
+
+
+def measure_import(statement: str, iterations: int) -> dict:
+    """Times ``statement`` in new interpreters, so nothing is imported already
+
+    Returns:
+        dict: The same fields as `measure`
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    def run(trace: bool) -> tuple:
+        code = _IMPORT_TIMER.format(trace=trace, statement=statement)
+        out = subprocess.run(
+            [sys.executable, "-c", code], cwd=root, check=True, capture_output=True, text=True
+        ).stdout.split()
+        return float(out[0]), int(out[1])
+
+    timings = sorted(run(False)[0] for _ in range(iterations))
+    _, peak = run(True)
+    return {
+        "iterations": iterations,
+        "ops_per_sec": round(iterations / sum(timings), 2),
+        "p50_ms": round(percentile(timings, 50) * 1000, 4),
+        "p99_ms": round(percentile(timings, 99) * 1000, 4),
+        "peak_kib": round(peak / 1024, 1),
+    }
+
+
+def http_cases(server: FakeMangaDex) -> dict:
+    """Calls that go through the transport to the stand-in server"""
+    dataset = server.dataset
+    manga = md.Manga()
+    chapter = md.Chapter()
+    author = md.Author()
+    group = md.ScanlationGroup()
+    cover = md.Cover()
+    manga_ids = list(dataset.mangas)
+    manga_id = manga_ids[0]
+    chapter_id = dataset.feeds[manga_id][0]
+    session = requests.Session()
+    client = md.MangaDexClient(rate_limit=None)
+
+    def fetch_chapter_images():
+        target = md.Chapter()
+        target.chapter_id = chapter_id
+        for url in target.fetch_chapter_images():
+            session.get(url, timeout=5).content
+
+    return {
+        "ping": md.Api().ping,
+        "get_manga_list": lambda: manga.get_manga_list(limit=100),
+        "get_manga_by_id": lambda: manga.get_manga_by_id(manga_id),
+        "client.get_manga_by_id": lambda: client.manga.get_manga_by_id(manga_id),
+        "manga_feed": lambda: manga.manga_feed(manga_id, limit=500),
+        "get_aggregate": lambda: manga.get_aggregate(manga_id, cache=False),
+        "get_chapter_list": lambda: chapter.get_chapter_list(manga=manga_id, limit=100),
+        "fetch_chapter_images": fetch_chapter_images,
+        "bulk.get_manga_list_ids": lambda: manga.get_manga_list(ids=manga_ids[:100], limit=100),
+        "bulk.list_author": lambda: author.list_author(ids=list(dataset.authors), limit=100),
+        "bulk.list_groups": lambda: group.list_groups(ids=list(dataset.groups), limit=100),
+        "bulk.get_coverart_list": lambda: cover.get_coverart_list(manga=manga_ids[:100], limit=100),
+    }
+
+
+def concurrency_cases(server: FakeMangaDex, concurrency: int = 32) -> dict:
+    """Bursts of ``concurrency`` different list requests through a shared client
+
+    The HTTP/2 case only runs when httpx and h2 are installed. It speaks h2c
+    with prior knowledge to the stand-in server, so the requests are
+    multiplexed over HTTP/2 connections.
+    """
+    pool = ThreadPoolExecutor(max_workers=concurrency)
+    clients = {"http1": md.MangaDexClient(rate_limit=None)}
+    try:
+        import h2  # noqa: F401  the stand-in server needs it to answer in HTTP/2
+
+        transport = md.HTTP2Transport(prior_knowledge=True)
+    except ImportError:
+        pass
+    else:
+        version = transport.session.get(f"{server.url}/ping").http_version
+        if version != "HTTP/2":
+            raise RuntimeError(f"the http2 case is sent in {version}")
+        clients["http2"] = md.MangaDexClient(rate_limit=None, transport=transport)
+
+    def burst(client):
+        def call():
+            list(pool.map(
+                lambda offset: client.manga.get_manga_list(limit=10, offset=offset),
+                range(concurrency),
+            ))
+        return call
+
+    return {f"concurrent[{concurrency}].{name}": burst(client) for name, client in clients.items()}
+
+
+def replay_cases(server: FakeMangaDex) -> dict:
+    """The parsing layer alone: responses come from an in memory cassette"""
+    manga = md.Manga()
+    manga_id = next(iter(server.dataset.mangas))
+    calls = {
+        "replay.get_manga_list": lambda: manga.get_manga_list(limit=100),
+        "replay.manga_feed": lambda: manga.manga_feed(manga_id, limit=500),
+    }
+    cassette = md.Cassette(mode="auto")
+
+    def replayed(fn):
+        def call():
+            with cassette:
+                fn()
+        return call
+
+    for fn in calls.values():
+        replayed(fn)()  # record
+    return {name: replayed(fn) for name, fn in calls.items()}
+
+
+def decode_cases(dataset: Dataset) -> dict:
+    """Every ``*_from_dict`` decoder on the response shapes the server sends"""
+    manga = next(iter(dataset.mangas.values()))
+    manga_id = manga["id"]
+    feed = {"data": [dataset.chapters[chapter_id] for chapter_id in dataset.feeds[manga_id]]}
+    mangas = {"data": list(dataset.mangas.values())[:100]}
+    aggregate = dataset.aggregate(manga_id)
+    profiler = md.DecodeProfiler(sample_rate=0.01)
+    big_feed = json.dumps({
+        "result": "ok",
+        "response": "collection",
+        "data": list(dataset.chapters.values())[:500],
+        "limit": 500,
+        "offset": 0,
+        "total": len(dataset.chapters),
+    }).encode("utf-8")
+
+    def feed_response() -> requests.Response:
+        resp = requests.Response()
+        resp.status_code = 200
+        resp._content = big_feed
+        resp._content_consumed = True
+        return resp
+
+    def decode_full_feed():
+        return md.Chapter.create_chapter_list(json.loads(feed_response().content))
+
+    def decode_streamed_feed():
+        from mangadex.streaming import StreamedPage
+
+        # chapters are dropped as they are consumed, like a caller storing them
+        for _ in StreamedPage(feed_response(), decoder=md.Chapter.chapter_from_dict):
+            pass
+
+    def profiled_manga_list():
+        with profiler:
+            md.Manga.create_manga_list(mangas)
+
+    return {
+        "decode.manga_from_dict": lambda: md.Manga.manga_from_dict(manga),
+        "decode.create_manga_list[100]": lambda: md.Manga.create_manga_list(mangas),
+        "decode.create_manga_list[100].profiled": profiled_manga_list,
+        "decode.feed[500].full": decode_full_feed,
+        "decode.feed[500].streamed": decode_streamed_feed,
+        "decode.chapter_from_dict": lambda: md.Chapter.chapter_from_dict(feed["data"][0]),
+        "decode.create_chapter_list": lambda: md.Chapter.create_chapter_list(feed),
+        "decode.create_tag_list": lambda: md.Tag.create_tag_list(dataset.tags),
+        "decode.author_from_dict": lambda: md.Author.author_from_dict(
+            next(iter(dataset.authors.values()))),
+        "decode.group_from_dict": lambda: md.ScanlationGroup.group_from_dict(
+            next(iter(dataset.groups.values()))),
+        "decode.cover_from_dict": lambda: md.Cover.cover_from_dict(
+            next(iter(dataset.covers.values()))),
+        "decode.user_from_dict": lambda: md.User.user_from_dict(dataset.user),
+        "decode.list_from_dict": lambda: md.CustomList.list_from_dict(
+            next(iter(dataset.custom_lists.values()))),
+        "decode.client_from_dict": lambda: md.ApiClient.client_from_dict(
+            dataset.templates["api_client"]),
+        "decode.aggregate_from_dict": lambda: md.Aggregate.aggregate_from_dict(
+            aggregate, manga_id=manga_id),
+    }
+
+
+def run_suite(
+    iterations: int = 50,
+    latency: float = 0.0,
+    rate_limit=None,
+    only=None,
+    dataset=None,
+    log=print,
+) -> dict:
+    """Runs every benchmark against a fresh stand-in server
+
+    Args:
+        iterations (int): Timed calls per benchmark. Decoders run 20 times more.
+        latency (float): Seconds the server adds to every response.
+        rate_limit (float): Requests per second the server allows.
+        only (str): Only run benchmarks whose name contains this text.
+
+    Returns:
+        dict: The results, as stored by `save_results`
+    """
+    dataset = dataset if dataset is not None else Dataset()
+    results = {}
+    default_url = md.Api.default_url
+    with FakeMangaDex(dataset, latency=latency, rate_limit=rate_limit) as server:
+        md.Api.default_url = server.url
+        try:
+            cases = [(name, fn, iterations) for name, fn in http_cases(server).items()]
+            cases += [(name, fn, iterations) for name, fn in concurrency_cases(server).items()]
+            cases += [(name, fn, iterations) for name, fn in replay_cases(server).items()]
+            cases += [(name, fn, iterations * 20) for name, fn in decode_cases(dataset).items()]
+            for name, fn, count in cases:
+                if only and only not in name:
+                    continue
+                results[name] = measure(fn, count)
+                log(format_result(name, results[name]))
+            for name, statement in IMPORT_CASES.items():
+                if only and only not in name:
+                    continue
+                results[name] = measure_import(statement, min(iterations, 20))
+                log(format_result(name, results[name]))
+        finally:
+            md.Api.default_url = default_url
+
+    return {
+        "version": md.__version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "latency": latency,
+        "results": results,
+    }
+
+
+def format_result(name: str, result: dict) -> str:
+    return (
+        f"{name:36} {result['ops_per_sec']:>12.1f} ops/s"
+        f"  p50 {result['p50_ms']:>9.3f} ms  p99 {result['p99_ms']:>9.3f} ms"
+        f"  peak {result['peak_kib']:>9.1f} KiB"
+    )
+
+
+def save_results(report: dict, path=None) -> str:
+    """Writes a report to ``results/<version>.json`` (or ``path``)"""
+    path = path or os.path.join(RESULTS_DIR, f"{report['version']}.json")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf8") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+        f.write("\n")
+    return path
+
+
+def compare(report: dict, baseline: dict, threshold: float = 0.2) -> list:
+    """Benchmarks that got slower than ``baseline`` by more than ``threshold``
+
+    Returns:
+        list: (name, baseline ops/s, current ops/s, relative change) tuples
+    """
+    regressions = []
+    for name, result in report["results"].items():
+        before = baseline.get("results", {}).get(name)
+        if not before or not before["ops_per_sec"]:
+            continue
+        change = result["ops_per_sec"] / before["ops_per_sec"] - 1
+        if change < -threshold:
+            regressions.append((name, before["ops_per_sec"], result["ops_per_sec"], change))
+    return regressions
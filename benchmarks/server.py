@@ -0,0 +1,583 @@
+"""A local stand-in for api.mangadex.org serving a generated `Dataset`"""
+import gzip
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from .fixtures import Dataset
+
+# MangaDex rejects offset + limit above this value
+MAX_WINDOW = 10000
+# first bytes of an HTTP/2 connection started with prior knowledge (h2c)
+H2_PREFACE = b"PRI * HTTP/2.0"
+
+
+def _first(query: dict, key: str, default=None):
+    values = query.get(key)
+    return values[0] if values else default
+
+
+def _collection(items: list, query: dict, max_limit: int = 100) -> tuple:
+    limit = int(_first(query, "limit", 10))
+    offset = int(_first(query, "offset", 0))
+    if limit > max_limit or offset + limit > MAX_WINDOW:
+        return 400, _error(400, "bad_request_http_exception", "Invalid pagination")
+    return 200, {
+        "result": "ok",
+        "response": "collection",
+        "data": items[offset:offset + limit],
+        "limit": limit,
+        "offset": offset,
+        "total": len(items),
+    }
+
+
+def _entity(item) -> tuple:
+    if item is None:
+        return 404, _error(404, "not_found_http_exception", "Resource not found")
+    return 200, {"result": "ok", "response": "entity", "data": item}
+
+
+def _error(status: int, title: str, detail: str) -> dict:
+    return {
+        "result": "error",
+        "errors": [{"id": "00000000-0000-0000-0000-000000000000", "status": status,
+                    "title": title, "detail": detail}],
+        "status": status,
+        "reason": title,
+    }
+
+
+def _matches(entity: dict, query: dict, filters: dict) -> bool:
+    attributes = entity["attributes"]
+    for key, attribute in filters.items():
+        wanted = query.get(key)
+        if wanted and attributes.get(attribute) not in wanted:
+            return False
+    return True
+
+
+def _ordered(items: list, query: dict) -> list:
+    for key, values in query.items():
+        match = re.fullmatch(r"order\[(\w+)\]", key)
+        if match:
+            items = sorted(
+                items,
+                key=lambda item: item["attributes"].get(match.group(1)) or "",
+                reverse=values[0] == "desc",
+            )
+    return items
+
+
+def _since(items: list, query: dict) -> list:
+    for key, attribute in (
+        ("createdAtSince", "createdAt"),
+        ("updatedAtSince", "updatedAt"),
+        ("publishAtSince", "publishAt"),
+    ):
+        since = _first(query, key)
+        if since:
+            items = [item for item in items if item["attributes"][attribute][:19] >= since]
+    return items
+
+
+class FakeMangaDex:
+    """Threaded HTTP/1.1 server answering a subset of the MangaDex API
+
+    Connections opening with the HTTP/2 preface (h2c with prior knowledge, e.g.
+    ``HTTP2Transport(prior_knowledge=True)``) are served in HTTP/2, one thread
+    per stream; that needs the ``h2`` package.
+
+    Args:
+        dataset (Dataset, optional): The catalog to serve. Defaults to `Dataset()`.
+        latency (float, optional): Seconds added to every response.
+        rate_limit (float, optional): Requests per second allowed before answering
+            429, like the real API. Defaults to no limit.
+        image_size (int, optional): Size in bytes of every served page image.
+        compress (bool, optional): Gzip JSON bodies for clients accepting it.
+    """
+
+    def __init__(
+        self,
+        dataset=None,
+        latency: float = 0.0,
+        rate_limit=None,
+        image_size: int = 64 * 1024,
+        compress: bool = False,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ) -> None:
+        self.dataset = dataset if dataset is not None else Dataset()
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.compress = compress
+        self.image = bytes(range(256)) * (image_size // 256)
+        self.requests = 0
+        self.rate_limited = 0
+        self.log = []
+        self.read_markers = {}
+        self.statuses = {}
+        self.followed_groups = []
+        self.followed_users = []
+        self._tokens = float(rate_limit or 0)
+        self._refilled = time.monotonic()
+        self._lock = threading.Lock()
+        self._routes = [
+            ("GET", r"/ping", self._ping),
+            ("GET", r"/manga", self._manga_list),
+            ("GET", r"/manga/random", self._manga_random),
+            ("GET", r"/manga/tag", self._tags),
+            ("GET", r"/manga/status", self._statuses),
+            ("GET", r"/manga/read", self._grouped_read_markers),
+            ("GET", r"/manga/(?P<manga_id>[\w-]+)", self._manga),
+            ("GET", r"/manga/(?P<manga_id>[\w-]+)/feed", self._manga_feed),
+            ("GET", r"/manga/(?P<manga_id>[\w-]+)/aggregate", self._aggregate),
+            ("GET", r"/manga/(?P<manga_id>[\w-]+)/read", self._read_markers),
+            ("POST", r"/manga/(?P<manga_id>[\w-]+)/read", self._mark_read),
+            ("GET", r"/manga/(?P<manga_id>[\w-]+)/status", self._status),
+            ("POST", r"/manga/(?P<entity_id>[\w-]+)/follow", self._follow("manga", True)),
+            ("DELETE", r"/manga/(?P<entity_id>[\w-]+)/follow", self._follow("manga", False)),
+            ("POST", r"/manga/(?P<manga_id>[\w-]+)/status", self._update_status),
+            ("GET", r"/chapter/?", self._chapter_list),
+            ("GET", r"/chapter/(?P<chapter_id>[\w-]+)", self._chapter),
+            ("GET", r"/at-home/server/(?P<chapter_id>[\w-]+)", self._at_home),
+            ("GET", r"/data(?:-saver)?/(?P<hash>\w+)/(?P<file>[\w.-]+)", self._image),
+            ("GET", r"/author/?", self._author_list),
+            ("GET", r"/author/(?P<author_id>[\w-]+)", self._author),
+            ("GET", r"/group", self._group_list),
+            ("GET", r"/group/(?P<group_id>[\w-]+)", self._group),
+            ("POST", r"/group/(?P<entity_id>[\w-]+)/follow", self._follow("group", True)),
+            ("DELETE", r"/group/(?P<entity_id>[\w-]+)/follow", self._follow("group", False)),
+            ("GET", r"/cover", self._cover_list),
+            ("GET", r"/cover/(?P<cover_id>[\w-]+)", self._cover),
+            ("GET", r"/user/me", self._me),
+            ("GET", r"/user/follows/manga", self._follows),
+            ("GET", r"/user/follows/manga/feed", self._follows_feed),
+            ("GET", r"/user/follows/group", self._followed_groups),
+            ("GET", r"/user/follows/user", self._followed_users),
+            ("GET", r"/user/list", self._my_custom_lists),
+            ("GET", r"/user/(?P<user_id>[\w-]+)", self._user),
+            ("POST", r"/user/(?P<entity_id>[\w-]+)/follow", self._follow("user", True)),
+            ("DELETE", r"/user/(?P<entity_id>[\w-]+)/follow", self._follow("user", False)),
+            ("GET", r"/list/(?P<list_id>[\w-]+)", self._custom_list),
+            ("POST", r"/manga/(?P<manga_id>[\w-]+)/list/(?P<list_id>[\w-]+)", self._list_member(True)),
+            ("DELETE", r"/manga/(?P<manga_id>[\w-]+)/list/(?P<list_id>[\w-]+)", self._list_member(False)),
+        ]
+        self._server = ThreadingHTTPServer((host, port), self.__handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        """Base URL of the server"""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeMangaDex":
+        """Serves requests from a background thread"""
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stops the server"""
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "FakeMangaDex":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def route(self, method: str, pattern: str, handler) -> None:
+        """Adds (or overrides) a route. ``handler(query, body, **groups)`` returns (status, payload)"""
+        self._routes.insert(0, (method, pattern, handler))
+
+    def __allow(self) -> bool:
+        if not self.rate_limit:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                float(self.rate_limit), self._tokens + (now - self._refilled) * self.rate_limit
+            )
+            self._refilled = now
+            if self._tokens < 1:
+                self.rate_limited += 1
+                return False
+            self._tokens -= 1
+            return True
+
+    def dispatch(self, method: str, path: str, query: dict, body: bytes) -> tuple:
+        """Resolves a request to (status, payload, headers)"""
+        with self._lock:
+            self.requests += 1
+            self.log.append((method, path))
+        headers = {}
+        if self.rate_limit:
+            headers["X-RateLimit-Limit"] = str(int(self.rate_limit))
+        if not self.__allow():
+            retry = int(time.time()) + 1
+            headers.update({"X-RateLimit-Retry-After": str(retry), "Retry-After": "1"})
+            return 429, _error(429, "too_many_requests_http_exception", "Rate limited"), headers
+        for route_method, pattern, handler in self._routes:
+            match = re.fullmatch(pattern, path)
+            if route_method == method and match:
+                status, payload = handler(query, body, **match.groupdict())
+                return status, payload, headers
+        return 404, _error(404, "not_found_http_exception", f"No route for {path}"), headers
+
+    def __handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # headers and body are written separately, without this keep-alive
+            # connections stall on delayed ACKs
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def handle(self):
+                if self.rfile.peek(len(H2_PREFACE)).startswith(H2_PREFACE):
+                    server._serve_h2(self.connection, self.rfile)
+                else:
+                    super().handle()
+
+            def __respond(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                status, headers, content = server.respond(
+                    self.command, self.path, self.headers.get("Accept-Encoding", ""), body
+                )
+                self.send_response(status)
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(content)
+
+            do_GET = do_POST = do_PUT = do_DELETE = __respond
+
+        return Handler
+
+    def respond(self, method: str, target: str, accept_encoding: str, body: bytes) -> tuple:
+        """Answers a request for any HTTP version with (status, headers, content)"""
+        if self.latency:
+            time.sleep(self.latency)
+        parts = urlsplit(target)
+        status, payload, headers = self.dispatch(
+            method, parts.path.rstrip("/") or "/", parse_qs(parts.query), body
+        )
+        if isinstance(payload, bytes):
+            content, content_type = payload, "image/png"
+        elif isinstance(payload, str):
+            content, content_type = payload.encode(), "text/plain"
+        else:
+            content, content_type = json.dumps(payload).encode(), "application/json"
+        if self.compress and content_type == "application/json" and "gzip" in accept_encoding:
+            content = gzip.compress(content, compresslevel=5)
+            headers = dict(headers, **{"Content-Encoding": "gzip"})
+        headers = dict(
+            {"Content-Type": content_type, "Content-Length": str(len(content))}, **headers
+        )
+        return status, headers, content
+
+    def _serve_h2(self, sock, rfile) -> None:
+        import h2.config
+        import h2.connection
+        import h2.events
+        import h2.exceptions
+
+        conn = h2.connection.H2Connection(
+            h2.config.H2Configuration(client_side=False, header_encoding="utf-8")
+        )
+        # guards ``conn`` and the socket, streams answer from their own threads
+        ready = threading.Condition()
+        requests = {}
+
+        def send(stream_id: int, headers: dict, content: bytes) -> None:
+            try:
+                with ready:
+                    conn.send_headers(stream_id, headers, end_stream=not content)
+                    sock.sendall(conn.data_to_send())
+                while content:
+                    with ready:
+                        window = min(
+                            conn.local_flow_control_window(stream_id), conn.max_outbound_frame_size
+                        )
+                        if window <= 0:
+                            ready.wait()
+                            continue
+                        chunk, content = content[:window], content[window:]
+                        conn.send_data(stream_id, chunk, end_stream=not content)
+                        sock.sendall(conn.data_to_send())
+            except (h2.exceptions.StreamClosedError, OSError):
+                pass
+
+        def answer(stream_id: int, headers: dict, body: bytes) -> None:
+            status, response_headers, content = self.respond(
+                headers[":method"], headers[":path"], headers.get("accept-encoding", ""), body
+            )
+            response_headers = [(":status", str(status))] + [
+                (key.lower(), value) for key, value in response_headers.items()
+            ]
+            send(stream_id, response_headers, content)
+
+        with ready:
+            conn.initiate_connection()
+            sock.sendall(conn.data_to_send())
+        while True:
+            data = rfile.read1(65535)
+            if not data:
+                return
+            with ready:
+                events = conn.receive_data(data)
+                sock.sendall(conn.data_to_send())
+                ready.notify_all()
+            for event in events:
+                if isinstance(event, h2.events.RequestReceived):
+                    requests[event.stream_id] = (dict(event.headers), bytearray())
+                elif isinstance(event, h2.events.DataReceived):
+                    requests[event.stream_id][1].extend(event.data)
+                    with ready:
+                        conn.acknowledge_received_data(
+                            event.flow_controlled_length, event.stream_id
+                        )
+                        sock.sendall(conn.data_to_send())
+                elif isinstance(event, h2.events.StreamEnded):
+                    headers, body = requests.pop(event.stream_id)
+                    threading.Thread(
+                        target=answer, args=(event.stream_id, headers, bytes(body)), daemon=True
+                    ).start()
+                elif isinstance(event, h2.events.StreamReset):
+                    requests.pop(event.stream_id, None)
+                elif isinstance(event, h2.events.ConnectionTerminated):
+                    return
+
+    # Routes
+
+    def _ping(self, query, body):
+        return 200, "pong"
+
+    def _manga_list(self, query, body):
+        items = list(self.dataset.mangas.values())
+        ids = query.get("ids[]")
+        if ids:
+            items = [self.dataset.mangas[manga_id] for manga_id in ids if manga_id in self.dataset.mangas]
+        items = [
+            item for item in items
+            if _matches(item, query, {
+                "status[]": "status",
+                "contentRating[]": "contentRating",
+                "originalLanguage[]": "originalLanguage",
+                "publicationDemographic[]": "publicationDemographic",
+            })
+        ]
+        year = _first(query, "year")
+        if year:
+            items = [item for item in items if str(item["attributes"]["year"]) == year]
+        title = _first(query, "title")
+        if title:
+            items = [
+                item for item in items
+                if title.lower() in item["attributes"]["title"]["en"].lower()
+            ]
+        included = set(query.get("includedTags[]", []))
+        if included:
+            items = [
+                item for item in items
+                if included <= {tag["id"] for tag in item["attributes"]["tags"]}
+            ]
+        return _collection(_ordered(_since(items, query), query), query)
+
+    def _manga_random(self, query, body):
+        mangas = list(self.dataset.mangas.values())
+        return _entity(mangas[self.requests % len(mangas)])
+
+    def _tags(self, query, body):
+        tags = self.dataset.tags
+        return 200, {"result": "ok", "response": "collection", "data": tags,
+                     "limit": len(tags), "offset": 0, "total": len(tags)}
+
+    def _manga(self, query, body, manga_id):
+        return _entity(self.dataset.mangas.get(manga_id))
+
+    def __chapters(self, chapter_ids, query):
+        items = [self.dataset.chapters[chapter_id] for chapter_id in chapter_ids]
+        items = [item for item in items if _matches(item, query, {
+            "translatedLanguage[]": "translatedLanguage",
+            "volume[]": "volume",
+        })]
+        groups = set(query.get("groups[]", []))
+        if groups:
+            items = [item for item in items if item["relationships"][0]["id"] in groups]
+        return _ordered(_since(items, query), query)
+
+    def _manga_feed(self, query, body, manga_id):
+        if manga_id not in self.dataset.mangas:
+            return _entity(None)
+        return _collection(self.__chapters(self.dataset.feeds[manga_id], query), query, 500)
+
+    def _aggregate(self, query, body, manga_id):
+        return 200, self.dataset.aggregate(
+            manga_id, query.get("translatedLanguage[]"), query.get("groups[]")
+        )
+
+    def _read_markers(self, query, body, manga_id):
+        return 200, {"result": "ok", "data": sorted(self.read_markers.get(manga_id, ()))}
+
+    def _grouped_read_markers(self, query, body):
+        data = {
+            manga_id: sorted(self.read_markers[manga_id])
+            for manga_id in query.get("ids[]", [])
+            if self.read_markers.get(manga_id)
+        }
+        return 200, {"result": "ok", "data": data or []}
+
+    def _mark_read(self, query, body, manga_id):
+        if manga_id not in self.dataset.mangas:
+            return _entity(None)
+        payload = json.loads(body)
+        with self._lock:
+            markers = self.read_markers.setdefault(manga_id, set())
+            markers.update(payload.get("chapterIdsRead", []))
+            markers.difference_update(payload.get("chapterIdsUnread", []))
+        return 200, {"result": "ok"}
+
+    def _statuses(self, query, body):
+        return 200, {"result": "ok", "statuses": dict(self.statuses)}
+
+    def _status(self, query, body, manga_id):
+        if manga_id not in self.dataset.mangas:
+            return _entity(None)
+        return 200, {"result": "ok", "status": self.statuses.get(manga_id)}
+
+    def _update_status(self, query, body, manga_id):
+        if manga_id not in self.dataset.mangas:
+            return _entity(None)
+        status = json.loads(body).get("status")
+        with self._lock:
+            if status is None:
+                self.statuses.pop(manga_id, None)
+            else:
+                self.statuses[manga_id] = status
+        return 200, {"result": "ok"}
+
+    def _chapter_list(self, query, body):
+        ids = query.get("ids[]")
+        if ids:
+            chapter_ids = [chapter_id for chapter_id in ids if chapter_id in self.dataset.chapters]
+        elif _first(query, "manga"):
+            chapter_ids = self.dataset.feeds.get(_first(query, "manga"), [])
+        else:
+            chapter_ids = list(self.dataset.chapters)
+        return _collection(self.__chapters(chapter_ids, query), query)
+
+    def _chapter(self, query, body, chapter_id):
+        return _entity(self.dataset.chapters.get(chapter_id))
+
+    def _at_home(self, query, body, chapter_id):
+        if chapter_id not in self.dataset.chapters:
+            return _entity(None)
+        return 200, self.dataset.at_home(chapter_id, self.url)
+
+    def _image(self, query, body, hash, file):
+        return 200, self.image
+
+    def __by_ids(self, entities, query):
+        ids = query.get("ids[]")
+        items = list(entities.values())
+        if ids:
+            items = [entities[item_id] for item_id in ids if item_id in entities]
+        return _collection(items, query)
+
+    def _author_list(self, query, body):
+        return self.__by_ids(self.dataset.authors, query)
+
+    def _author(self, query, body, author_id):
+        return _entity(self.dataset.authors.get(author_id))
+
+    def _group_list(self, query, body):
+        return self.__by_ids(self.dataset.groups, query)
+
+    def _group(self, query, body, group_id):
+        return _entity(self.dataset.groups.get(group_id))
+
+    def _cover_list(self, query, body):
+        items = list(self.dataset.covers.values())
+        mangas = set(query.get("manga[]", []))
+        if mangas:
+            items = [item for item in items if item["relationships"][0]["id"] in mangas]
+        ids = set(query.get("ids[]", []))
+        if ids:
+            items = [item for item in items if item["id"] in ids]
+        return _collection(items, query)
+
+    def _cover(self, query, body, cover_id):
+        return _entity(self.dataset.covers.get(cover_id))
+
+    def _me(self, query, body):
+        return _entity(self.dataset.user)
+
+    def _user(self, query, body, user_id):
+        return _entity(self.dataset.users.get(user_id))
+
+    def _follows(self, query, body):
+        return _collection([self.dataset.mangas[manga_id] for manga_id in self.dataset.follows], query)
+
+    def _followed_groups(self, query, body):
+        return _collection([self.dataset.groups[group_id] for group_id in self.followed_groups], query)
+
+    def _followed_users(self, query, body):
+        return _collection([self.dataset.users[user_id] for user_id in self.followed_users], query)
+
+    def _follow(self, kind: str, follow: bool):
+        def handler(query, body, entity_id):
+            entities, followed = {
+                "manga": (self.dataset.mangas, self.dataset.follows),
+                "group": (self.dataset.groups, self.followed_groups),
+                "user": (self.dataset.users, self.followed_users),
+            }[kind]
+            if entity_id not in entities:
+                return _entity(None)
+            with self._lock:
+                if follow and entity_id not in followed:
+                    followed.append(entity_id)
+                elif not follow and entity_id in followed:
+                    followed.remove(entity_id)
+            return 200, {"result": "ok"}
+
+        return handler
+
+    def _follows_feed(self, query, body):
+        chapter_ids = [
+            chapter_id for manga_id in self.dataset.follows for chapter_id in self.dataset.feeds[manga_id]
+        ]
+        return _collection(self.__chapters(chapter_ids, query), query, 500)
+
+    def _my_custom_lists(self, query, body):
+        return _collection(list(self.dataset.custom_lists.values()), query)
+
+    def _custom_list(self, query, body, list_id):
+        return _entity(self.dataset.custom_lists.get(list_id))
+
+    def _list_member(self, add: bool):
+        def handler(query, body, manga_id, list_id):
+            custom_list = self.dataset.custom_lists.get(list_id)
+            if custom_list is None or manga_id not in self.dataset.mangas:
+                return _entity(None)
+            member = {"id": manga_id, "type": "manga"}
+            with self._lock:
+                relationships = custom_list["relationships"]
+                if add and member not in relationships:
+                    relationships.append(member)
+                elif not add and member in relationships:
+                    relationships.remove(member)
+            return 200, {"result": "ok"}
+
+        return handler
@@ -1,13 +1,140 @@
 """
 Python module for interacting with the mangadex API
 """
-from .auth import Api, ApiClient, Auth
-from .errors import ApiError
-from .people import Author, Follows, ScanlationGroup, User
-from .series import Chapter, Cover, CustomList, Manga, MangaList, Tag
-from .url_models import URLRequest
+from typing import TYPE_CHECKING
 
 __author__ = "Eduardo Ceja"
 __version__ = "2.7.1"
 __license__ = "MIT"
 __copyright__ = "Copyright (c) 2021 Eduardo Ceja"
+
+# Public names and the submodule defining them. They are imported on first
+# access (PEP 562), so ``import mangadex`` doesn't load requests or dateutil.
+_LAZY = {
+    "Api": "auth",
+    "ApiClient": "auth",
+    "Auth": "auth",
+    "Batch": "batch",
+    "BatchResult": "batch",
+    "Broker": "broker",
+    "BrokerAuth": "broker",
+    "BrokerRateLimiter": "broker",
+    "Cassette": "cassette",
+    "MangaDexClient": "client",
+    "Crawler": "crawler",
+    "Partition": "crawler",
+    "SQLiteWorkQueue": "crawler",
+    "WorkQueue": "crawler",
+    "partition_catalog": "crawler",
+    "ApiError": "errors",
+    "BrokerError": "errors",
+    "CassetteError": "errors",
+    "DecodeProfiler": "metrics",
+    "Metrics": "metrics",
+    "OpenTelemetryHook": "metrics",
+    "RequestEvent": "metrics",
+    "Author": "people",
+    "Follows": "people",
+    "ScanlationGroup": "people",
+    "User": "people",
+    "QueryPlanner": "planner",
+    "QuerySchema": "query",
+    "ReleaseSelector": "releases",
+    "select_releases": "releases",
+    "TitleIndex": "search",
+    "Aggregate": "series",
+    "AggregateChapter": "series",
+    "Chapter": "series",
+    "Cover": "series",
+    "CustomList": "series",
+    "Manga": "series",
+    "MangaList": "series",
+    "Tag": "series",
+    "UserStateCache": "state",
+    "SQLiteStore": "storage",
+    "StreamedPage": "streaming",
+    "SyncReport": "sync",
+    "sync_customlist": "sync",
+    "sync_follows": "sync",
+    "sync_read_markers": "sync",
+    "sync_reading_statuses": "sync",
+    "MultiTenantClient": "tenants",
+    "FairRateLimiter": "transport",
+    "HTTP2Transport": "transport",
+    "RateLimiter": "transport",
+    "SingleFlight": "transport",
+    "TenantRateLimiter": "transport",
+    "Transport": "transport",
+    "URLRequest": "url_models",
+    "FeedWatcher": "watcher",
+}
+
+__all__ = sorted(_LAZY)
+
+
+_SUBMODULES = set(_LAZY.values())
+
+
+def __getattr__(name: str):
+    from importlib import import_module
+
+    if name in _SUBMODULES:
+        # ``mangadex.series`` etc. keep working without importing them first
+        return import_module(f".{name}", __name__)
+    module = _LAZY.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY) | _SUBMODULES)
+
+
+if TYPE_CHECKING:
+    from .auth import Api, ApiClient, Auth
+    from .batch import Batch, BatchResult
+    from .broker import Broker, BrokerAuth, BrokerRateLimiter
+    from .cassette import Cassette
+    from .client import MangaDexClient
+    from .crawler import Crawler, Partition, SQLiteWorkQueue, WorkQueue, partition_catalog
+    from .errors import ApiError, BrokerError, CassetteError
+    from .metrics import DecodeProfiler, Metrics, OpenTelemetryHook, RequestEvent
+    from .people import Author, Follows, ScanlationGroup, User
+    from .planner import QueryPlanner
+    from .query import QuerySchema
+    from .releases import ReleaseSelector, select_releases
+    from .search import TitleIndex
+    from .series import (
+        Aggregate,
+        AggregateChapter,
+        Chapter,
+        Cover,
+        CustomList,
+        Manga,
+        MangaList,
+        Tag,
+    )
+    from .state import UserStateCache
+    from .storage import SQLiteStore
+    from .streaming import StreamedPage
+    from .sync import (
+        SyncReport,
+        sync_customlist,
+        sync_follows,
+        sync_read_markers,
+        sync_reading_statuses,
+    )
+    from .tenants import MultiTenantClient
+    from .transport import (
+        FairRateLimiter,
+        HTTP2Transport,
+        RateLimiter,
+        SingleFlight,
+        TenantRateLimiter,
+        Transport,
+    )
+    from .url_models import URLRequest
+    from .watcher import FeedWatcher
@@ -1,19 +1,62 @@
 """Module providing authentication and checking for infrastructure"""
 from __future__ import absolute_import
 
+import time
 from typing import Optional
 
-from typing_extensions import Dict, List, Self, Union
+from typing_extensions import List, Self, Union
 
 from mangadex.errors import ApiError
+from mangadex.metrics import profiled
+from mangadex.query import CLIENT_LIST
 from mangadex.url_models import URLRequest
 
 
 class Api:
     """Class that checks for Infrastructure"""
-    def __init__(self):
-        self.url = "https://api.mangadex.org"
-        self.timeout = 5
+
+    # Class wide defaults, e.g. point every new instance to a mirror or test server
+    default_url = "https://api.mangadex.org"
+    default_timeout = 5
+
+    _shared = None
+
+    def __init__(
+        self, url: Optional[str] = None, timeout: Optional[float] = None, transport=None
+    ):
+        """Api
+
+        Args:
+            url (str, optional): API url. Follows `Api.default_url` when not given.
+            timeout (float, optional): Follows `Api.default_timeout` when not given.
+            transport (Transport, optional): Shared transport of a `MangaDexClient`.
+        """
+        self._url = url
+        self._timeout = timeout
+        self.transport = transport
+
+    @property
+    def url(self) -> str:
+        return self._url if self._url is not None else Api.default_url
+
+    @url.setter
+    def url(self, value: Optional[str]) -> None:
+        self._url = value
+
+    @property
+    def timeout(self) -> float:
+        return self._timeout if self._timeout is not None else Api.default_timeout
+
+    @timeout.setter
+    def timeout(self, value: Optional[float]) -> None:
+        self._timeout = value
+
+    @classmethod
+    def shared(cls) -> "Api":
+        """The `Api` used by objects created without a client, e.g. parsed entities"""
+        if cls._shared is None:
+            cls._shared = cls()
+        return cls._shared
 
     def ping(self) -> Optional[str]:
         """ Ping healthchech
@@ -25,7 +68,9 @@ class Api:
             Optional[str]: Returns string when the Infrastructure is ok
         """
         url = f"{self.url}/ping"
-        pong = URLRequest.request_url(url, "GET", timeout=self.timeout)
+        pong = URLRequest.request_url(
+            url, "GET", timeout=self.timeout, transport=self.transport
+        )
         if pong != "pong":
             raise ApiError(
                 {"status": "503", "reason": "Infrastructure Unavailable"},
@@ -37,12 +82,22 @@ class Api:
 
 class Auth:
     """Class that provides Authentication"""
-    def __init__(self):
-        """Authentication class"""
-        self.auth_url = "https://auth.mangadex.org"
+
+    default_auth_url = "https://auth.mangadex.org"
+
+    def __init__(self, transport=None):
+        """Authentication class
+
+        Args:
+            transport (Transport, optional): Shared transport of a `MangaDexClient`.
+        """
+        self.auth_url = Auth.default_auth_url
         self.timeout = 5  # Default timeout
+        self.transport = transport
         self.bearer = None
         self.refresh_token = None
+        # time.time() when the bearer token expires, None if unknown
+        self.expires_at = None
         self.client_id = None
         self.client_secret = None
 
@@ -66,7 +121,12 @@ class Auth:
         """Handles OAuth2 Requests to log in"""
         url = f"{self.auth_url}/realms/mangadex/protocol/openid-connect/token"
         auth_response = URLRequest.request_url(
-            url, "POST", params=http_form, timeout=self.timeout, headers=headers
+            url,
+            "POST",
+            params=http_form,
+            timeout=self.timeout,
+            transport=self.transport,
+            headers=headers,
         )
 
         self.client_id = http_form["client_id"]
@@ -75,6 +135,8 @@ class Auth:
         refresh_token = auth_response["refresh_token"]
         self.set_bearer_token({"Authorization": f"Bearer {access_token}"})
         self.refresh_token = refresh_token
+        expires_in = auth_response.get("expires_in")
+        self.expires_at = time.time() + float(expires_in) if expires_in else None
 
     def login(
         self, username: str, password: str, client_id: str, client_secret: str
@@ -115,10 +177,11 @@ class Auth:
 
 class ApiClient(Auth):
     """ Class that checks for user's API Clients"""
-    def __init__(self, auth: Union[Auth, None]):
+    def __init__(self, auth: Union[Auth, None] = None, client=None):
         super().__init__()
-        self.api = Api()
-        self.auth = auth
+        self.api = client.api if client is not None else Api.shared()
+        self.client = client
+        self.auth = auth if auth is not None or client is None else client.auth
 
         self.name = ""
         self.description = ""
@@ -131,11 +194,14 @@ class ApiClient(Auth):
         self.relations = []
 
     @classmethod
-    def client_from_dict(cls, data: dict) -> "ApiClient":
+    @profiled("ApiClient.client_from_dict")
+    def client_from_dict(cls, data: dict, client=None) -> "ApiClient":
         """Get client from json
 
         Args:
             data (dict): Raw JSON data
+            client (optional): Client whose api and auth the ApiClient uses,
+                `Api.shared()` by default
 
         Raises:
             ValueError: Raised when the data provided is not a Client JSON
@@ -151,7 +217,7 @@ class ApiClient(Auth):
         if data["type"] != "api_client" or not data:
             raise ValueError("The data provided is not a api_client")
 
-        client = cls(auth=None)
+        client = cls(auth=None, client=client)
 
         attributes = data["attributes"]
 
@@ -185,26 +251,23 @@ class ApiClient(Auth):
         return f"{part1}{part2}"
 
     @staticmethod
-    def __parse_client_params(params: Dict[str, str]) -> Dict[str, str]:
-        if "includes" in params:
-            params["includes[]"] = params.pop("includes")
-        return params
-
-    @staticmethod
-    def create_client_list(resp: dict) -> List["ApiClient"]:
+    @profiled("ApiClient.create_client_list")
+    def create_client_list(resp: dict, client=None) -> List["ApiClient"]:
         """Creates info list from list of API Clients
 
         Args:
             resp (dict): Raw response
+            client (optional): Client whose api and auth the ApiClients use,
+                `Api.shared()` by default
 
         Returns:
             List["ApiClient"]: List of API Client infos
         """
         resp = resp["data"]
-        client = []
+        clients = []
         for elem in resp:
-            client.append(ApiClient.client_from_dict(elem))
-        return client
+            clients.append(ApiClient.client_from_dict(elem, client))
+        return clients
 
     def get_api_clients(self, **kwargs) -> List["ApiClient"]:
         """List user's ApiClient
@@ -216,16 +279,17 @@ class ApiClient(Auth):
         Returns:
             ApiClient:
         """
-        params = self.__parse_client_params(kwargs)
+        params = CLIENT_LIST.normalize(kwargs)
         url = f"{self.api.url}/client"
         resp = URLRequest.request_url(
             url,
             "GET",
             headers=self.auth.get_bearer_token(),
             timeout=self.api.timeout,
+            transport=self.api.transport,
             params=params,
         )
-        return ApiClient.create_client_list(resp)
+        return ApiClient.create_client_list(resp, self.client)
 
     def get_api_client_by_id(self, client_id: str) -> "ApiClient":
         """Gets the info of API Client from ID
@@ -238,9 +302,13 @@ class ApiClient(Auth):
         """
         url = f"{self.api.url}/client/{client_id}"
         resp = URLRequest.request_url(
-            url, "GET", headers=self.auth.get_bearer_token(), timeout=self.timeout
+            url,
+            "GET",
+            headers=self.auth.get_bearer_token(),
+            timeout=self.timeout,
+            transport=self.api.transport,
         )
-        return ApiClient.client_from_dict(resp)
+        return ApiClient.client_from_dict(resp, self.client)
 
     def create_api_client(
         self, name: str, description: str, obj_return: bool = True
@@ -261,10 +329,11 @@ class ApiClient(Auth):
             url,
             "POST",
             timeout=self.api.timeout,
+            transport=self.api.transport,
             headers=self.auth.get_bearer_token(),
             params=params,
         )
-        return ApiClient.client_from_dict(resp) if obj_return else None
+        return ApiClient.client_from_dict(resp, self.client) if obj_return else None
 
     def edit_api_client(
         self, client_id: str,
@@ -283,8 +352,9 @@ class ApiClient(Auth):
             params=params,
             headers=self.auth.get_bearer_token(),
             timeout=self.api.timeout,
+            transport=self.api.transport,
         )
-        return ApiClient.client_from_dict(resp) if obj_return else None
+        return ApiClient.client_from_dict(resp, self.client) if obj_return else None
 
     def delete_api_client(self, client_id: str):
         """Deletes the API Client
@@ -301,6 +371,7 @@ class ApiClient(Auth):
             "DELETE",
             headers=self.auth.get_bearer_token(),
             timeout=self.api.timeout,
+            transport=self.api.transport,
         )
         if resp["result"] != "ok":
             raise ApiError(resp["errors"][0]["detail"])
@@ -319,11 +390,15 @@ class ApiClient(Auth):
         """
         url = f"{self.api.url}/client/{client_id}/secret"
         resp = URLRequest.request_url(
-            url, "GET", headers=self.auth.get_bearer_token(), timeout=self.timeout
+            url,
+            "GET",
+            headers=self.auth.get_bearer_token(),
+            timeout=self.timeout,
+            transport=self.api.transport,
         )
         if resp["result"] != "ok":
             raise ApiError(resp["errors"][0]["detail"])
-        return ApiClient.client_from_dict(resp)
+        return ApiClient.client_from_dict(resp, self.client)
 
     def regen_api_secret(self, client_id: str) -> "ApiClient":
         """Regenerates API Client Secret
@@ -339,11 +414,15 @@ class ApiClient(Auth):
         """
         url = f"{self.api.url}/client/{client_id}/secret"
         resp = URLRequest.request_url(
-            url, "POST", headers=self.auth.get_bearer_token(), timeout=self.timeout
+            url,
+            "POST",
+            headers=self.auth.get_bearer_token(),
+            timeout=self.timeout,
+            transport=self.api.transport,
         )
         if resp["result"] != "ok":
             raise ApiError(resp["errors"][0]["detail"])
-        return ApiClient.client_from_dict(resp)
+        return ApiClient.client_from_dict(resp, self.client)
 
 
 if __name__ == "__main__":
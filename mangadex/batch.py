@@ -0,0 +1,227 @@
+"""Module running many blocking calls at once on a thread pool"""
+from __future__ import absolute_import
+
+import collections
+import concurrent.futures
+import threading
+import time
+
+from typing_extensions import Any, Callable, Iterable, List, Optional
+
+
+class BatchResult:
+    """Outcome of one call of a `Batch`: its ``value`` or the ``error`` it raised
+
+    Calls cancelled before they started have a ``concurrent.futures.CancelledError``
+    and the ones not done at the deadline a ``concurrent.futures.TimeoutError``.
+    """
+
+    __slots__ = ("item", "value", "error")
+
+    def __init__(self, item: Any, value: Any = None, error: Optional[BaseException] = None):
+        self.item = item
+        self.value = value
+        self.error = error
+
+    def __repr__(self) -> str:
+        if self.error is not None:
+            return f"BatchResult(item = {self.item!r}, error = {self.error!r})"
+        return f"BatchResult(item = {self.item!r}, value = {self.value!r})"
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def get(self) -> Any:
+        """The value, or raises the error of the call"""
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+
+class Batch:
+    """Calls submitted together on a shared thread pool
+
+    Results come back in submission order, a failing call only fails its own
+    `BatchResult`. ``timeout`` is a deadline for the whole batch, counted from
+    its creation. Leaving the ``with`` block on an exception cancels the calls
+    that have not started.
+
+    Usage::
+
+        with client.batch(timeout=30) as batch:
+            for manga_id in manga_ids:
+                batch.submit(client.manga.get_manga_by_id, manga_id)
+        mangas = [result.value for result in batch.results() if result.ok]
+    """
+
+    def __init__(
+        self, executor: concurrent.futures.Executor, timeout: Optional[float] = None
+    ) -> None:
+        """Batch
+
+        Args:
+            executor (concurrent.futures.Executor): Pool running the calls.
+            timeout (float, optional): Seconds the whole batch may take. No limit by default.
+        """
+        self._executor = executor
+        self._deadline = None if timeout is None else time.monotonic() + timeout
+        self._items: List[Any] = []
+        self._futures: List[concurrent.futures.Future] = []
+        self._cancelled = threading.Event()
+
+    def __repr__(self) -> str:
+        done = sum(future.done() for future in self._futures)
+        return f"Batch(calls = {len(self._futures)}, done = {done})"
+
+    def __len__(self) -> int:
+        return len(self._futures)
+
+    def __enter__(self) -> "Batch":
+        return self
+
+    def __exit__(self, exc_type, *exc_info) -> None:
+        if exc_type is not None:
+            self.cancel()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def submit(self, fn: Callable[..., Any], *args, item: Any = None, **kwargs) -> int:
+        """Schedules ``fn(*args, **kwargs)``
+
+        Args:
+            item (Any, optional): What the call is for, kept in its `BatchResult`.
+                The first argument by default.
+
+        Returns:
+            int: Index of the call's result
+        """
+        if self.cancelled:
+            raise RuntimeError("The batch was cancelled")
+        self._items.append(item if item is not None or not args else args[0])
+        self._futures.append(self._executor.submit(self.__call, fn, args, kwargs))
+        return len(self._futures) - 1
+
+    def __call(self, fn, args, kwargs):
+        # a call already queued when the batch was cancelled never starts
+        if self.cancelled:
+            raise concurrent.futures.CancelledError()
+        if self._deadline is not None and time.monotonic() >= self._deadline:
+            raise concurrent.futures.TimeoutError()
+        return fn(*args, **kwargs)
+
+    def cancel(self) -> None:
+        """Cancels the calls that have not started, running ones finish"""
+        self._cancelled.set()
+        for future in self._futures:
+            future.cancel()
+
+    def results(self) -> List[BatchResult]:
+        """Waits for the calls, up to the deadline, and returns their results in order"""
+        timeout = None
+        if self._deadline is not None:
+            timeout = max(0.0, self._deadline - time.monotonic())
+        _, pending = concurrent.futures.wait(self._futures, timeout=timeout)
+        for future in pending:
+            future.cancel()
+
+        results = []
+        for item, future in zip(self._items, self._futures):
+            if future in pending:
+                results.append(BatchResult(item, error=concurrent.futures.TimeoutError()))
+            elif future.cancelled():
+                results.append(BatchResult(item, error=concurrent.futures.CancelledError()))
+            elif future.exception() is not None:
+                results.append(BatchResult(item, error=future.exception()))
+            else:
+                results.append(BatchResult(item, value=future.result()))
+        return results
+
+
+class BoundedExecutor(concurrent.futures.Executor):
+    """Runs at most ``max_workers`` calls at once on a shared executor
+
+    Calls over the bound wait in a queue of their own instead of taking the
+    shared threads, so one user of a shared pool can't hold all of them.
+    Shutting it down leaves the shared executor running.
+    """
+
+    def __init__(self, executor: concurrent.futures.Executor, max_workers: int) -> None:
+        """Bounded executor
+
+        Args:
+            executor (concurrent.futures.Executor): The shared pool running the calls.
+            max_workers (int): Calls running at once.
+        """
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1")
+        self.executor = executor
+        self.max_workers = max_workers
+        self._running = 0
+        self._pending = collections.deque()
+        self._lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        return (
+            f"BoundedExecutor(max_workers = {self.max_workers}, running = {self._running}, "
+            f"pending = {len(self._pending)})"
+        )
+
+    def submit(self, fn: Callable[..., Any], *args, **kwargs) -> concurrent.futures.Future:
+        future = concurrent.futures.Future()
+        with self._lock:
+            if self._running >= self.max_workers:
+                self._pending.append((future, fn, args, kwargs))
+                return future
+            self._running += 1
+        try:
+            self.executor.submit(self.__run, future, fn, args, kwargs)
+        except BaseException:
+            with self._lock:
+                self._running -= 1
+            raise
+        return future
+
+    def __run(self, future, fn, args, kwargs) -> None:
+        if future.set_running_or_notify_cancel():
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except BaseException as e:
+                future.set_exception(e)
+        # the freed slot goes to the next queued call, behind the calls the
+        # other users of the shared executor queued meanwhile
+        while True:
+            with self._lock:
+                if not self._pending:
+                    self._running -= 1
+                    return
+                queued = self._pending.popleft()
+            try:
+                self.executor.submit(self.__run, *queued)
+                return
+            except RuntimeError as e:  # the shared executor was shut down
+                if queued[0].set_running_or_notify_cancel():
+                    queued[0].set_exception(e)
+
+
+def map_concurrent(
+    executor: concurrent.futures.Executor,
+    fn: Callable[[Any], Any],
+    items: Iterable[Any],
+    timeout: Optional[float] = None,
+) -> List[BatchResult]:
+    """Calls ``fn(item)`` for every item on ``executor``, see `Batch`
+
+    Returns:
+        List[BatchResult]: One result per item, in the order of ``items``
+    """
+    batch = Batch(executor, timeout)
+    try:
+        for item in items:
+            batch.submit(fn, item)
+    except BaseException:
+        batch.cancel()
+        raise
+    return batch.results()
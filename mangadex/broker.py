@@ -0,0 +1,373 @@
+"""Module providing a sidecar that shares one rate limit and one login between processes
+
+Run it once per host::
+
+    md_username=... md_password=... client_id=... client_secret=... \\
+        python -m mangadex.broker /run/mangadex.sock
+
+and point every worker process to it with ``MangaDexClient(broker="/run/mangadex.sock")``.
+"""
+from __future__ import absolute_import
+
+import argparse
+import json
+import logging
+import os
+import socket
+import socketserver
+import sys
+import threading
+import time
+
+from typing_extensions import Any, Dict, Optional, Union
+
+from .auth import Auth
+from .errors import BrokerError
+from .transport import RateLimiter
+
+logger = logging.getLogger("mangadex")
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    # one JSON object per line each way, a connection is kept by each process
+    def handle(self) -> None:
+        for line in self.rfile:
+            try:
+                response = self.server.broker.handle(json.loads(line))
+            except Exception as e:
+                logger.exception("mangadex broker request failed")
+                response = {"error": str(e) or type(e).__name__}
+            self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+
+
+class Broker:
+    """Hands out rate limit permits and the current bearer token over a Unix socket
+
+    Every process of the host asks the broker before sending a request, so they
+    share one `RateLimiter` as if they were one client, and one login: the
+    first ``login`` logs in, the next ones get the same token, which the broker
+    refreshes before it expires. The socket is only accessible to its owner.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        rate: float = 5.0,
+        burst: int = 5,
+        auth: Union[Auth, None] = None,
+        refresh_margin: float = 60.0,
+    ) -> None:
+        """Broker
+
+        Args:
+            path (str): Path of the Unix socket.
+            rate (float, optional): Requests per second of the whole host. Defaults to 5.
+            burst (int, optional): Requests allowed at once. Defaults to 5.
+            auth (Auth, optional): Authentication to share. A new one by default.
+            refresh_margin (float, optional): Seconds before expiry a token is refreshed.
+                Defaults to 60.
+        """
+        if not hasattr(socket, "AF_UNIX"):
+            raise OSError("The broker needs Unix domain sockets")
+        self.path = path
+        self.rate_limiter = RateLimiter(rate, burst)
+        self.auth = auth if auth is not None else Auth()
+        self.refresh_margin = refresh_margin
+        self._credentials: Optional[Dict[str, str]] = None
+        self._auth_lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    def __repr__(self) -> str:
+        return f"Broker(path = {self.path}, rate_limiter = {self.rate_limiter})"
+
+    def __enter__(self) -> "Broker":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def __bind(self) -> None:
+        if os.path.exists(self.path):
+            # left behind by a broker that didn't stop cleanly
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.path)
+            except OSError:
+                os.unlink(self.path)
+            else:
+                raise OSError(f"A broker is already listening on {self.path}")
+            finally:
+                probe.close()
+        umask = os.umask(0o177)
+        try:
+            self._server = socketserver.ThreadingUnixStreamServer(self.path, _Handler)
+        finally:
+            os.umask(umask)
+        self._server.daemon_threads = True
+        self._server.broker = self
+
+    def start(self) -> "Broker":
+        """Serves from a background thread"""
+        self.__bind()
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        """Serves until interrupted"""
+        self.__bind()
+        try:
+            self._server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def stop(self) -> None:
+        """Stops serving and removes the socket"""
+        if self._server is None:
+            return
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread = None
+        self._server.server_close()
+        self._server = None
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    def login(self, username: str, password: str, client_id: str, client_secret: str) -> None:
+        """Logs the shared `Auth` in, see `Auth.login`"""
+        with self._auth_lock:
+            self.__login(
+                {
+                    "username": username,
+                    "password": password,
+                    "client_id": client_id,
+                    "client_secret": client_secret,
+                }
+            )
+
+    def __login(self, credentials: Dict[str, str]) -> None:
+        self.auth.login(**credentials)
+        self._credentials = credentials
+
+    def __token(self) -> Dict[str, Any]:
+        bearer = self.auth.get_bearer_token()
+        if bearer is None:
+            return {"token": None, "expires_at": None}
+        return {"token": bearer["Authorization"], "expires_at": self.auth.expires_at}
+
+    def __fresh_token(self, stale: Optional[str] = None) -> Dict[str, Any]:
+        with self._auth_lock:
+            bearer = self.auth.get_bearer_token()
+            if bearer is None:
+                return self.__token()
+            expires_at = self.auth.expires_at
+            expiring = expires_at is not None and expires_at - time.time() < self.refresh_margin
+            if expiring or (stale is not None and stale == bearer["Authorization"]):
+                try:
+                    self.auth.refresh_login()
+                except Exception:
+                    if self._credentials is None:
+                        raise
+                    logger.warning("mangadex broker token refresh failed, logging in again")
+                    self.__login(self._credentials)
+            return self.__token()
+
+    def handle(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Answers one request of a `BrokerClient`"""
+        op = request.get("op")
+        if op == "permit":
+            return {"wait": self.rate_limiter.reserve()}
+        if op == "pause":
+            self.rate_limiter.pause(float(request["seconds"]))
+            return {}
+        if op == "token":
+            return self.__fresh_token()
+        if op == "refresh":
+            return self.__fresh_token(stale=request.get("token"))
+        if op == "login":
+            credentials = {
+                key: request[key] for key in ("username", "password", "client_id", "client_secret")
+            }
+            with self._auth_lock:
+                if self._credentials is None or self.auth.get_bearer_token() is None:
+                    self.__login(credentials)
+                elif (credentials["username"], credentials["client_id"]) != (
+                    self._credentials["username"],
+                    self._credentials["client_id"],
+                ):
+                    raise ValueError(
+                        f"The broker is logged in as {self._credentials['username']}"
+                    )
+            return self.__fresh_token()
+        if op == "ping":
+            return {"pong": True}
+        raise ValueError(f"Unknown broker operation {op!r}")
+
+
+class BrokerClient:
+    """Connection of a process to a `Broker`, shared by its threads
+
+    The connection is opened on first use and again after a failure or a fork.
+    """
+
+    def __init__(self, path: str, timeout: float = 5.0) -> None:
+        """Broker client
+
+        Args:
+            path (str): Path of the broker's Unix socket.
+            timeout (float, optional): Seconds to wait for an answer. Defaults to 5.
+        """
+        self.path = path
+        self.timeout = timeout
+        self._sock = None
+        self._file = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        return f"BrokerClient(path = {self.path})"
+
+    def close(self) -> None:
+        """Closes the connection"""
+        if self._file is not None:
+            self._file.close()
+        if self._sock is not None:
+            self._sock.close()
+        self._sock = self._file = None
+
+    def __connect(self) -> None:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.path)
+        self._sock, self._file, self._pid = sock, sock.makefile("rwb"), os.getpid()
+
+    def call(self, op: str, **fields) -> Dict[str, Any]:
+        """Sends one request and returns the broker's answer
+
+        Raises:
+            BrokerError: The broker can't be reached or failed to answer
+        """
+        line = json.dumps(dict(fields, op=op)).encode("utf-8") + b"\n"
+        with self._lock:
+            if self._pid != os.getpid():
+                # the parent's connection is not ours to use
+                self._sock = self._file = None
+            for attempt in range(2):
+                try:
+                    if self._file is None:
+                        self.__connect()
+                    self._file.write(line)
+                    self._file.flush()
+                    reply = self._file.readline()
+                    if not reply:
+                        raise ConnectionError("The broker closed the connection")
+                    break
+                except OSError as e:
+                    self.close()
+                    if attempt:
+                        raise BrokerError({"op": op}, f"Broker at {self.path} unreachable: {e}")
+        response = json.loads(reply)
+        if "error" in response:
+            raise BrokerError(response, response["error"])
+        return response
+
+
+class BrokerRateLimiter:
+    """`RateLimiter` taking its permits from a `Broker`, for a `Transport`"""
+
+    def __init__(self, broker: Union[BrokerClient, str]) -> None:
+        self.broker = broker if isinstance(broker, BrokerClient) else BrokerClient(broker)
+
+    def __repr__(self) -> str:
+        return f"BrokerRateLimiter(path = {self.broker.path})"
+
+    def reserve(self) -> float:
+        """Takes a permit, returning how long the caller must wait before using it"""
+        return self.broker.call("permit")["wait"]
+
+    def acquire(self) -> float:
+        """Blocks until a request may be sent
+
+        Returns:
+            float: Seconds waited
+        """
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def pause(self, seconds: float) -> None:
+        """Stops every process of the host for ``seconds``, e.g. after a 429 response"""
+        self.broker.call("pause", seconds=seconds)
+
+
+class BrokerAuth(Auth):
+    """`Auth` whose login and token come from a `Broker`
+
+    ``login`` only logs in if the broker isn't already, and the token is kept
+    until shortly before it expires.
+    """
+
+    def __init__(self, broker: Union[BrokerClient, str], transport=None) -> None:
+        """Broker authentication
+
+        Args:
+            broker (BrokerClient | str): Broker, or the path of its socket.
+            transport (Transport, optional): Shared transport of a `MangaDexClient`.
+        """
+        super().__init__(transport=transport)
+        self.broker = broker if isinstance(broker, BrokerClient) else BrokerClient(broker)
+
+    def __update(self, response: Dict[str, Any]) -> None:
+        token = response.get("token")
+        self.bearer = {"Authorization": token} if token else None
+        self.expires_at = response.get("expires_at")
+
+    def get_bearer_token(self) -> dict:
+        """The broker's current bearer token"""
+        if self.bearer is None or (
+            self.expires_at is not None and self.expires_at - time.time() < 30
+        ):
+            self.__update(self.broker.call("token"))
+        return self.bearer
+
+    def login(self, username: str, password: str, client_id: str, client_secret: str) -> None:
+        """Logs the broker in, unless it already is"""
+        self.__update(
+            self.broker.call(
+                "login",
+                username=username,
+                password=password,
+                client_id=client_id,
+                client_secret=client_secret,
+            )
+        )
+
+    def refresh_login(self) -> None:
+        """Asks the broker for a new token, e.g. after the current one was refused"""
+        stale = self.bearer["Authorization"] if self.bearer else None
+        self.__update(self.broker.call("refresh", token=stale))
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="mangadex rate limit and token broker")
+    parser.add_argument("path", help="Unix socket to listen on")
+    parser.add_argument("--rate", type=float, default=5.0, help="requests per second of the host")
+    parser.add_argument("--burst", type=int, default=5, help="requests allowed at once")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    broker = Broker(args.path, rate=args.rate, burst=args.burst)
+    names = ("md_username", "md_password", "client_id", "client_secret")
+    if all(os.environ.get(name) for name in names):
+        broker.login(*(os.environ[name] for name in names))
+    logger.info("mangadex broker listening on %s", args.path)
+    broker.serve_forever()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
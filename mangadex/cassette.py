@@ -0,0 +1,193 @@
+"""Module for recording requests to disk and replaying them without the network"""
+from __future__ import absolute_import
+
+import base64
+import gzip
+import hashlib
+import json
+import os
+import threading
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from typing_extensions import Any, Callable, Dict, List, Union
+
+from .errors import CassetteError
+from .metrics import current_event
+from .url_models import URLRequest
+
+_FORMAT_VERSION = 1
+_KEPT_HEADERS = ("content-type", "content-encoding", "x-ratelimit-limit",
+                 "x-ratelimit-remaining", "x-ratelimit-retry-after", "retry-after")
+
+
+def request_key(method: str, url: str, params: Any = None) -> str:
+    """The index of a request in a cassette: method, full URL and body digest"""
+    if method == "GET" or not params:
+        return f"{method} {url}"
+    if isinstance(params, (str, bytes)):
+        body = params if isinstance(params, bytes) else params.encode("utf-8")
+    else:
+        body = json.dumps(params, sort_keys=True, default=repr).encode("utf-8")
+    return f"{method} {url} {hashlib.sha1(body).hexdigest()}"
+
+
+class Cassette:
+    """Records every response passing through `URLRequest` and replays it
+
+    Interactions are kept in memory, indexed by `request_key`, and stored as a
+    gzip compressed JSON file. Replaying returns the recorded responses of a key
+    in the order they were recorded, repeating the last one once they run out,
+    so the same script always sees the same data.
+
+    Modes:
+        ``"record"``: Always send requests and record the responses.
+        ``"replay"``: Never send requests; unknown requests raise `CassetteError`.
+        ``"auto"``: Replay what is recorded and record the rest.
+
+    Usage::
+
+        with Cassette("feed.json.gz", mode="record"):
+            manga.manga_feed(manga_id)
+    """
+
+    def __init__(self, path: Union[str, None] = None, mode: str = "auto") -> None:
+        """Cassette
+
+        Args:
+            path (str, optional): Cassette file. Without it nothing is saved.
+            mode (str, optional): "record", "replay" or "auto". Defaults to "auto".
+        """
+        if mode not in ("record", "replay", "auto"):
+            raise ValueError(f"Invalid cassette mode {mode}")
+        self.path = path
+        self.mode = mode
+        self.interactions: Dict[str, List[dict]] = {}
+        self._played: Dict[str, int] = {}
+        self._responses: Dict[tuple, requests.Response] = {}
+        self._dirty = False
+        self._previous = None
+        self._lock = threading.Lock()
+        if path is not None and os.path.exists(path) and mode != "record":
+            self.load()
+
+    def __len__(self) -> int:
+        return sum(len(responses) for responses in self.interactions.values())
+
+    def __repr__(self) -> str:
+        return f"Cassette(path = {self.path}, mode = {self.mode}, interactions = {len(self)})"
+
+    def __enter__(self) -> "Cassette":
+        self._previous = URLRequest.cassette
+        URLRequest.cassette = self
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        URLRequest.cassette = self._previous
+        self._previous = None
+        if self._dirty:
+            self.save()
+
+    def load(self) -> None:
+        """Reads the cassette file"""
+        with gzip.open(self.path, "rt", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != _FORMAT_VERSION:
+            raise CassetteError(data, f"Unsupported cassette version {data.get('version')}")
+        with self._lock:
+            self.interactions = data["interactions"]
+            self._played = {}
+            self._responses = {}
+
+    def save(self) -> None:
+        """Writes the cassette file"""
+        if self.path is None:
+            return
+        with self._lock:
+            data = {"version": _FORMAT_VERSION, "interactions": self.interactions}
+            self._dirty = False
+        tmp_path = f"{self.path}.tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8", compresslevel=6) as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(tmp_path, self.path)
+
+    def record(self, key: str, resp: requests.Response) -> None:
+        """Adds a response to the cassette"""
+        content = resp.content or b""
+        try:
+            body, encoding = content.decode("utf-8"), "utf8"
+        except UnicodeDecodeError:
+            body, encoding = base64.b64encode(content).decode("ascii"), "base64"
+        entry = {
+            "status": resp.status_code,
+            "reason": resp.reason,
+            "url": resp.url,
+            "headers": {k: v for k, v in resp.headers.items() if k.lower() in _KEPT_HEADERS},
+            "body": body,
+            "encoding": encoding,
+        }
+        with self._lock:
+            self.interactions.setdefault(key, []).append(entry)
+            self._dirty = True
+
+    def __response(self, key: str, index: int) -> requests.Response:
+        cached = self._responses.get((key, index))
+        if cached is not None:
+            return cached
+        entry = self.interactions[key][index]
+        body = entry["body"]
+        resp = requests.Response()
+        resp.status_code = entry["status"]
+        resp.reason = entry["reason"]
+        resp.url = entry["url"]
+        resp.headers = CaseInsensitiveDict(entry["headers"])
+        resp.encoding = "utf-8"
+        resp._content = (
+            body.encode("utf-8") if entry["encoding"] == "utf8" else base64.b64decode(body)
+        )
+        resp._content_consumed = True
+        self._responses[(key, index)] = resp
+        return resp
+
+    def play(
+        self,
+        method: str,
+        url: str,
+        params: Any,
+        headers: Union[dict, None],
+        timeout,
+        send: Callable[..., requests.Response],
+    ) -> requests.Response:
+        """Replays or records a request, depending on the mode
+
+        Args:
+            send: The function that really sends the request
+
+        Raises:
+            CassetteError: Raised when replaying a request that was never recorded
+
+        Returns:
+            requests.Response: The recorded (or fresh) response
+        """
+        key = request_key(method, url, params)
+        if self.mode != "record":
+            with self._lock:
+                recorded = self.interactions.get(key)
+                if recorded:
+                    event = current_event()
+                    if event is not None:
+                        event.cache = "replay"
+                    index = self._played.get(key, 0)
+                    self._played[key] = index + 1
+                    return self.__response(key, min(index, len(recorded) - 1))
+            if self.mode == "replay":
+                raise CassetteError({"key": key}, f"Request not recorded in cassette: {key}")
+
+        resp = send(method, url, params, headers, timeout)
+        self.record(key, resp)
+        return resp
+
+    def rewind(self) -> None:
+        """Replays every key from its first recorded response again"""
+        with self._lock:
+            self._played = {}
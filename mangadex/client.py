@@ -0,0 +1,291 @@
+"""Module providing a single client object sharing transport, auth and caches"""
+from __future__ import absolute_import
+
+import asyncio
+import concurrent.futures
+import copy
+import functools
+import threading
+
+from typing_extensions import Any, Callable, Iterable, List, Optional, Union
+
+from .auth import Api, ApiClient, Auth
+from .batch import Batch, BatchResult, BoundedExecutor, map_concurrent
+from .broker import BrokerAuth, BrokerClient, BrokerRateLimiter
+from .people import Author, Follows, ScanlationGroup, User
+from .series import AggregateCache, Chapter, Cover, CustomList, Manga, MangaList, Tag
+from .state import UserStateCache
+from .transport import HTTP2Transport, RateLimiter, Transport
+
+
+class MangaDexClient:
+    """Owns the configuration, transport, rate limiter, auth and caches
+
+    Every service (``client.manga``, ``client.chapter``...) is created once and
+    shares them, so all the calls of a program go through one connection pool
+    and one rate limit.
+
+    Usage::
+
+        client = md.MangaDexClient()
+        client.login(username, password, client_id, client_secret)
+        mangas = client.manga.get_manga_list(limit=10)
+        feed = client.manga_list.get_my_manga_feed()
+    """
+
+    def __init__(
+        self,
+        url: Optional[str] = None,
+        timeout: Optional[float] = None,
+        auth: Union[Auth, None] = None,
+        transport: Union[Transport, None] = None,
+        rate_limit: Optional[float] = 5.0,
+        burst: int = 5,
+        aggregate_ttl: float = 300.0,
+        http2: bool = False,
+        workers: int = 8,
+        broker: Optional[str] = None,
+        user_state_ttl: Optional[float] = 60.0,
+    ) -> None:
+        """MangaDex client
+
+        Args:
+            url (str, optional): API url. Follows `Api.default_url` when not given.
+            timeout (float, optional): Request timeout. Follows `Api.default_timeout`.
+            auth (Auth, optional): Existing authentication to share. A new one by default.
+            transport (Transport, optional): Transport to send with. By default a new
+                one with a `RateLimiter` of ``rate_limit`` requests per second.
+            rate_limit (float, optional): Requests per second, None for no limit. Defaults to 5.
+            burst (int, optional): Requests allowed at once. Defaults to 5.
+            aggregate_ttl (float, optional): Seconds aggregates stay cached. Defaults to 300.
+            http2 (bool, optional): Build an `HTTP2Transport` (needs httpx). Defaults to False.
+            workers (int, optional): Threads of `batch` and `map_concurrent`. Defaults to 8.
+            broker (str, optional): Socket of a `mangadex.broker.Broker`. The rate limit and
+                the login then come from it and are shared with the other processes.
+            user_state_ttl (float, optional): Seconds before the cached state of the logged in
+                user (`User.me`, followed manga, custom lists, reading statuses) is
+                revalidated in the background. None to not cache it. Defaults to 60.
+        """
+        broker_client = BrokerClient(broker) if broker is not None else None
+        if transport is None:
+            if broker_client is not None:
+                limiter = BrokerRateLimiter(broker_client)
+            else:
+                limiter = RateLimiter(rate_limit, burst) if rate_limit else None
+            transport_cls = HTTP2Transport if http2 else Transport
+            transport = transport_cls(rate_limiter=limiter)
+        self.transport = transport
+        self.broker = broker_client
+        self.api = Api(url, timeout, transport=transport)
+        if auth is None and broker_client is not None:
+            auth = BrokerAuth(broker_client, transport=transport)
+        elif auth is None:
+            auth = Auth(transport=transport)
+        elif auth.transport is None:
+            auth.transport = transport
+        self.auth = auth
+        self.aggregate_cache = AggregateCache(ttl=aggregate_ttl)
+        self._services = {}
+        self.workers = workers
+        self._executor: Union[concurrent.futures.ThreadPoolExecutor, None] = None
+        self._executor_lock = threading.Lock()
+        # this client's share of the root's threads, see `with_auth`
+        self._max_workers: Optional[int] = None
+        self._bounded: Union[BoundedExecutor, None] = None
+        # client owning the threads and the connections, another one for `with_auth`
+        self._root = self
+        self.user_state: Union[UserStateCache, None] = None
+        if user_state_ttl is not None:
+            self.user_state = UserStateCache(
+                user_state_ttl, submit=lambda fn: self.__pool().submit(fn)
+            )
+
+    def __repr__(self) -> str:
+        return f"MangaDexClient(url = {self.api.url}, transport = {self.transport})"
+
+    def __enter__(self) -> "MangaDexClient":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Closes the pooled connections and stops the batch threads
+
+        Clients made by `with_auth` own neither, closing them does nothing.
+        """
+        if self._root is not self:
+            return
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+        if self.broker is not None:
+            self.broker.close()
+        self.transport.close()
+
+    def __service(self, cls):
+        service = self._services.get(cls)
+        if service is None:
+            service = self._services[cls] = cls(client=self)
+        return service
+
+    @property
+    def manga(self) -> Manga:
+        return self.__service(Manga)
+
+    @property
+    def manga_list(self) -> MangaList:
+        return self.__service(MangaList)
+
+    @property
+    def chapter(self) -> Chapter:
+        return self.__service(Chapter)
+
+    @property
+    def cover(self) -> Cover:
+        return self.__service(Cover)
+
+    @property
+    def tag(self) -> Tag:
+        return self.__service(Tag)
+
+    @property
+    def custom_list(self) -> CustomList:
+        return self.__service(CustomList)
+
+    @property
+    def author(self) -> Author:
+        return self.__service(Author)
+
+    @property
+    def group(self) -> ScanlationGroup:
+        return self.__service(ScanlationGroup)
+
+    @property
+    def user(self) -> User:
+        return self.__service(User)
+
+    @property
+    def follows(self) -> Follows:
+        return self.__service(Follows)
+
+    @property
+    def api_client(self) -> ApiClient:
+        return self.__service(ApiClient)
+
+    def with_auth(
+        self,
+        auth: Union[Auth, None] = None,
+        rate_limiter=None,
+        max_workers: Optional[int] = None,
+    ) -> "MangaDexClient":
+        """A client for another user, sharing the connections, caches and threads of this one
+
+        Public responses (aggregates, identical GETs in flight) are shared; the
+        `UserStateCache` and the follows are kept apart per `Auth`.
+
+        Args:
+            auth (Auth, optional): Authentication of the user. A new one by default.
+            rate_limiter (optional): Limiter of the new client's requests, e.g.
+                `FairRateLimiter.tenant`. This client's one by default.
+            max_workers (int, optional): Shared threads the new client's `batch` and
+                `map_concurrent` may use at once, the others wait in its own queue.
+                No bound of its own by default.
+
+        Returns:
+            MangaDexClient: The client of the user, closing it does nothing
+        """
+        view = copy.copy(self)
+        if rate_limiter is not None:
+            view.transport = self.transport.share(rate_limiter)
+        view.api = Api(self.api._url, self.api._timeout, transport=view.transport)
+        if auth is None:
+            auth = Auth(transport=view.transport)
+        elif auth.transport is None:
+            auth.transport = view.transport
+        view.auth = auth
+        view._services = {}
+        view._max_workers = max_workers
+        view._bounded = None
+        return view
+
+    def login(self, username: str, password: str, client_id: str, client_secret: str) -> None:
+        """Logs the shared `Auth` into MangaDex, see `Auth.login`"""
+        self.auth.login(username, password, client_id, client_secret)
+        if self.user_state is not None:
+            # it may be another user than before
+            self.user_state.invalidate(self.auth)
+
+    def ping(self) -> Optional[str]:
+        """Ping healthcheck, see `Api.ping`"""
+        return self.api.ping()
+
+    async def call_async(self, fn, *args, **kwargs):
+        """Awaits a blocking service call, run in the default executor
+
+        Identical GETs in flight from several coroutines are sent once::
+
+            await asyncio.gather(*(client.call_async(client.manga.get_manga_by_id, manga_id)
+                                   for _ in range(10)))
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, functools.partial(fn, *args, **kwargs))
+
+    def __pool(self) -> concurrent.futures.Executor:
+        root = self._root
+        with root._executor_lock:
+            if root._executor is None:
+                root._executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=root.workers, thread_name_prefix="mangadex"
+                )
+            executor = root._executor
+            if self._max_workers is None:
+                return executor
+            if self._bounded is None or self._bounded.executor is not executor:
+                self._bounded = BoundedExecutor(executor, self._max_workers)
+            return self._bounded
+
+    def batch(self, timeout: Optional[float] = None) -> Batch:
+        """A `Batch` of blocking calls run on the client's threads
+
+        The calls share the transport, so they still go through the rate limiter
+        and the connection pool::
+
+            with client.batch(timeout=30) as batch:
+                for cover_id in cover_ids:
+                    batch.submit(client.cover.get_cover, cover_id)
+            covers = [result.get() for result in batch.results()]
+
+        Args:
+            timeout (float, optional): Seconds the whole batch may take.
+        """
+        return Batch(self.__pool(), timeout)
+
+    def map_concurrent(
+        self,
+        fn: Callable[[Any], Any],
+        items: Iterable[Any],
+        timeout: Optional[float] = None,
+    ) -> List[BatchResult]:
+        """Calls ``fn(item)`` for every item on the client's threads
+
+        Errors are collected instead of stopping the other calls::
+
+            results = client.map_concurrent(client.manga.get_manga_by_id, manga_ids)
+            mangas = [result.value for result in results if result.ok]
+
+        Args:
+            fn (Callable): Called with each item.
+            items (Iterable): The items.
+            timeout (float, optional): Seconds all the calls may take.
+
+        Returns:
+            List[BatchResult]: One result per item, in the order of ``items``
+        """
+        return map_concurrent(self.__pool(), fn, items, timeout)
+
+    def watcher(self, **kwargs):
+        """A `FeedWatcher` of the logged in user's follows, using this client"""
+        from .watcher import FeedWatcher
+
+        return FeedWatcher(self.auth, client=self, **kwargs)
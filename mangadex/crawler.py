@@ -0,0 +1,469 @@
+"""Module crawling the whole catalog with cooperating workers"""
+from __future__ import absolute_import
+
+import abc
+import datetime
+import itertools
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+from typing_extensions import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from .query import CONTENT_RATINGS, RESULT_WINDOW
+
+logger = logging.getLogger("mangadex")
+
+# the oldest createdAt of the catalog, titles migrated from v3 included
+CATALOG_START = datetime.datetime(2018, 1, 1, tzinfo=datetime.timezone.utc)
+_DATE_FORMAT = "%Y-%m-%dT%H:%M:%S"
+
+
+def _utc(value: datetime.datetime) -> datetime.datetime:
+    if value.tzinfo is None:
+        return value.replace(tzinfo=datetime.timezone.utc)
+    return value.astimezone(datetime.timezone.utc)
+
+
+def _created_second(item) -> Optional[str]:
+    # chapters may lack createdAt, publishAt is the closest then
+    created = item.created_at or getattr(item, "publish_at", None)
+    return None if created is None else _utc(created).strftime(_DATE_FORMAT)
+
+
+class Partition:
+    """A disjoint slice of the catalog: manga matching ``filters`` created in [since, until)
+
+    ``until`` None means up to now.
+    """
+
+    __slots__ = ("key", "filters", "since", "until")
+
+    def __init__(
+        self,
+        filters: Dict[str, Any],
+        since: datetime.datetime,
+        until: Optional[datetime.datetime] = None,
+        key: Optional[str] = None,
+    ) -> None:
+        self.filters = filters
+        self.since = _utc(since)
+        self.until = None if until is None else _utc(until)
+        if key is None:
+            parts = [f"{name}={','.join(sorted(v))}" for name, v in sorted(filters.items())]
+            parts.append(self.since.strftime(_DATE_FORMAT))
+            key = "/".join(parts)
+        self.key = key
+
+    def __repr__(self) -> str:
+        return f"Partition(key = {self.key}, until = {self.until})"
+
+    def to_dict(self) -> dict:
+        return {
+            "key": self.key,
+            "filters": self.filters,
+            "since": self.since.isoformat(),
+            "until": None if self.until is None else self.until.isoformat(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Partition":
+        until = data.get("until")
+        return cls(
+            data["filters"],
+            datetime.datetime.fromisoformat(data["since"]),
+            None if until is None else datetime.datetime.fromisoformat(until),
+            key=data["key"],
+        )
+
+
+def partition_catalog(
+    start: datetime.datetime = CATALOG_START,
+    end: Optional[datetime.datetime] = None,
+    step: datetime.timedelta = datetime.timedelta(days=90),
+    content_ratings: Iterable[str] = CONTENT_RATINGS,
+    statuses: Optional[Iterable[str]] = None,
+) -> List[Partition]:
+    """Splits the catalog into createdAt windows × content rating (× status)
+
+    Every title belongs to exactly one partition. The last window is left open
+    so titles created during the crawl are included. A partition with more
+    titles than the offset window is still crawled whole, see `Crawler`.
+
+    Args:
+        start (datetime.datetime, optional): Oldest createdAt. Defaults to `CATALOG_START`.
+        end (datetime.datetime, optional): Start of the open last window. Now by default.
+        step (datetime.timedelta, optional): Window length. Defaults to 90 days.
+        content_ratings (Iterable[str], optional): Ratings to crawl, all by default.
+        statuses (Iterable[str], optional): Also split by these statuses.
+
+    Returns:
+        List[Partition]: The partitions
+    """
+    start = _utc(start)
+    end = _utc(end) if end is not None else datetime.datetime.now(datetime.timezone.utc)
+    bounds = [start]
+    while bounds[-1] + step < end:
+        bounds.append(bounds[-1] + step)
+    windows = list(zip(bounds, bounds[1:] + [None]))
+
+    dimensions = [[("contentRating", [rating]) for rating in content_ratings]]
+    if statuses is not None:
+        dimensions.append([("status", [status]) for status in statuses])
+    return [
+        Partition(dict(combination), since, until)
+        for combination in itertools.product(*dimensions)
+        for since, until in windows
+    ]
+
+
+class WorkQueue(abc.ABC):
+    """Where crawl workers take their partitions from
+
+    `SQLiteWorkQueue` is for workers sharing a file system; another backend
+    (a database server, Redis...) only needs these methods. A claimed partition
+    is leased: if its worker stops checkpointing, another one takes it over
+    from its last checkpoint.
+    """
+
+    @abc.abstractmethod
+    def put(self, partitions: Iterable[Partition]) -> int:
+        """Adds partitions, those already known are skipped. Returns how many were added"""
+
+    @abc.abstractmethod
+    def claim(self, worker: str, lease: float) -> Optional[Tuple[Partition, dict]]:
+        """Takes a pending (or abandoned) partition, with its last checkpoint"""
+
+    @abc.abstractmethod
+    def checkpoint(self, key: str, worker: str, cursor: dict, lease: float) -> bool:
+        """Saves the position of a partition and extends its lease
+
+        Returns:
+            bool: False if the partition is no longer leased to ``worker``
+        """
+
+    @abc.abstractmethod
+    def complete(self, key: str, worker: str) -> None:
+        """Marks a partition as crawled"""
+
+    @abc.abstractmethod
+    def fail(self, key: str, worker: str, error: str) -> None:
+        """Releases a partition after an error, to be retried or given up"""
+
+    @abc.abstractmethod
+    def stats(self) -> Dict[str, int]:
+        """Number of partitions per state"""
+
+
+_QUEUE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS crawl_partition (
+    key TEXT PRIMARY KEY,
+    partition TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    worker TEXT,
+    lease_until REAL,
+    cursor TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS crawl_partition_state ON crawl_partition (state, lease_until);
+"""
+
+
+class SQLiteWorkQueue(WorkQueue):
+    """`WorkQueue` in a SQLite file, shared by the worker processes of a host
+
+    Claims run in an immediate transaction, so two workers never get the same
+    partition. Workers on several nodes need a queue on a server instead, SQLite
+    locking is not reliable over network file systems.
+    """
+
+    def __init__(self, path: str, max_attempts: int = 3) -> None:
+        """Opens (or creates) the queue
+
+        Args:
+            path (str): Database file.
+            max_attempts (int, optional): Failures before a partition is given up. Defaults to 3.
+        """
+        self.path = path
+        self.max_attempts = max_attempts
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(
+            path, timeout=30, isolation_level=None, check_same_thread=False
+        )
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_QUEUE_SCHEMA)
+
+    def __repr__(self) -> str:
+        return f"SQLiteWorkQueue(path = {self.path})"
+
+    def __enter__(self) -> "SQLiteWorkQueue":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Closes the database connection"""
+        with self._lock:
+            self._conn.close()
+
+    def __transaction(self, fn: Callable[[sqlite3.Connection], Any]) -> Any:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(self._conn)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            return result
+
+    def put(self, partitions: Iterable[Partition]) -> int:
+        rows = [(p.key, json.dumps(p.to_dict())) for p in partitions]
+        return self.__transaction(
+            lambda conn: conn.executemany(
+                "INSERT OR IGNORE INTO crawl_partition (key, partition) VALUES (?, ?)", rows
+            ).rowcount
+        )
+
+    def claim(self, worker: str, lease: float) -> Optional[Tuple[Partition, dict]]:
+        def claim(conn):
+            now = time.time()
+            row = conn.execute(
+                "SELECT key, partition, cursor FROM crawl_partition"
+                " WHERE state = 'pending' OR (state = 'claimed' AND lease_until < ?)"
+                " ORDER BY key LIMIT 1",
+                (now,),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE crawl_partition SET state = 'claimed', worker = ?, lease_until = ?"
+                " WHERE key = ?",
+                (worker, now + lease, row[0]),
+            )
+            return Partition.from_dict(json.loads(row[1])), json.loads(row[2] or "{}")
+
+        return self.__transaction(claim)
+
+    def checkpoint(self, key: str, worker: str, cursor: dict, lease: float) -> bool:
+        return self.__transaction(
+            lambda conn: conn.execute(
+                "UPDATE crawl_partition SET cursor = ?, lease_until = ?"
+                " WHERE key = ? AND worker = ? AND state = 'claimed'",
+                (json.dumps(cursor), time.time() + lease, key, worker),
+            ).rowcount
+            > 0
+        )
+
+    def complete(self, key: str, worker: str) -> None:
+        self.__transaction(
+            lambda conn: conn.execute(
+                "UPDATE crawl_partition SET state = 'done', lease_until = NULL, error = NULL"
+                " WHERE key = ? AND worker = ?",
+                (key, worker),
+            )
+        )
+
+    def fail(self, key: str, worker: str, error: str) -> None:
+        self.__transaction(
+            lambda conn: conn.execute(
+                "UPDATE crawl_partition SET attempts = attempts + 1, error = ?,"
+                " lease_until = NULL,"
+                " state = CASE WHEN attempts + 1 >= ? THEN 'failed' ELSE 'pending' END"
+                " WHERE key = ? AND worker = ?",
+                (error, self.max_attempts, key, worker),
+            )
+        )
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT state, COUNT(*) FROM crawl_partition GROUP BY state"
+            ).fetchall()
+        return dict(rows)
+
+
+class Crawler:
+    """Crawls the partitions of a `WorkQueue`: their manga and, optionally, every chapter
+
+    Each partition is read in ``createdAt`` order. Before the offset reaches
+    the API's 10000 results window the crawl restarts from the last
+    ``createdAt`` seen, so partitions of any size are read whole. The position
+    is checkpointed after every page; objects are handed to ``sink`` (e.g.
+    ``SQLiteStore.save_many``) before, so a page may be delivered twice after
+    a crash but never lost.
+
+    Run one crawler per process, all with the same queue. Give them the same
+    broker (see `mangadex.broker`) to share the rate limit::
+
+        queue = md.SQLiteWorkQueue("crawl.db")
+        queue.put(md.partition_catalog())
+        client = md.MangaDexClient(broker="/run/mangadex.sock")
+        store = md.SQLiteStore("catalog.db")
+        md.Crawler(client, queue, store.save_many).run()
+    """
+
+    def __init__(
+        self,
+        client,
+        queue: WorkQueue,
+        sink: Callable[[List[Any]], Any],
+        feeds: bool = True,
+        page_size: int = 100,
+        feed_page_size: int = 500,
+        lease: float = 300.0,
+        worker: Optional[str] = None,
+        window: int = RESULT_WINDOW,
+    ) -> None:
+        """Crawler
+
+        Args:
+            client (MangaDexClient): Client sending the requests.
+            queue (WorkQueue): Queue the partitions are taken from.
+            sink (Callable): Called with every page of Manga and Chapter objects.
+            feeds (bool, optional): Also crawl the chapters of every manga. Defaults to True.
+            page_size (int, optional): Manga per request, up to 100.
+            feed_page_size (int, optional): Chapters per request, up to 500.
+            lease (float, optional): Seconds a partition stays claimed without a checkpoint.
+            worker (str, optional): Name of the worker. Host, process and thread by default.
+            window (int, optional): Largest offset + limit of the API. Defaults to 10000.
+        """
+        self.client = client
+        self.queue = queue
+        self.sink = sink
+        self.feeds = feeds
+        self.page_size = page_size
+        self.feed_page_size = feed_page_size
+        self.lease = lease
+        if worker is None:
+            worker = f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+        self.worker = worker
+        self.window = window
+
+    def __repr__(self) -> str:
+        return f"Crawler(worker = {self.worker}, queue = {self.queue})"
+
+    def run(self, max_partitions: Optional[int] = None) -> int:
+        """Crawls partitions until the queue is empty
+
+        Args:
+            max_partitions (int, optional): Stop after this many partitions.
+
+        Returns:
+            int: Number of partitions completed by this worker
+        """
+        completed = 0
+        while max_partitions is None or completed < max_partitions:
+            claimed = self.queue.claim(self.worker, self.lease)
+            if claimed is None:
+                break
+            partition, cursor = claimed
+            try:
+                finished = self.crawl(partition, cursor)
+            except Exception as e:
+                logger.exception("crawl of partition %s failed", partition.key)
+                self.queue.fail(partition.key, self.worker, f"{type(e).__name__}: {e}")
+                continue
+            if finished:
+                self.queue.complete(partition.key, self.worker)
+                completed += 1
+        return completed
+
+    def crawl(self, partition: Partition, cursor: Union[dict, None] = None) -> bool:
+        """Crawls one partition from ``cursor``
+
+        Returns:
+            bool: False when the lease was lost to another worker, which carries on
+        """
+        cursor = dict(cursor or {})
+        since = cursor.get("since") or partition.since.strftime(_DATE_FORMAT)
+        offset = cursor.get("offset", 0)
+        last = cursor.get("last", since)
+        skip = set(cursor.get("skip", ()))
+        while True:
+            mangas = self.client.manga.get_manga_list(
+                limit=self.page_size,
+                offset=offset,
+                createdAtSince=since,
+                order={"createdAt": "asc"},
+                **partition.filters,
+            )
+            page = [
+                manga for manga in mangas
+                if partition.until is None or _utc(manga.created_at) < partition.until
+            ]
+            fresh = [manga for manga in page if manga.manga_id not in skip]
+            if fresh:
+                self.sink(fresh)
+            if self.feeds:
+                for manga in fresh:
+                    self.crawl_feed(manga.manga_id)
+            if len(mangas) < self.page_size or len(page) < len(mangas):
+                return True
+            since, offset, last, skip = self.__next_position(
+                since, offset, last, skip, page, self.page_size, lambda manga: manga.manga_id
+            )
+            position = {"since": since, "offset": offset, "last": last, "skip": sorted(skip)}
+            if not self.queue.checkpoint(partition.key, self.worker, position, self.lease):
+                logger.warning("lease of partition %s was lost", partition.key)
+                return False
+
+    def crawl_feed(self, manga_id: str) -> int:
+        """Hands every chapter of a manga to the sink
+
+        Returns:
+            int: Number of chapters
+        """
+        since, offset, skip = CATALOG_START.strftime(_DATE_FORMAT), 0, set()
+        last = since
+        count = 0
+        while True:
+            chapters = self.client.manga.manga_feed(
+                manga_id,
+                limit=self.feed_page_size,
+                offset=offset,
+                createdAtSince=since,
+                order={"createdAt": "asc"},
+                contentRating=list(CONTENT_RATINGS),
+            )
+            fresh = [chapter for chapter in chapters if chapter.chapter_id not in skip]
+            if fresh:
+                self.sink(fresh)
+                count += len(fresh)
+            if len(chapters) < self.feed_page_size:
+                return count
+            since, offset, last, skip = self.__next_position(
+                since,
+                offset,
+                last,
+                skip,
+                chapters,
+                self.feed_page_size,
+                lambda chapter: chapter.chapter_id,
+            )
+
+    def __next_position(
+        self, since: str, offset: int, last: str, skip: set, page: list, limit: int, key: Callable
+    ) -> tuple:
+        # ``skip`` holds the items read so far created at the second ``last``,
+        # over as many pages as that second spans
+        skip = set(skip)
+        for item in page:
+            created = _created_second(item)
+            if created is not None and created > last:
+                last, skip = created, set()
+            skip.add(key(item))
+        if offset + 2 * limit <= self.window:
+            return since, offset + limit, last, skip
+        # restart from the last createdAt: createdAtSince is inclusive and has
+        # second precision, the items of that second already read are skipped
+        if len(skip) >= self.window:
+            raise ValueError(f"More than {self.window} results created at {last}")
+        return last, 0, last, skip
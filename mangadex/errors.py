@@ -1,18 +1,21 @@
 """
 Module for error class declaration
 """
-from requests import Response
-from typing_extensions import Union
+from typing import TYPE_CHECKING, Union
+
+if TYPE_CHECKING:
+    from requests import Response
 
 
 class ApiError(Exception):
 
     def __init__(
-            self, resp: Union[Response, dict], message="The api responded with the error"
+            self, resp: Union["Response", dict], message="The api responded with the error"
     ) -> None:
         self.resp = resp
         self.details = ""
-        if isinstance(self.resp, Response):
+        # duck typed so that importing the errors doesn't import requests
+        if hasattr(self.resp, "status_code"):
             self.code = self.resp.status_code
             self.details = self.resp.reason
 
@@ -44,3 +47,19 @@ class ApiClientError(BaseError):
         super(ApiClientError, self).__init__(data, message=message)
         self.data = data
         self.message = message
+
+
+class CassetteError(BaseError):
+    """Raised when a request being replayed was never recorded in the cassette."""
+    def __init__(self, data: dict, message: str) -> None:
+        super(CassetteError, self).__init__(data, message=message)
+        self.data = data
+        self.message = message
+
+
+class BrokerError(BaseError):
+    """Raised when the rate limit and token broker can't be reached or refuses a request."""
+    def __init__(self, data: dict, message: str) -> None:
+        super(BrokerError, self).__init__(data, message=message)
+        self.data = data
+        self.message = message
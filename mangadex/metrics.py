@@ -0,0 +1,525 @@
+"""Module providing per request events, metrics and tracing adapters"""
+from __future__ import absolute_import
+
+import bisect
+import functools
+import re
+import threading
+import time
+import tracemalloc
+
+from typing_extensions import Dict, List, Tuple, Union
+
+_UUID = re.compile(r"[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}")
+_AT_HOME_DATA = re.compile(r"^/data(-saver)?/[0-9a-fA-F]+/.+$")
+_SCHEME_HOST = re.compile(r"^[a-zA-Z][a-zA-Z0-9+.-]*://[^/]+")
+
+_local = threading.local()
+
+
+def route_template(url: str) -> str:
+    """The route of a URL with ids replaced, e.g. ``/manga/{id}/feed``
+
+    Args:
+        url (str): The full request URL
+
+    Returns:
+        str: The path template, without host and query
+    """
+    path = _SCHEME_HOST.sub("", url.split("?", 1)[0]) or "/"
+    if _AT_HOME_DATA.match(path):
+        return "/data-saver/{hash}/{file}" if path.startswith("/data-saver") else "/data/{hash}/{file}"
+    return _UUID.sub("{id}", path).rstrip("/") or "/"
+
+
+class RequestEvent:
+    """What happened during one request
+
+    Timings are in seconds. ``ttfb`` is the time until the response headers were
+    parsed; ``dns`` and ``connect`` are only filled by transports able to measure
+    them. ``cache`` is ``"replay"`` for responses coming from a cassette; cache
+    lookups are separate events, with ``cache`` set to ``"hit"`` or ``"miss"`` and
+    no status, emitted by `cache_lookup`.
+    """
+
+    __slots__ = (
+        "method", "url", "route", "status", "request_bytes", "response_bytes",
+        "content_encoding", "started_at", "dns", "connect", "ttfb", "total", "retries", "cache",
+        "rate_limit_wait", "error", "_started",
+    )
+
+    def __init__(self, method: str, url: str, request_bytes: int = 0) -> None:
+        self.method = method
+        self.url = url
+        self.route = route_template(url)
+        self.status: Union[int, None] = None
+        self.request_bytes = request_bytes
+        self.response_bytes = 0
+        self.content_encoding: Union[str, None] = None
+        self.started_at = time.time()
+        self.dns: Union[float, None] = None
+        self.connect: Union[float, None] = None
+        self.ttfb: Union[float, None] = None
+        self.total: float = 0.0
+        self.retries = 0
+        self.cache: Union[str, None] = None
+        self.rate_limit_wait = 0.0
+        self.error: Union[BaseException, None] = None
+        self._started = time.perf_counter()
+
+    def __repr__(self) -> str:
+        return (
+            f"RequestEvent(method = {self.method}, route = {self.route}, status = {self.status}, "
+            f"bytes = {self.response_bytes}, total = {self.total:.4f}, ttfb = {self.ttfb}, "
+            f"retries = {self.retries}, cache = {self.cache}, "
+            f"rate_limit_wait = {self.rate_limit_wait:.4f}, error = {self.error!r})"
+        )
+
+    def finish(
+        self, resp=None, error: Union[BaseException, None] = None, stream: bool = False
+    ) -> None:
+        """Fills the result of the request
+
+        The body of a ``stream`` response is not read, its size comes from the
+        Content-Length header (the compressed size when it is compressed).
+        """
+        self.total = time.perf_counter() - self._started
+        if error is not None:
+            self.error = error
+        if resp is None:
+            return
+        self.status = resp.status_code
+        self.content_encoding = resp.headers.get("Content-Encoding")
+        if stream:
+            self.response_bytes = int(resp.headers.get("Content-Length") or 0)
+        else:
+            content = resp.content
+            self.response_bytes = len(content) if content is not None else 0
+        elapsed = getattr(resp, "elapsed", None)
+        if elapsed is not None and self.ttfb is None and self.cache != "replay":
+            self.ttfb = elapsed.total_seconds()
+
+
+def current_event() -> Union[RequestEvent, None]:
+    """The event of the request in progress on this thread, for layers to annotate"""
+    return getattr(_local, "event", None)
+
+
+def _set_current_event(event: Union[RequestEvent, None]) -> Union[RequestEvent, None]:
+    previous = getattr(_local, "event", None)
+    _local.event = event
+    return previous
+
+
+def cache_lookup(url: str, hit: bool, method: str = "GET") -> None:
+    """Emits the event of a cache lookup, when hooks are registered"""
+    from .url_models import URLRequest
+
+    if not URLRequest.hooks:
+        return
+    event = RequestEvent(method, url)
+    event.cache = "hit" if hit else "miss"
+    URLRequest.emit(event)
+
+
+# Prometheus style metrics
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(
+        f'{name}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+        for name, value in zip(names, values)
+    )
+    return "{" + pairs + "}"
+
+
+class Counter:
+    """Monotonic counter with labels"""
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.values: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: tuple = (), amount: float = 1.0) -> None:
+        with self._lock:
+            self.values[labels] = self.values.get(labels, 0.0) + amount
+
+    def get(self, labels: tuple = ()) -> float:
+        return self.values.get(labels, 0.0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self.values.items()):
+            lines.append(f"{self.name}{_labels(self.labels, labels)} {value:g}")
+        return lines
+
+
+class Histogram:
+    """Cumulative bucket histogram with labels"""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [bucket counts..., +Inf count, sum]
+        self.values: Dict[tuple, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, labels: tuple = ()) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self.values.get(labels)
+            if series is None:
+                series = self.values[labels] = [0.0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def count(self, labels: tuple = ()) -> int:
+        series = self.values.get(labels)
+        return int(sum(series[:-1])) if series else 0
+
+    def sum(self, labels: tuple = ()) -> float:
+        series = self.values.get(labels)
+        return series[-1] if series else 0.0
+
+    def quantile(self, q: float, labels: tuple = ()) -> Union[float, None]:
+        """Upper bound of the bucket holding the ``q`` quantile"""
+        series = self.values.get(labels)
+        if not series:
+            return None
+        target = q * sum(series[:-1])
+        seen = 0.0
+        for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+            seen += count
+            if seen >= target:
+                return bound
+        return float("inf")
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labels, series in sorted(self.values.items()):
+            cumulative = 0.0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                lines.append(
+                    f"{self.name}_bucket{_labels(self.labels + ('le',), labels + (le,))} {cumulative:g}"
+                )
+            lines.append(f"{self.name}_sum{_labels(self.labels, labels)} {series[-1]:g}")
+            lines.append(f"{self.name}_count{_labels(self.labels, labels)} {cumulative:g}")
+        return lines
+
+
+class Metrics:
+    """Request metrics fed by `RequestEvent` s
+
+    It is a hook itself: ``URLRequest.add_hook(metrics)``, or `install`.
+    ``render`` gives the Prometheus text format, ``snapshot`` a plain dict.
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        self.profiler: Union["DecodeProfiler", None] = None
+        labels = ("method", "route")
+        self.requests = Counter(
+            "mangadex_requests_total", "Requests sent, by status", labels + ("status",)
+        )
+        self.errors = Counter(
+            "mangadex_request_errors_total", "Requests that raised before a response", labels
+        )
+        self.duration = Histogram(
+            "mangadex_request_duration_seconds", "Total request time", labels, buckets
+        )
+        self.ttfb = Histogram(
+            "mangadex_request_ttfb_seconds", "Time until the response headers", labels, buckets
+        )
+        self.response_bytes = Counter(
+            "mangadex_response_bytes_total", "Response body bytes received", labels
+        )
+        self.retries = Counter("mangadex_retries_total", "Requests retried", labels)
+        self.cache = Counter("mangadex_cache_total", "Cache lookups", ("route", "result"))
+        self.rate_limit_wait = Counter(
+            "mangadex_rate_limit_wait_seconds_total", "Time spent waiting for the rate limiter",
+            labels,
+        )
+        self._series = [
+            self.requests, self.errors, self.duration, self.ttfb, self.response_bytes,
+            self.retries, self.cache, self.rate_limit_wait,
+        ]
+
+    def __call__(self, event: RequestEvent) -> None:
+        labels = (event.method, event.route)
+        if event.cache is not None:
+            self.cache.inc((event.route, event.cache))
+            if event.cache in ("hit", "miss"):
+                return
+        if event.error is not None and event.status is None:
+            self.errors.inc(labels)
+        else:
+            self.requests.inc(labels + (str(event.status),))
+        self.duration.observe(event.total, labels)
+        if event.ttfb is not None:
+            self.ttfb.observe(event.ttfb, labels)
+        if event.response_bytes:
+            self.response_bytes.inc(labels, event.response_bytes)
+        if event.retries:
+            self.retries.inc(labels, event.retries)
+        if event.rate_limit_wait:
+            self.rate_limit_wait.inc(labels, event.rate_limit_wait)
+
+    def install(self) -> "Metrics":
+        """Registers the metrics as a `URLRequest` hook"""
+        from .url_models import URLRequest
+
+        URLRequest.add_hook(self)
+        return self
+
+    def uninstall(self) -> None:
+        """Removes the metrics hook"""
+        from .url_models import URLRequest
+
+        URLRequest.remove_hook(self)
+
+    def profile_decoding(self, sample_rate: float = 0.01, allocations: bool = False) -> "DecodeProfiler":
+        """Enables a `DecodeProfiler` reported by `render` and `snapshot`"""
+        if self.profiler is not None:
+            self.profiler.disable()
+        self.profiler = DecodeProfiler(sample_rate, allocations).enable()
+        return self.profiler
+
+    def add(self, series) -> None:
+        """Adds another `Counter` or `Histogram` to `render` and `snapshot`"""
+        self._series.append(series)
+
+    def render(self) -> str:
+        """Metrics in the Prometheus text exposition format"""
+        lines: List[str] = []
+        for series in self._series:
+            lines.extend(series.render())
+        if self.profiler is not None:
+            lines.extend(self.profiler.render())
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> Dict[str, dict]:
+        """Per route totals: requests, errors, bytes, mean and p99 latency
+
+        Keys are ``"<method> <route>"``, plus ``"decode <decoder>"`` entries when
+        decoding is profiled.
+        """
+        routes: Dict[str, dict] = {}
+        for (method, route, status), count in list(self.requests.values.items()):
+            stats = routes.setdefault(f"{method} {route}", {"requests": 0, "by_status": {}})
+            stats["requests"] += count
+            stats["by_status"][status] = count
+        for key, stats in routes.items():
+            labels = tuple(key.split(" ", 1))
+            stats["errors"] = self.errors.get(labels)
+            stats["bytes"] = self.response_bytes.get(labels)
+            stats["retries"] = self.retries.get(labels)
+            stats["rate_limit_wait"] = self.rate_limit_wait.get(labels)
+            count = self.duration.count(labels)
+            stats["mean_seconds"] = self.duration.sum(labels) / count if count else None
+            stats["p99_seconds"] = self.duration.quantile(0.99, labels)
+        if self.profiler is not None:
+            routes.update(self.profiler.snapshot())
+        return routes
+
+
+# Decode profiling
+
+_profiler = None
+
+
+def active_profiler() -> Union["DecodeProfiler", None]:
+    """The enabled `DecodeProfiler`, if any"""
+    return _profiler
+
+
+def profiled(name: str):
+    """Decorator reporting the calls of a decoder to the enabled `DecodeProfiler`
+
+    With no profiler enabled the only cost is a global lookup per call.
+    """
+
+    key = (name,)
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            profiler = _profiler
+            if profiler is None:
+                return fn(*args, **kwargs)
+            # inlined `DecodeProfiler.call`, unsampled calls stay cheap
+            calls = profiler.calls.values
+            count = calls[key] = calls.get(key, 0) + 1
+            if count % profiler.every:
+                return fn(*args, **kwargs)
+            return profiler.measure(key, fn, args, kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+class DecodeProfiler:
+    """Sampling profiler for the ``*_from_dict`` decoders and JSON parsing
+
+    Every call of a `profiled` decoder is counted, one call in ``1 / sample_rate``
+    is timed. Times are cumulative: a list decoder includes the item decoders it
+    calls. With ``allocations`` the sampled calls also record the memory they
+    allocated and kept, using tracemalloc, which slows every allocation down.
+
+    Usage::
+
+        with DecodeProfiler(sample_rate=0.05) as profiler:
+            manga.get_manga_list(limit=100)
+        print(profiler.snapshot())
+    """
+
+    def __init__(self, sample_rate: float = 0.01, allocations: bool = False) -> None:
+        if not 0 < sample_rate <= 1:
+            raise ValueError("sample_rate must be in (0, 1]")
+        self.every = max(1, int(round(1 / sample_rate)))
+        self.allocations = allocations
+        self.calls = Counter("mangadex_decode_calls_total", "Decoder calls", ("decoder",))
+        self.sampled = Counter(
+            "mangadex_decode_sampled_total", "Decoder calls that were timed", ("decoder",)
+        )
+        self.seconds = Counter(
+            "mangadex_decode_sampled_seconds_total", "Time spent in timed decoder calls",
+            ("decoder",),
+        )
+        self.bytes = Counter(
+            "mangadex_decode_sampled_bytes_total", "Memory kept by timed decoder calls",
+            ("decoder",),
+        )
+        self._started_tracing = False
+
+    def __enter__(self) -> "DecodeProfiler":
+        return self.enable()
+
+    def __exit__(self, *exc_info) -> None:
+        self.disable()
+
+    def enable(self) -> "DecodeProfiler":
+        """Makes this the profiler of every `profiled` decoder"""
+        global _profiler
+        if self.allocations and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        _profiler = self
+        return self
+
+    def disable(self) -> None:
+        """Stops profiling, the recorded numbers are kept"""
+        global _profiler
+        if _profiler is self:
+            _profiler = None
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def call(self, name: str, fn, *args, **kwargs):
+        """Calls ``fn``, timing it when the call is sampled"""
+        # unlocked on purpose: this runs on every decoder call, and a lost
+        # increment between threads only shifts the sampling by one call
+        calls = self.calls.values
+        key = (name,)
+        count = calls[key] = calls.get(key, 0) + 1
+        if count % self.every:
+            return fn(*args, **kwargs)
+        return self.measure(key, fn, args, kwargs)
+
+    def measure(self, key: tuple, fn, args: tuple, kwargs: dict):
+        """Calls ``fn`` and records its time (and allocations) under ``key``"""
+        tracing = self.allocations and tracemalloc.is_tracing()
+        before = tracemalloc.get_traced_memory()[0] if tracing else 0
+        started = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.sampled.inc(key)
+            self.seconds.inc(key, elapsed)
+            if tracing:
+                self.bytes.inc(key, max(0, tracemalloc.get_traced_memory()[0] - before))
+
+    def render(self) -> List[str]:
+        lines: List[str] = []
+        for series in (self.calls, self.sampled, self.seconds, self.bytes):
+            lines.extend(series.render())
+        return lines
+
+    def snapshot(self) -> Dict[str, dict]:
+        """Per decoder calls, mean time and estimated total time"""
+        stats = {}
+        for key, calls in list(self.calls.values.items()):
+            sampled = self.sampled.get(key)
+            mean = self.seconds.get(key) / sampled if sampled else None
+            stats[f"decode {key[0]}"] = {
+                "calls": calls,
+                "sampled": sampled,
+                "mean_seconds": mean,
+                "estimated_seconds": mean * calls if mean is not None else None,
+                "mean_bytes": self.bytes.get(key) / sampled if sampled and self.allocations else None,
+            }
+        return stats
+
+
+class OpenTelemetryHook:
+    """Turns every `RequestEvent` into an OpenTelemetry client span
+
+    Requires the optional ``opentelemetry-api`` package.
+    """
+
+    def __init__(self, tracer=None) -> None:
+        try:
+            from opentelemetry import trace
+        except ImportError as e:
+            raise ImportError(
+                "OpenTelemetryHook needs the opentelemetry-api package: "
+                "pip install opentelemetry-api"
+            ) from e
+        self._trace = trace
+        self.tracer = tracer if tracer is not None else trace.get_tracer("mangadex")
+
+    def __call__(self, event: RequestEvent) -> None:
+        start = int(event.started_at * 1e9)
+        attributes = {
+            "http.request.method": event.method,
+            "http.route": event.route,
+            "url.full": event.url,
+            "http.response.body.size": event.response_bytes,
+            "mangadex.retries": event.retries,
+            "mangadex.rate_limit_wait": event.rate_limit_wait,
+        }
+        if event.status is not None:
+            attributes["http.response.status_code"] = event.status
+        if event.cache is not None:
+            attributes["mangadex.cache"] = event.cache
+        if event.ttfb is not None:
+            attributes["mangadex.ttfb"] = event.ttfb
+        span = self.tracer.start_span(
+            f"{event.method} {event.route}",
+            kind=self._trace.SpanKind.CLIENT,
+            start_time=start,
+            attributes=attributes,
+        )
+        if event.error is not None:
+            span.record_exception(event.error)
+        if event.error is not None or (event.status is not None and event.status >= 400):
+            span.set_status(self._trace.Status(self._trace.StatusCode.ERROR))
+        span.end(end_time=start + int(event.total * 1e9))
@@ -1,40 +1,51 @@
 from __future__ import absolute_import
 
 import datetime
+import threading
 
 from dateutil.parser import parse
-from typing_extensions import Any, Dict, List, Self, Union
+from typing_extensions import Any, Dict, FrozenSet, List, Self, Set, Union
 
 from mangadex.url_models import URLRequest
 
 from .auth import Api, Auth
+from .metrics import profiled
+from .query import AUTHOR_LIST, FOLLOWED_GROUPS, GROUP_LIST, RESULT_WINDOW
+
+parse = profiled("dateutil.parse")(parse)
 
 
 class Author:
     """Class providing Author Information"""
-    def __init__(self, auth=Union[Auth, None]) -> None:
+    def __init__(self, auth: Union[Auth, None] = None, client=None) -> None:
         """Author Information class
 
         Args:
-            auth (Auth, optional): Authentication information. Defaults to Union[Auth, None].
+            auth (Auth, optional): Authentication information. Defaults to None.
+            client (MangaDexClient, optional): Client to share the api, auth and transport of.
         """
-        self.auth = auth
-        self.api = Api()
+        self.auth = client.auth if auth is None and client is not None else auth
+        self.api = client.api if client is not None else Api.shared()
+        self.client = client
 
         self.author_id: str = ""
         self.name: str = ""
         self.image_url: str = ""
         self.bio: Dict[str, str] = {}
+        self.version: int = 1
         self.created_at: datetime.datetime
         self.updated_at: datetime.datetime
         self.mangas: List[str] = []
 
     @classmethod
-    def author_from_dict(cls, resp: dict) -> Self:
+    @profiled("Author.author_from_dict")
+    def author_from_dict(cls, resp: dict, client=None) -> Self:
         """Creates author from JSON
 
         Args:
             resp (dict): Raw data from JSON
+            client (optional): Client whose api and auth the Author uses,
+                `Api.shared()` by default
 
         Raises:
             ValueError: Returned when the JSON doesn't contain Author Information
@@ -50,7 +61,7 @@ class Author:
         if resp["type"] != "author" or not resp:
             raise ValueError(f"The data provided is not Author is : {resp['type']}")
 
-        author = cls()
+        author = cls(client=client)
 
         attributes = resp["attributes"]
 
@@ -58,6 +69,7 @@ class Author:
         author.name = attributes["name"]
         author.image_url = attributes["imageUrl"]
         author.bio = attributes["biography"]
+        author.version = attributes.get("version", 1)
         author.created_at = parse(attributes["createdAt"])
         author.updated_at = parse(attributes["updatedAt"])
         author.mangas = [
@@ -69,11 +81,14 @@ class Author:
         return author
 
     @staticmethod
-    def create_authors_list(resp: dict) -> List["Author"]:
+    @profiled("Author.create_authors_list")
+    def create_authors_list(resp: dict, client=None) -> List["Author"]:
         """Create a list of Authors from JSON
 
         Args:
             resp (dict): Raw data from JSON
+            client (optional): Client whose api and auth the Authors use,
+                `Api.shared()` by default
 
         Returns:
             List[Author]: List of Authors
@@ -82,7 +97,7 @@ class Author:
         resp = resp["data"]
         authors_list = []
         for elem in resp:
-            authors_list.append(Author.author_from_dict(elem))
+            authors_list.append(Author.author_from_dict(elem, client))
         return authors_list
 
     @property
@@ -116,14 +131,17 @@ class Author:
         Returns:
             List[Author]: List of Authors
         """
-        if "ids" in kwargs:
-            kwargs["ids[]"] = kwargs.pop("ids")
+        kwargs = AUTHOR_LIST.normalize(kwargs)
 
         url = f"{self.api.url}/author"
         resp = URLRequest.request_url(
-            url, "GET", timeout=self.api.timeout, params=kwargs
+            url,
+            "GET",
+            timeout=self.api.timeout,
+            transport=self.api.transport,
+            params=kwargs,
         )
-        return list(Author.author_from_dict(author) for author in resp["data"])
+        return list(Author.author_from_dict(author, self.client) for author in resp["data"])
 
     def get_author_by_id(self, author_id: str) -> "Author":
         """Get the Author's information by its id
@@ -135,8 +153,10 @@ class Author:
             Author: The author information
         """
         url = f"{self.api.url}/author/{author_id}"
-        resp = URLRequest.request_url(url, "GET", timeout=self.api.timeout)
-        return Author.author_from_dict(resp)
+        resp = URLRequest.request_url(
+            url, "GET", timeout=self.api.timeout, transport=self.api.transport
+        )
+        return Author.author_from_dict(resp, self.client)
 
     def create_author(
             self, name: str, version: int, return_obj: bool = False
@@ -157,11 +177,12 @@ class Author:
             url,
             "POST",
             timeout=self.api.timeout,
+            transport=self.api.transport,
             params=params,
             headers=self.auth.get_bearer_token(),
         )
         if return_obj:
-            return Author.author_from_dict(resp)
+            return Author.author_from_dict(resp, self.client)
 
     def update_author(
             self,
@@ -187,11 +208,16 @@ class Author:
         if name is not None:
             params["name"] = name
         resp = URLRequest.request_url(
-            url, "PUT", timeout=self.api.timeout, params=params, headers=self.auth.get_bearer_token()
+            url,
+            "PUT",
+            timeout=self.api.timeout,
+            transport=self.api.transport,
+            params=params,
+            headers=self.auth.get_bearer_token(),
         )
 
         if return_obj:
-            return Author.author_from_dict(resp) if return_obj else None
+            return Author.author_from_dict(resp, self.client) if return_obj else None
 
     def delete_author(self, author_id: str) -> None:
         """Deletes an Author
@@ -202,20 +228,26 @@ class Author:
         
         url = f"{self.api.url}/author/{author_id}"
         URLRequest.request_url(
-            url, "DELETE", headers=self.auth.get_bearer_token(), timeout=self.api.timeout
+            url,
+            "DELETE",
+            headers=self.auth.get_bearer_token(),
+            timeout=self.api.timeout,
+            transport=self.api.transport,
         )
 
 
 class ScanlationGroup:
     """Class providing Scanlation Group Information"""
-    def __init__(self, auth=Union[Auth, None]) -> None:
+    def __init__(self, auth: Union[Auth, None] = None, client=None) -> None:
         """Scanlation Group Information class
 
         Args:
-            auth (Auth, optional): Authentication information. Defaults to Union[Auth, None].
+            auth (Auth, optional): Authentication information. Defaults to None.
+            client (MangaDexClient, optional): Client to share the api, auth and transport of.
         """
-        self.auth = auth
-        self.api = Api()
+        self.auth = client.auth if auth is None and client is not None else auth
+        self.api = client.api if client is not None else Api.shared()
+        self.client = client
 
         self.group_id: str = ""
         self.name: List[str] = []
@@ -233,13 +265,19 @@ class ScanlationGroup:
         self.inactive: bool = False
         self.publish_delay: bool = False
         self.relationships: List[Dict[str, Any]] = []
+        self.version: int = 1
+        self.created_at: Union[datetime.datetime, None] = None
+        self.updated_at: Union[datetime.datetime, None] = None
 
     @classmethod
-    def group_from_dict(cls, resp: dict) -> "ScanlationGroup":
+    @profiled("ScanlationGroup.group_from_dict")
+    def group_from_dict(cls, resp: dict, client=None) -> "ScanlationGroup":
         """Creates author from JSON
 
         Args:
             resp (dict): Raw data from JSON
+            client (optional): Client whose api and auth the group uses,
+                `Api.shared()` by default
 
         Raises:
             ValueError: Returned when the JSON doesn't contain Author Information
@@ -256,7 +294,7 @@ class ScanlationGroup:
             raise ValueError(f"The data provided is not Author is : {resp['type']}",
                             )
 
-        group = cls()
+        group = cls(client=client)
 
         attributes = resp["attributes"]
         group.group_id = resp["id"]
@@ -271,13 +309,16 @@ class ScanlationGroup:
         group.manga_updates = attributes["mangaUpdates"]
         group.email = attributes["contactEmail"]
         group.bio = attributes["description"]
-        group.focusedLanguage = attributes["focusedLanguages"]
+        group.focused_language = attributes["focusedLanguages"]
         group.official = attributes["official"]
         if group.official == 'true':
             group.ex_licensed = attributes["exLicensed"]
         group.verified = attributes["verified"]
         group.inactive = attributes["inactive"]
         group.publish_delay = attributes["publishDelay"]
+        group.version = attributes.get("version", 1)
+        group.created_at = parse(attributes["createdAt"]) if attributes.get("createdAt") else None
+        group.updated_at = parse(attributes["updatedAt"]) if attributes.get("updatedAt") else None
         group.relationships = [
             {relations['type']: relations['id']}
             for relations in resp["relationships"]
@@ -286,11 +327,14 @@ class ScanlationGroup:
         return group
 
     @staticmethod
-    def create_group_list(resp) -> List["ScanlationGroup"]:
+    @profiled("ScanlationGroup.create_group_list")
+    def create_group_list(resp, client=None) -> List["ScanlationGroup"]:
         """Create a list of Scanlation Group from JSON
 
         Args:
             resp (dict): Raw data from JSON
+            client (optional): Client whose api and auth the groups use,
+                `Api.shared()` by default
 
         Returns:
             List[ScanlationGroup]: List of Scanlation Group
@@ -298,7 +342,7 @@ class ScanlationGroup:
         resp = resp["data"]
         group_list = []
         for elem in resp:
-            group_list.append(ScanlationGroup().group_from_dict(elem))
+            group_list.append(ScanlationGroup.group_from_dict(elem, client))
         return group_list
 
     @property
@@ -308,6 +352,13 @@ class ScanlationGroup:
         """
         return f"{self.api.url}/group/{self.group_id}"
 
+    @property
+    def focusedLanguage(self) -> str:
+        """
+        The focused languages, old name of `focused_language` kept for compatibility
+        """
+        return self.focused_language
+
     def __eq__(self, other: Self) -> bool:
         my_vals = [self.group_id, self.name]
         other_vals = [other.group_id, other.name]
@@ -331,14 +382,17 @@ class ScanlationGroup:
         Returns:
             List[ScanlationGroup]: List of Scanlation Groups
         """
-        if "ids" in kwargs:
-            kwargs["ids[]"] = kwargs.pop("ids")
+        kwargs = GROUP_LIST.normalize(kwargs)
 
         url = f"{self.api.url}/group"
         resp = URLRequest.request_url(
-            url, "GET", timeout=self.api.timeout, params=kwargs
+            url,
+            "GET",
+            timeout=self.api.timeout,
+            transport=self.api.transport,
+            params=kwargs,
         )
-        return list(ScanlationGroup.group_from_dict(author) for author in resp["data"])
+        return list(ScanlationGroup.group_from_dict(author, self.client) for author in resp["data"])
 
     def get_group_by_id(self, group_id: str) -> "ScanlationGroup":
         """Get the Scanlation Group's information by its id
@@ -350,8 +404,10 @@ class ScanlationGroup:
             ScanlationGroup: The author information
         """
         url = f"{self.api.url}/group/{group_id}"
-        resp = URLRequest.request_url(url, "GET", timeout=self.api.timeout)
-        return ScanlationGroup.group_from_dict(resp)
+        resp = URLRequest.request_url(
+            url, "GET", timeout=self.api.timeout, transport=self.api.transport
+        )
+        return ScanlationGroup.group_from_dict(resp, self.client)
 
     def create_group(
             self, name: str, version: int, return_obj: bool = False
@@ -373,6 +429,7 @@ class ScanlationGroup:
             url,
             "POST",
             timeout=self.api.timeout,
+            transport=self.api.transport,
             params=params,
             headers=self.auth.get_bearer_token(),
         )
@@ -403,7 +460,12 @@ class ScanlationGroup:
         if name is not None:
             params["name"] = name
         resp = URLRequest.request_url(
-            url, "PUT", timeout=self.api.timeout, params=params, headers=self.auth.get_bearer_token()
+            url,
+            "PUT",
+            timeout=self.api.timeout,
+            transport=self.api.transport,
+            params=params,
+            headers=self.auth.get_bearer_token(),
         )
 
         if return_obj:
@@ -418,15 +480,21 @@ class ScanlationGroup:
         
         url = f"{self.api.url}/group/{group_id}"
         URLRequest.request_url(
-            url, "DELETE", headers=self.auth.get_bearer_token(), timeout=self.api.timeout
+            url,
+            "DELETE",
+            headers=self.auth.get_bearer_token(),
+            timeout=self.api.timeout,
+            transport=self.api.transport,
         )
 
 
 class User:
     """Class providing user information"""
-    def __init__(self, auth: Union[Auth, None]):
-        self.auth = auth
-        self.api = Api()
+    def __init__(self, auth: Union[Auth, None] = None, client=None):
+        self.auth = client.auth if auth is None and client is not None else auth
+        self.api = client.api if client is not None else Api.shared()
+        self.client = client
+        self.user_state = client.user_state if client is not None else None
 
         self.id = None
         self.username = None
@@ -453,11 +521,14 @@ class User:
                 roles = {self.roles}, relations = {self.relations})")
 
     @classmethod
-    def user_from_dict(cls, data: dict) -> "User":
+    @profiled("User.user_from_dict")
+    def user_from_dict(cls, data: dict, client=None) -> "User":
         """Creates userfrom JSON
 
         Args:
             resp (dict): Raw data from JSON
+            client (optional): Client whose api and auth the User uses,
+                `Api.shared()` by default
 
         Raises:
             ValueError: Returned when the JSON doesn't contain Author Information
@@ -474,7 +545,7 @@ class User:
         attributes = data["attributes"]
         relationships = data["relationships"]
 
-        user = cls(auth=None)  # No need to pass auth here
+        user = cls(client=client)
         user.id = data["id"]
         user.username = attributes["username"]
         user.roles = [' '.join([word.title() for word in role.split('_')])
@@ -487,11 +558,14 @@ class User:
         return user
 
     @staticmethod
-    def create_user_list(resp: dict) -> List["User"]:
+    @profiled("User.create_user_list")
+    def create_user_list(resp: dict, client=None) -> List["User"]:
         """Create a list of User from JSON
 
         Args:
             resp (dict): Raw data from JSON
+            client (optional): Client whose api and auth the Users use,
+                `Api.shared()` by default
 
         Returns:
             List[User]: List of Authors
@@ -499,25 +573,35 @@ class User:
         resp = resp["data"]
         user_list = []
         for elem in resp:
-            user_list.append(User.user_from_dict(elem))
+            user_list.append(User.user_from_dict(elem, client))
         return user_list
 
     def get_user_list(self):
         pass
 
-    def me(self) -> "User":
+    def me(self, cache: bool = True) -> "User":
         """Get your information
 
+        Args:
+            cache (bool, optional): Answer from the client's `UserStateCache`. Defaults to True.
+
         Returns:
             User: Your information
         """
         url = f"{self.api.url}/user/me"
-        resp = URLRequest.request_url(
-            url, "GET",
-            timeout=self.auth.timeout,
-            headers=self.auth.get_bearer_token()
-        )
-        return User.user_from_dict(resp)
+
+        def fetch() -> "User":
+            resp = URLRequest.request_url(
+                url, "GET",
+                timeout=self.auth.timeout,
+                transport=self.auth.transport,
+                headers=self.auth.get_bearer_token()
+            )
+            return User.user_from_dict(resp, self.client)
+
+        if cache and self.user_state is not None:
+            return self.user_state.get(self.auth, ("me",), fetch, "/user/me")
+        return fetch()
 
     def get_user(self, user_id: str) -> "User":
         """Get the User's information by its id
@@ -529,14 +613,31 @@ class User:
             User: The user information
         """
         url = f"{self.api.url}/user/{user_id}"
-        resp = URLRequest.request_url(url, "GET", timeout=self.api.timeout)
-        return User.user_from_dict(resp)
+        resp = URLRequest.request_url(
+            url, "GET", timeout=self.api.timeout, transport=self.api.transport
+        )
+        return User.user_from_dict(resp, self.client)
 
 
 class Follows:
-    def __init__(self, auth: Union[Auth, None]):
-        self.auth = auth
-        self.api = Api()
+    """Follows of the logged in user
+
+    `followed_ids` pages through everything the user follows once and caches
+    the ids; the follow and unfollow calls keep the cached sets up to date, a
+    failed one drops the set so the next read fetches it again.
+    """
+
+    KINDS = ("manga", "group", "user")
+
+    def __init__(self, auth: Union[Auth, None] = None, client=None):
+        self.auth = client.auth if auth is None and client is not None else auth
+        self.api = client.api if client is not None else Api.shared()
+        self.client = client
+        self.user_state = client.user_state if client is not None else None
+        self._followed: Dict[str, Set[str]] = {}
+        # follow calls per kind, a fetch overlapping one isn't cached
+        self._writes: Dict[str, int] = {}
+        self._followed_lock = threading.Lock()
 
     def followed_groups(self, **kwargs) -> List["ScanlationGroup"]:
         """ Get information about Scanlation Groups you follow
@@ -549,13 +650,17 @@ class Follows:
         Returns:
             List[ScanlationGroup]: List of Scanlation Groups
         """
-        if "translatedLanguage" in kwargs:
-            kwargs["translatedLanguage[]"] = kwargs.pop("translatedLanguage")
+        kwargs = FOLLOWED_GROUPS.normalize(kwargs)
         url = f"{self.api.url}/user/follows/group"
         resp = URLRequest.request_url(
-            url, "GET", timeout=self.api.timeout, params=kwargs, headers=self.auth.get_bearer_token()
+            url,
+            "GET",
+            timeout=self.api.timeout,
+            transport=self.api.transport,
+            params=kwargs,
+            headers=self.auth.get_bearer_token(),
         )
-        return ScanlationGroup.create_group_list(resp)
+        return ScanlationGroup.create_group_list(resp, self.client)
 
     def followed_users(self, **kwargs) -> List["User"]:
         """ Get information about users you follow
@@ -569,9 +674,108 @@ class Follows:
         """
         url = f"{self.api.url}/user/follows/user"
         resp = URLRequest.request_url(
-            url, "GET", timeout=self.api.timeout, params=kwargs, headers=self.auth.get_bearer_token()
+            url,
+            "GET",
+            timeout=self.api.timeout,
+            transport=self.api.transport,
+            params=kwargs,
+            headers=self.auth.get_bearer_token(),
         )
-        return User.create_user_list(resp)
+        return User.create_user_list(resp, self.client)
+
+    def followed_ids(self, kind: str = "manga", refresh: bool = False) -> FrozenSet[str]:
+        """Ids of every manga, group or user you follow, cached after the first call
+
+        The follows are paged like searches, so only the first 10000 can be
+        read; past that the set would be incomplete and an error is raised.
+
+        Args:
+            kind (str, optional): ``"manga"``, ``"group"`` or ``"user"``. Defaults to manga.
+            refresh (bool, optional): Fetch the ids again instead of using the cache.
+
+        Raises:
+            ValueError: More than 10000 follows of this kind
+
+        Returns:
+            FrozenSet[str]: The followed ids
+        """
+        self.__check_kind(kind)
+        with self._followed_lock:
+            cached = self._followed.get(kind)
+            if cached is not None and not refresh:
+                return frozenset(cached)
+            writes = self._writes.get(kind, 0)
+        url = f"{self.api.url}/user/follows/{kind}"
+        ids: Set[str] = set()
+        offset, total = 0, 1
+        while offset < total:
+            resp = URLRequest.request_url(
+                url,
+                "GET",
+                timeout=self.api.timeout,
+                transport=self.api.transport,
+                params={"limit": 100, "offset": offset},
+                headers=self.auth.get_bearer_token(),
+            )
+            total = resp["total"]
+            if total > RESULT_WINDOW:
+                raise ValueError(
+                    f"{total} {kind} follows, only the first {RESULT_WINDOW} can be listed"
+                )
+            ids.update(entity["id"] for entity in resp["data"])
+            offset += 100
+        with self._followed_lock:
+            if self._writes.get(kind, 0) == writes:
+                self._followed[kind] = ids
+        return frozenset(ids)
+
+    def invalidate(self, kind: Union[str, None] = None) -> None:
+        """Drops the cached ids of ``kind``, or of every kind"""
+        with self._followed_lock:
+            if kind is None:
+                self._followed.clear()
+            else:
+                self._followed.pop(kind, None)
+
+    def __check_kind(self, kind: str) -> None:
+        if kind not in self.KINDS:
+            raise ValueError(f"Unknown follow kind {kind!r}, expected one of {self.KINDS}")
+
+    def set_following(self, kind: str, entity_id: str, follow: bool = True) -> None:
+        """Follows or unfollows a manga, group or user, updating the cached ids
+
+        Args:
+            kind (str): ``"manga"``, ``"group"`` or ``"user"``.
+            entity_id (str): Id of the manga, group or user.
+            follow (bool, optional): False to unfollow. Defaults to True.
+        """
+        self.__check_kind(kind)
+        url = f"{self.api.url}/{kind}/{entity_id}/follow"
+        with self._followed_lock:
+            self._writes[kind] = self._writes.get(kind, 0) + 1
+        try:
+            URLRequest.request_url(
+                url,
+                "POST" if follow else "DELETE",
+                headers=self.auth.get_bearer_token(),
+                timeout=self.api.timeout,
+                transport=self.api.transport,
+            )
+        except Exception:
+            # the request may still have been applied
+            self.invalidate(kind)
+            raise
+        with self._followed_lock:
+            cached = self._followed.get(kind)
+            if cached is not None:
+                if follow:
+                    cached.add(entity_id)
+                else:
+                    cached.discard(entity_id)
+        if kind == "manga" and self.user_state is not None:
+            # the followed manga isn't known here, and removing one would shift
+            # the cached pages after it: the list is fetched again
+            self.user_state.invalidate(self.auth, "mangalist")
 
     def follow_manga(self, manga_id: str) -> None:
         """Follow a manga
@@ -579,8 +783,7 @@ class Follows:
         Args:
             manga_id: The manga you want to follow
         """
-        url = f"{self.api.url}/manga/{manga_id}/follow"
-        URLRequest.request_url(url, "POST", headers=self.auth.get_bearer_token(), timeout=self.api.timeout)
+        self.set_following("manga", manga_id)
 
     def unfollow_manga(self, manga_id: str) -> None:
         """Follow a manga
@@ -588,8 +791,39 @@ class Follows:
         Args:
             manga_id: The manga you want to un follow
         """
-        url = f"{self.api.url}/manga/{manga_id}/follow"
-        URLRequest.request_url(url, "DELETE", headers=self.auth.get_bearer_token(), timeout=self.api.timeout)
+        self.set_following("manga", manga_id, follow=False)
+
+    def follow_group(self, group_id: str) -> None:
+        """Follow a scanlation group
+
+        Args:
+            group_id: The group you want to follow
+        """
+        self.set_following("group", group_id)
+
+    def unfollow_group(self, group_id: str) -> None:
+        """Unfollow a scanlation group
+
+        Args:
+            group_id: The group you want to un follow
+        """
+        self.set_following("group", group_id, follow=False)
+
+    def follow_user(self, user_id: str) -> None:
+        """Follow a user
+
+        Args:
+            user_id: The user you want to follow
+        """
+        self.set_following("user", user_id)
+
+    def unfollow_user(self, user_id: str) -> None:
+        """Unfollow a user
+
+        Args:
+            user_id: The user you want to un follow
+        """
+        self.set_following("user", user_id, follow=False)
 
 
 if __name__ == '__main__':
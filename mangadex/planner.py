@@ -0,0 +1,213 @@
+"""Module running searches past the API's 10000 results window"""
+from __future__ import absolute_import
+
+import datetime
+import math
+
+from typing_extensions import Any, Callable, Dict, List, Optional
+
+from .query import CHAPTER_LIST, MANGA, RESULT_WINDOW, QuerySchema
+from .url_models import URLRequest
+
+_DATE_FORMAT = "%Y-%m-%dT%H:%M:%S"
+# before the oldest createdAt of the catalog
+_EARLIEST = datetime.datetime(2000, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def _format(value: datetime.datetime) -> str:
+    return value.astimezone(datetime.timezone.utc).strftime(_DATE_FORMAT)
+
+
+class Slice:
+    """Part of a search with at most a window of results: those created in [since, until)
+
+    ``until`` None means up to now.
+    """
+
+    __slots__ = ("since", "until", "count")
+
+    def __init__(
+        self, since: datetime.datetime, until: Optional[datetime.datetime], count: int
+    ) -> None:
+        self.since = since
+        self.until = until
+        self.count = count
+
+    def __repr__(self) -> str:
+        return f"Slice(since = {self.since}, until = {self.until}, count = {self.count})"
+
+
+class _Endpoint:
+    __slots__ = ("path", "schema", "fetch", "key")
+
+    def __init__(self, path: str, schema: QuerySchema, fetch: Callable, key: Callable) -> None:
+        self.path = path
+        self.schema = schema
+        self.fetch = fetch
+        self.key = key
+
+
+class QueryPlanner:
+    """Splits a search by ``createdAt`` until every slice fits in the results window
+
+    The number of results created since a date is one ``limit=1`` request, so
+    a slice is split in two by counting at its middle, until every slice has
+    at most ``window`` results. All the pages of all the slices are then
+    fetched at once on the client's threads and merged, without duplicates,
+    in ``createdAt`` order. The requests are the pages of the results plus a
+    few counts per slice.
+
+    Usage::
+
+        planner = md.QueryPlanner(client)
+        mangas = planner.manga(includedTags=[romance_id], status=["completed"])
+    """
+
+    def __init__(self, client, window: int = RESULT_WINDOW, page_size: int = 100) -> None:
+        """Query planner
+
+        Args:
+            client (MangaDexClient): Client sending the requests.
+            window (int, optional): Results reachable by paging one query. Defaults to 10000.
+            page_size (int, optional): Results per request, up to 100.
+        """
+        self.client = client
+        self.window = window
+        self.page_size = page_size
+
+    def __repr__(self) -> str:
+        return f"QueryPlanner(window = {self.window}, page_size = {self.page_size})"
+
+    def __manga_endpoint(self) -> _Endpoint:
+        return _Endpoint(
+            "manga", MANGA, self.client.manga.get_manga_list, lambda manga: manga.manga_id
+        )
+
+    def __chapter_endpoint(self) -> _Endpoint:
+        return _Endpoint(
+            "chapter",
+            CHAPTER_LIST,
+            self.client.chapter.get_chapter_list,
+            lambda chapter: chapter.chapter_id,
+        )
+
+    def plan_manga(self, **filters) -> List[Slice]:
+        """The slices of a `Manga.get_manga_list` search"""
+        return self.__plan(self.__manga_endpoint(), filters)
+
+    def plan_chapters(self, **filters) -> List[Slice]:
+        """The slices of a `Chapter.get_chapter_list` search"""
+        return self.__plan(self.__chapter_endpoint(), filters)
+
+    def manga(self, **filters) -> List[Any]:
+        """Every Manga of a `Manga.get_manga_list` search, oldest first
+
+        Takes the filters of `Manga.get_manga_list`; ``limit``, ``offset``,
+        ``order`` and ``createdAtSince`` are set by the planner.
+        """
+        endpoint = self.__manga_endpoint()
+        return self.__run(endpoint, filters, self.__plan(endpoint, filters))
+
+    def chapters(self, **filters) -> List[Any]:
+        """Every Chapter of a `Chapter.get_chapter_list` search, oldest first
+
+        Takes the filters of `Chapter.get_chapter_list`; ``limit``, ``offset``,
+        ``order`` and ``createdAtSince`` are set by the planner.
+        """
+        endpoint = self.__chapter_endpoint()
+        return self.__run(endpoint, filters, self.__plan(endpoint, filters))
+
+    @staticmethod
+    def __check(filters: Dict[str, Any]) -> None:
+        planned = {"limit", "offset", "order", "createdAtSince"} & set(filters)
+        if planned:
+            raise ValueError(f"{', '.join(sorted(planned))} are set by the planner")
+
+    def __count(self, endpoint: _Endpoint, filters: Dict[str, Any], since) -> int:
+        api = self.client.api
+        params = dict(filters, limit=1, createdAtSince=_format(since))
+        resp = URLRequest.request_url(
+            f"{api.url}/{endpoint.path}",
+            "GET",
+            params=endpoint.schema.normalize(params),
+            timeout=api.timeout,
+            transport=api.transport,
+        )
+        return resp["total"]
+
+    def __counts(self, endpoint: _Endpoint, filters: Dict[str, Any], dates: list) -> List[int]:
+        results = self.client.map_concurrent(
+            lambda since: self.__count(endpoint, filters, since), dates
+        )
+        return [result.get() for result in results]
+
+    def __plan(self, endpoint: _Endpoint, filters: Dict[str, Any]) -> List[Slice]:
+        self.__check(filters)
+        # results created since each boundary, the count of [since, until) is the difference
+        since_counts = {_EARLIEST: self.__counts(endpoint, filters, [_EARLIEST])[0], None: 0}
+
+        def piece(since, until) -> Slice:
+            # counts taken at different times may disagree by the results just created
+            return Slice(since, until, max(since_counts[since] - since_counts[until], 0))
+
+        done = []
+        pending = [piece(_EARLIEST, None)]
+        while pending:
+            oversized = []
+            for candidate in pending:
+                (done if candidate.count <= self.window else oversized).append(candidate)
+            if not oversized:
+                break
+            now = datetime.datetime.now(datetime.timezone.utc)
+            middles = []
+            for candidate in oversized:
+                seconds = math.floor(((candidate.until or now) - candidate.since).total_seconds())
+                if seconds <= 1:
+                    raise ValueError(
+                        f"More than {self.window} results created at {_format(candidate.since)}"
+                    )
+                middles.append(candidate.since + datetime.timedelta(seconds=seconds // 2))
+            since_counts.update(zip(middles, self.__counts(endpoint, filters, middles)))
+            pending = []
+            for candidate, middle in zip(oversized, middles):
+                pending.append(piece(candidate.since, middle))
+                pending.append(piece(middle, candidate.until))
+        return sorted((p for p in done if p.count > 0), key=lambda p: p.since)
+
+    def __page(self, endpoint: _Endpoint, filters: Dict[str, Any], piece: Slice, offset: int):
+        return endpoint.fetch(
+            limit=min(self.page_size, self.window - offset),
+            offset=offset,
+            createdAtSince=_format(piece.since),
+            order={"createdAt": "asc"},
+            **filters,
+        )
+
+    def __run(self, endpoint: _Endpoint, filters: Dict[str, Any], slices: List[Slice]) -> list:
+        pages = [
+            (piece, offset)
+            for piece in slices
+            for offset in range(0, piece.count, self.page_size)
+        ]
+        results = self.client.map_concurrent(
+            lambda page: self.__page(endpoint, filters, *page), pages
+        )
+        seen = set()
+        merged = []
+        for (piece, offset), result in zip(pages, results):
+            items = last = result.get()
+            if piece.until is None and offset + self.page_size >= piece.count:
+                # results created since the open slice was counted
+                while len(last) == self.page_size and offset + 2 * self.page_size <= self.window:
+                    offset += self.page_size
+                    last = self.__page(endpoint, filters, piece, offset)
+                    items = items + last
+            for item in items:
+                if piece.until is not None and item.created_at is not None:
+                    if item.created_at >= piece.until:
+                        continue
+                key = endpoint.key(item)
+                if key not in seen:
+                    seen.add(key)
+                    merged.append(item)
+        return merged
@@ -0,0 +1,218 @@
+"""Module declaring the query parameters of the endpoints and encoding them canonically"""
+from __future__ import absolute_import
+
+import functools
+from urllib.parse import urlencode
+
+from typing_extensions import Any, Dict, Iterable, List, Tuple, Union
+
+# results past offset + limit 10000 are refused by the collection endpoints
+RESULT_WINDOW = 10000
+ORDER_DIRECTIONS = ("asc", "desc")
+# every rating, searches without contentRating skip the last two
+CONTENT_RATINGS = ("safe", "suggestive", "erotica", "pornographic")
+
+
+def _freeze(value: Any) -> Any:
+    if isinstance(value, dict):
+        return ("__dict__",) + tuple((k, _freeze(v)) for k, v in value.items())
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return ("__list__",) + tuple(_freeze(v) for v in value)
+    if isinstance(value, str):
+        return value
+    # 1, 1.0 and True are equal keys but encode differently
+    hash(value)  # TypeError for anything else that can't be a cache key
+    return ("__scalar__", type(value), value)
+
+
+def freeze(params: Dict[str, Any]) -> Tuple:
+    """Hashable form of query parameters, the same whatever their order, e.g. to key a cache"""
+    return tuple(sorted(((k, _freeze(v)) for k, v in params.items()), key=lambda item: item[0]))
+
+
+def _is_order(key: str) -> bool:
+    return key.startswith("order[")
+
+
+def canonical_pairs(pairs: Iterable[Tuple[str, Any]]) -> List[Tuple[str, Any]]:
+    """Sorts query pairs so equivalent queries encode the same
+
+    Keys are sorted, and so are the values of a repeated key (``ids[]``,
+    ``includes[]``...), without duplicates. ``order[...]`` keys go where
+    ``order`` sorts but keep their relative order: the first one is the main
+    sort of the results.
+    """
+    grouped: Dict[str, List[Any]] = {}
+    for key, value in pairs:
+        grouped.setdefault(key, []).append(value)
+    keys = sorted(grouped, key=lambda k: "order[" if _is_order(k) else k)
+    return [
+        (key, value)
+        for key in keys
+        for value in sorted(dict.fromkeys(grouped[key]), key=str)
+    ]
+
+
+def _flatten(params: Dict[str, Any]) -> List[Tuple[str, Any]]:
+    pairs = []
+    for key, value in params.items():
+        if value is None:
+            continue
+        if isinstance(value, dict):
+            # {"order": {"createdAt": "asc"}} is sent as order[createdAt]=asc
+            pairs.extend((f"{key}[{k}]", v) for k, v in value.items() if v is not None)
+        elif isinstance(value, (list, tuple, set, frozenset)):
+            pairs.extend((key, v) for v in value)
+        else:
+            pairs.append((key, value))
+    return pairs
+
+
+@functools.lru_cache(maxsize=1024)
+def _encode_frozen(frozen: tuple) -> str:
+    return urlencode(canonical_pairs(_flatten(_thaw(frozen))))
+
+
+def _thaw(frozen: tuple) -> Dict[str, Any]:
+    def thaw(value):
+        if isinstance(value, tuple) and value and value[0] == "__dict__":
+            return {k: thaw(v) for k, v in value[1:]}
+        if isinstance(value, tuple) and value and value[0] == "__list__":
+            return [thaw(v) for v in value[1:]]
+        if isinstance(value, tuple) and value and value[0] == "__scalar__":
+            return value[2]
+        return value
+
+    return {k: thaw(v) for k, v in frozen}
+
+
+def encode_query(params: Union[Dict[str, Any], None]) -> str:
+    """Encodes query parameters in their canonical order
+
+    None values are left out, lists repeat their key and dicts are sent as
+    ``key[subkey]``. The result only depends on what the query means, not on
+    the order the parameters were given in, and it is memoized.
+    """
+    if not params:
+        return ""
+    try:
+        frozen = tuple((k, _freeze(v)) for k, v in params.items())
+    except TypeError:
+        return urlencode(canonical_pairs(_flatten(params)))
+    return _encode_frozen(frozen)
+
+
+class QuerySchema:
+    """Parameters of an endpoint: which ones are arrays and the most results per page
+
+    `normalize` rewrites the arguments of a service method to what the API
+    expects (``ids`` becomes ``ids[]``) and checks ``limit``, ``offset`` and
+    ``order`` before anything is sent.
+    """
+
+    def __init__(
+        self,
+        arrays: Iterable[str] = (),
+        renames: Union[Dict[str, str], None] = None,
+        max_limit: Union[int, None] = None,
+    ) -> None:
+        """Query schema
+
+        Args:
+            arrays (Iterable[str], optional): Parameters sent as ``name[]``.
+            renames (Dict[str, str], optional): Parameters sent under another name.
+            max_limit (int, optional): Largest ``limit`` of the endpoint, None if it has no paging.
+        """
+        self.names = {name: f"{name}[]" for name in arrays}
+        self.names.update(renames or {})
+        self.max_limit = max_limit
+        self.__normalize_frozen = functools.lru_cache(maxsize=256)(self.__normalize_frozen)
+
+    def __repr__(self) -> str:
+        return f"QuerySchema(names = {self.names}, max_limit = {self.max_limit})"
+
+    def normalize(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Renames and validates the parameters, ``params`` is left untouched
+
+        Raises:
+            ValueError: ``limit``, ``offset`` or ``order`` is out of what the API accepts
+        """
+        try:
+            frozen = tuple((k, _freeze(v)) for k, v in params.items())
+        except TypeError:
+            return self.__normalize(params)
+        # new dicts and lists each time, callers may change them
+        return _thaw(self.__normalize_frozen(frozen))
+
+    def __normalize_frozen(self, frozen: tuple) -> tuple:
+        normalized = self.__normalize(_thaw(frozen))
+        return tuple((k, _freeze(v)) for k, v in normalized.items())
+
+    def __normalize(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        normalized = {self.names.get(k, k): v for k, v in params.items()}
+        if self.max_limit is not None:
+            self.__check_window(normalized.get("limit"), normalized.get("offset"))
+        order = normalized.get("order")
+        if order is not None:
+            if not isinstance(order, dict):
+                raise ValueError(f"order must be a dict of field to direction, got {order!r}")
+            for field, direction in order.items():
+                if direction not in ORDER_DIRECTIONS:
+                    raise ValueError(f"order[{field}] must be 'asc' or 'desc', got {direction!r}")
+        return normalized
+
+    def __check_window(self, limit, offset) -> None:
+        limit = 0 if limit is None else int(limit)
+        offset = 0 if offset is None else int(offset)
+        if not 0 <= limit <= self.max_limit:
+            raise ValueError(f"limit must be between 0 and {self.max_limit}, got {limit}")
+        if offset < 0:
+            raise ValueError(f"offset can't be negative, got {offset}")
+        if offset + limit > RESULT_WINDOW:
+            raise ValueError(
+                f"offset + limit can't be over {RESULT_WINDOW}, got {offset + limit}"
+            )
+
+
+AUTHOR_LIST = QuerySchema(arrays=("ids", "includes"), max_limit=100)
+CHAPTER_LIST = QuerySchema(
+    arrays=("ids", "groups", "volume", "translatedLanguage", "contentRating", "includes"),
+    max_limit=100,
+)
+CLIENT_LIST = QuerySchema(arrays=("includes",), max_limit=100)
+COVER_LIST = QuerySchema(arrays=("manga", "ids", "uploaders", "includes"), max_limit=100)
+FOLLOWED_GROUPS = QuerySchema(arrays=("translatedLanguage", "includes"), max_limit=100)
+GROUP_LIST = QuerySchema(arrays=("ids", "includes"), max_limit=100)
+MANGA = QuerySchema(
+    arrays=(
+        "authors",
+        "artist",
+        "artists",
+        "excludedTags",
+        "originalLanguage",
+        "includedTags",
+        "publicationDemographic",
+        "ids",
+        "altTitles",
+        "description",
+        "status",
+        "contentRating",
+        "includes",
+    ),
+    renames={"translatedLanguage": "availableTranslatedLanguage[]"},
+    max_limit=100,
+)
+# POST and PUT bodies of manga, without paging
+MANGA_BODY = QuerySchema(renames=MANGA.names)
+FEED = QuerySchema(
+    arrays=(
+        "translatedLanguage",
+        "originalLanguage",
+        "excludedOriginalLanguage",
+        "contentRating",
+        "excludedGroups",
+        "excludedUploaders",
+        "includes",
+    ),
+    max_limit=500,
+)
@@ -0,0 +1,144 @@
+"""Module for picking one release per chapter out of a feed"""
+from __future__ import absolute_import
+
+import datetime
+
+from typing_extensions import Any, Callable, Dict, Iterable, List, Tuple, Union
+
+from .series import Chapter, _number_key
+
+Scorer = Callable[[Chapter], Any]
+
+_EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def release_key(chapter: Chapter) -> tuple:
+    """Key shared by every upload of the same chapter: (volume, chapter, language)
+
+    Chapters without a number (oneshots, extras) are told apart by title, or
+    kept apart by id when they have no title either.
+    """
+    if chapter.chapter is not None:
+        number = chapter.chapter
+    elif chapter.title:
+        number = f"title:{chapter.title}"
+    else:
+        number = f"id:{chapter.chapter_id}"
+    return (chapter.volume, number, chapter.translated_language)
+
+
+def prefer_groups(group_ids: List[str]) -> Scorer:
+    """Scorer ranking releases by the position of their group in ``group_ids``
+
+    Groups that are not listed rank below every listed group.
+    """
+    ranks = {group_id: len(group_ids) - rank for rank, group_id in enumerate(group_ids)}
+    return lambda chapter: ranks.get(chapter.group_id, 0)
+
+
+def newest(chapter: Chapter) -> datetime.datetime:
+    """Scorer ranking the most recently published release first"""
+    published = chapter.publish_at or chapter.updated_at or _EPOCH
+    return published if published.tzinfo else published.replace(tzinfo=datetime.timezone.utc)
+
+
+def most_pages(chapter: Chapter) -> int:
+    """Scorer ranking the release with the most pages first"""
+    return chapter.pages or 0
+
+
+def combine(*scorers: Scorer) -> Scorer:
+    """Scorer comparing by the first scorer, then by the next ones on ties"""
+    return lambda chapter: tuple(scorer(chapter) for scorer in scorers)
+
+
+def _order_key(key: tuple, language_rank: Dict[str, int]) -> tuple:
+    volume, number, language = key
+    if isinstance(number, float):
+        number_key = (0, number, "")
+    else:
+        number_key = (1, 0.0, number)
+    return (
+        _number_key(volume),
+        number_key,
+        language_rank.get(language, len(language_rank)),
+        language or "",
+    )
+
+
+class ReleaseSelector:
+    """Picks the best release of every (volume, chapter, language) in a feed
+
+    The feed is read once, keeping only the best scored upload per key, so the
+    work is linear in the feed size plus a sort of the distinct chapters.
+    """
+
+    def __init__(
+        self,
+        scorer: Union[Scorer, None] = None,
+        languages: Union[List[str], None] = None,
+    ) -> None:
+        """Release selector
+
+        Args:
+            scorer (Scorer, optional): Callable returning a comparable score for a
+                chapter, higher is better. Defaults to `newest`.
+            languages (List[str], optional): Languages to keep, in order of
+                preference for the reading order. Defaults to every language.
+        """
+        self.scorer = scorer if scorer is not None else newest
+        self.languages = languages
+
+    def __repr__(self) -> str:
+        return f"ReleaseSelector(scorer = {self.scorer}, languages = {self.languages})"
+
+    def best_releases(self, chapters: Iterable[Chapter]) -> Dict[tuple, Chapter]:
+        """Groups the feed by `release_key` and keeps the best scored release
+
+        Args:
+            chapters (Iterable[Chapter]): The feed, in any order
+
+        Returns:
+            Dict[tuple, Chapter]: Best release per (volume, chapter, language)
+        """
+        allowed = set(self.languages) if self.languages is not None else None
+        scorer = self.scorer
+        best: Dict[tuple, Tuple[Any, Chapter]] = {}
+        for chapter in chapters:
+            if allowed is not None and chapter.translated_language not in allowed:
+                continue
+            key = release_key(chapter)
+            score = scorer(chapter)
+            current = best.get(key)
+            if current is None or score > current[0]:
+                best[key] = (score, chapter)
+        return {key: chapter for key, (_, chapter) in best.items()}
+
+    def select(self, chapters: Iterable[Chapter]) -> List[Chapter]:
+        """One release per chapter, in reading order
+
+        Args:
+            chapters (Iterable[Chapter]): The feed, in any order
+
+        Returns:
+            List[Chapter]: The selected releases ordered by volume, chapter and
+                language preference
+        """
+        best = self.best_releases(chapters)
+        language_rank = {lang: rank for rank, lang in enumerate(self.languages or [])}
+        return [
+            best[key] for key in sorted(best, key=lambda key: _order_key(key, language_rank))
+        ]
+
+    def reading_order(self, chapters: Iterable[Chapter]) -> List[str]:
+        """Chapter ids of `select`"""
+        return [chapter.chapter_id for chapter in self.select(chapters)]
+
+
+def select_releases(
+    chapters: Iterable[Chapter],
+    scorer: Union[Scorer, None] = None,
+    languages: Union[List[str], None] = None,
+) -> List[Chapter]:
+    """Shortcut for `ReleaseSelector(scorer, languages).select(chapters)`"""
+    return ReleaseSelector(scorer=scorer, languages=languages).select(chapters)
@@ -0,0 +1,271 @@
+"""Module providing an offline title search index over Manga"""
+from __future__ import absolute_import
+
+import bisect
+import re
+import unicodedata
+
+from typing_extensions import Dict, Iterable, List, Set, Tuple, Union
+
+from .series import Manga
+
+_WORD = re.compile(r"\w+")
+
+_TITLE_WEIGHT = 3.0
+_ALT_TITLE_WEIGHT = 2.0
+_DESCRIPTION_WEIGHT = 0.5
+
+_PREFIX_SCORE = 0.8
+_FUZZY_SCORE = 0.6
+# new tokens inserted one by one into the sorted vocabulary, more are merged with a sort
+_INSORT_MAX = 32
+
+
+def tokenize(text: str) -> List[str]:
+    """Splits a text into normalized, case folded word tokens
+
+    Args:
+        text (str): The text
+
+    Returns:
+        List[str]: The tokens in order of appearance
+    """
+    if not text:
+        return []
+    return _WORD.findall(unicodedata.normalize("NFKC", text).casefold())
+
+
+def trigrams(token: str) -> Set[str]:
+    """Padded character trigrams of a token, used for fuzzy matching"""
+    padded = f"${token}$"
+    return {padded[i:i + 3] for i in range(max(len(padded) - 2, 1))}
+
+
+class TitleIndex:
+    """Inverted index over the title, alt titles and description of Manga
+
+    Every language is indexed. Queries match tokens by prefix, optionally by
+    trigram similarity, and can be restricted to a set of languages. Manga can
+    be added or replaced at any time so the index can follow a stream of
+    parsed objects.
+    """
+
+    def __init__(self, fuzzy_threshold: float = 0.4) -> None:
+        """Creates an empty index
+
+        Args:
+            fuzzy_threshold (float, optional): Minimum trigram similarity (Jaccard)
+                for a fuzzy match. Defaults to 0.4.
+        """
+        self.fuzzy_threshold = fuzzy_threshold
+        self.mangas: Dict[str, Manga] = {}
+        # token -> manga id -> language -> weight
+        self._postings: Dict[str, Dict[str, Dict[str, float]]] = {}
+        self._doc_tokens: Dict[str, Set[str]] = {}
+        self._trigrams: Dict[str, Set[str]] = {}
+        self._sorted_tokens: List[str] = []
+        # tokens added since the last prefix search, not in _sorted_tokens yet
+        self._new_tokens: Set[str] = set()
+
+    def __len__(self) -> int:
+        return len(self.mangas)
+
+    def __contains__(self, manga_id: str) -> bool:
+        return manga_id in self.mangas
+
+    def __repr__(self) -> str:
+        return f"TitleIndex(mangas = {len(self.mangas)}, tokens = {len(self._postings)})"
+
+    @classmethod
+    def from_mangas(cls, mangas: Iterable[Manga], **kwargs) -> "TitleIndex":
+        """Builds an index from Manga objects
+
+        Returns:
+            TitleIndex: The index
+        """
+        index = cls(**kwargs)
+        index.add_many(mangas)
+        return index
+
+    @classmethod
+    def from_store(cls, store, batch_size: int = 1000, **kwargs) -> "TitleIndex":
+        """Builds an index from every Manga in a `SQLiteStore`
+
+        Args:
+            store (SQLiteStore): The local mirror
+            batch_size (int, optional): Manga loaded per query. Defaults to 1000.
+
+        Returns:
+            TitleIndex: The index
+        """
+        index = cls(**kwargs)
+        offset = 0
+        while True:
+            mangas = store.get_manga_list(limit=batch_size, offset=offset)
+            index.add_many(mangas)
+            if len(mangas) < batch_size:
+                return index
+            offset += batch_size
+
+    @staticmethod
+    def __fields(manga: Manga) -> Iterable[Tuple[str, str, float]]:
+        for lang, text in (manga.title or {}).items():
+            yield lang, text, _TITLE_WEIGHT
+        for alt_title in manga.alt_titles or []:
+            for lang, text in alt_title.items():
+                yield lang, text, _ALT_TITLE_WEIGHT
+        for lang, text in (manga.description or {}).items():
+            yield lang, text, _DESCRIPTION_WEIGHT
+
+    def add(self, manga: Manga) -> None:
+        """Indexes a Manga, replacing it if it was already indexed
+
+        Args:
+            manga (Manga): The manga
+        """
+        if manga.manga_id in self.mangas:
+            self.remove(manga.manga_id)
+
+        doc_tokens = set()
+        for lang, text, weight in self.__fields(manga):
+            for token in tokenize(text):
+                postings = self._postings.get(token)
+                if postings is None:
+                    postings = self._postings[token] = {}
+                    for gram in trigrams(token):
+                        self._trigrams.setdefault(gram, set()).add(token)
+                    self._new_tokens.add(token)
+                langs = postings.setdefault(manga.manga_id, {})
+                if langs.get(lang, 0.0) < weight:
+                    langs[lang] = weight
+                doc_tokens.add(token)
+
+        self.mangas[manga.manga_id] = manga
+        self._doc_tokens[manga.manga_id] = doc_tokens
+
+    def add_many(self, mangas: Iterable[Manga]) -> None:
+        """Indexes several Manga"""
+        for manga in mangas:
+            self.add(manga)
+
+    def remove(self, manga_id: str) -> None:
+        """Removes a Manga from the index
+
+        Args:
+            manga_id (str): The manga id
+        """
+        self.mangas.pop(manga_id, None)
+        for token in self._doc_tokens.pop(manga_id, ()):
+            postings = self._postings[token]
+            postings.pop(manga_id, None)
+            if not postings:
+                del self._postings[token]
+                for gram in trigrams(token):
+                    grams = self._trigrams[gram]
+                    grams.discard(token)
+                    if not grams:
+                        del self._trigrams[gram]
+                if token in self._new_tokens:
+                    self._new_tokens.discard(token)
+                else:
+                    del self._sorted_tokens[bisect.bisect_left(self._sorted_tokens, token)]
+
+    def __prefixed(self, prefix: str) -> List[str]:
+        tokens = self._sorted_tokens
+        if len(self._new_tokens) <= _INSORT_MAX:
+            for token in self._new_tokens:
+                bisect.insort(tokens, token)
+        else:
+            # two sorted runs, merged in linear time
+            tokens.extend(sorted(self._new_tokens))
+            tokens.sort()
+        self._new_tokens.clear()
+        start = bisect.bisect_left(tokens, prefix)
+        end = bisect.bisect_left(tokens, prefix + "\U0010ffff", lo=start)
+        return tokens[start:end]
+
+    def __similar(self, token: str) -> Dict[str, float]:
+        query_grams = trigrams(token)
+        shared: Dict[str, int] = {}
+        for gram in query_grams:
+            for candidate in self._trigrams.get(gram, ()):
+                shared[candidate] = shared.get(candidate, 0) + 1
+        similar = {}
+        for candidate, count in shared.items():
+            similarity = count / (len(query_grams) + len(trigrams(candidate)) - count)
+            if similarity >= self.fuzzy_threshold:
+                similar[candidate] = similarity
+        return similar
+
+    def __matches(self, token: str, prefix: bool, fuzzy: bool) -> Dict[str, float]:
+        matches: Dict[str, float] = {}
+        if fuzzy:
+            for candidate, similarity in self.__similar(token).items():
+                matches[candidate] = similarity * _FUZZY_SCORE
+        if prefix:
+            for candidate in self.__prefixed(token):
+                matches[candidate] = max(matches.get(candidate, 0.0), _PREFIX_SCORE)
+        if token in self._postings:
+            matches[token] = 1.0
+        return matches
+
+    def search_ids(
+        self,
+        query: str,
+        languages: Union[Iterable[str], None] = None,
+        prefix: bool = True,
+        fuzzy: bool = False,
+        limit: int = 10,
+    ) -> List[Tuple[str, float]]:
+        """Searches the index, returning scored manga ids
+
+        Every token of the query has to match for a manga to be returned.
+
+        Args:
+            query (str): The text typed by the user
+            languages (Iterable[str], optional): Only match text in these languages.
+            prefix (bool, optional): Match tokens by prefix. Defaults to True.
+            fuzzy (bool, optional): Also match tokens by trigram similarity. Defaults to False.
+            limit (int, optional): Maximum number of results. Defaults to 10.
+
+        Returns:
+            List[Tuple[str, float]]: (manga id, score) pairs, best first
+        """
+        query_tokens = tokenize(query)
+        if not query_tokens:
+            return []
+        languages = set(languages) if languages is not None else None
+
+        scores: Union[Dict[str, float], None] = None
+        for token in query_tokens:
+            token_scores: Dict[str, float] = {}
+            for candidate, quality in self.__matches(token, prefix, fuzzy).items():
+                for manga_id, langs in self._postings[candidate].items():
+                    if scores is not None and manga_id not in scores:
+                        continue
+                    weight = max(
+                        (w for lang, w in langs.items() if languages is None or lang in languages),
+                        default=0.0,
+                    )
+                    score = weight * quality
+                    if score > token_scores.get(manga_id, 0.0):
+                        token_scores[manga_id] = score
+            if scores is None:
+                scores = token_scores
+            else:
+                scores = {
+                    manga_id: scores[manga_id] + score for manga_id, score in token_scores.items()
+                }
+            if not scores:
+                return []
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return ranked[:limit]
+
+    def search(self, query: str, **kwargs) -> List[Manga]:
+        """Searches the index. Accepts the same arguments as `search_ids`
+
+        Returns:
+            List[Manga]: The matching Manga, best first
+        """
+        return [self.mangas[manga_id] for manga_id, _ in self.search_ids(query, **kwargs)]
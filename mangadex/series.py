@@ -1,22 +1,41 @@
 """Module providing Chapter and Manga info"""
 from __future__ import absolute_import
 
+import copy
 import datetime
+import functools
+import threading
+import time
+from collections import OrderedDict
 
 from dateutil.parser import parse
-from typing_extensions import Dict, List, Self, Union
+from typing_extensions import Dict, Iterable, Iterator, List, Self, Union
 
 from mangadex.url_models import URLRequest
 
 from .auth import Api, Auth
+from .metrics import cache_lookup, profiled
+from .query import (
+    CHAPTER_LIST,
+    CONTENT_RATINGS,
+    COVER_LIST,
+    FEED,
+    MANGA,
+    MANGA_BODY,
+    freeze,
+)
+from .streaming import StreamedPage
+
+parse = profiled("dateutil.parse")(parse)
 
 
 class Chapter:
     """Class that retrieves series chapters"""
 
-    def __init__(self, auth: Union[Auth, None] = None) -> None:
-        self.auth = auth
-        self.api = Api()
+    def __init__(self, auth: Union[Auth, None] = None, client=None) -> None:
+        self.auth = client.auth if auth is None and client is not None else auth
+        self.api = client.api if client is not None else Api.shared()
+        self.client = client
 
         self.chapter_id: str = ""
         self.title: str = ""
@@ -28,23 +47,27 @@ class Chapter:
         self.manga_id: str = ""
         self.group_id: str = ""
         self.uploader: str = ""
-        self.created_at: datetime.datetime
-        self.updated_at: datetime.datetime
-        self.publish_at: datetime.datetime
+        self.pages: int = 0
+        self.version: int = 1
+        self.created_at: Union[datetime.datetime, None] = None
+        self.updated_at: Union[datetime.datetime, None] = None
+        self.publish_at: Union[datetime.datetime, None] = None
 
     # Data Processors
 
     @classmethod
-    def chapter_from_dict(cls, resp: dict) -> "Chapter":
+    @profiled("Chapter.chapter_from_dict")
+    def chapter_from_dict(cls, resp: dict, client=None) -> "Chapter":
         """Create a Chapter from JSON
 
         Args:
             resp: Raw JSON data
+            client: Client whose api and auth the Chapter uses, `Api.shared()` by default
 
         Returns:
             Chapter: Chapter information
         """
-        chapter = cls()
+        chapter = cls(client=client)
         try:
             resp = resp["data"]
         except KeyError:
@@ -62,6 +85,8 @@ class Chapter:
             float(attributes["chapter"]) if attributes["chapter"] is not None else None
         )
         chapter.translated_language = attributes["translatedLanguage"]
+        chapter.pages = attributes.get("pages", 0)
+        chapter.version = attributes.get("version", 1)
         chapter.publish_at = parse(attributes["publishAt"]) if attributes.get("publishAt") else None
         chapter.created_at = parse(attributes["createdAt"]) if attributes.get("createdAt") else None
         chapter.updated_at = parse(attributes["updatedAt"]) if attributes.get("updatedAt") else None
@@ -75,22 +100,13 @@ class Chapter:
         return chapter
 
     @staticmethod
-    def __parse_chapter_list_args(params: Dict[str, str]) -> Dict[str, str]:
-        if "groups" in params:
-            params["groups[]"] = params.pop("groups")
-        if "volume" in params:
-            params["volume[]"] = params.pop("volume")
-        if "translatedLanguage" in params:
-            params["translatedLanguage[]"] = params.pop("translatedLanguage")
-
-        return params
-
-    @staticmethod
-    def create_chapter_list(resp: dict) -> List["Chapter"]:
+    @profiled("Chapter.create_chapter_list")
+    def create_chapter_list(resp: dict, client=None) -> List["Chapter"]:
         """Creates a list of Chapters from JSON
 
         Args:
             resp: Raw response from chapter list
+            client: Client whose api and auth the Chapters use, `Api.shared()` by default
 
         Returns:
             List[Chapter]: List of Chapter information
@@ -98,7 +114,7 @@ class Chapter:
         resp = resp["data"]
         chap_list = []
         for elem in resp:
-            chap_list.append(Chapter.chapter_from_dict(elem))
+            chap_list.append(Chapter.chapter_from_dict(elem, client))
         return chap_list
 
     @property
@@ -136,12 +152,16 @@ class Chapter:
         Returns:
             List[Chapter]: List of Chapters
         """
-        params = self.__parse_chapter_list_args(kwargs)
+        params = CHAPTER_LIST.normalize(kwargs)
         url = f"{self.api.url}/chapter/"
         resp = URLRequest.request_url(
-            url, "GET", timeout=self.api.timeout, params=params
+            url,
+            "GET",
+            timeout=self.api.timeout,
+            transport=self.api.transport,
+            params=params,
         )
-        return Chapter.create_chapter_list(resp)
+        return Chapter.create_chapter_list(resp, self.client)
 
     def get_chapter_by_id(self, chapter_id: str) -> "Chapter":
         """Get information about a single chapter
@@ -153,8 +173,10 @@ class Chapter:
             Chapter: Chapter info
         """
         url = f"{self.api.url}/chapter/{chapter_id}"
-        resp = URLRequest.request_url(url, "GET", timeout=self.api.timeout)
-        return Chapter.chapter_from_dict(resp)
+        resp = URLRequest.request_url(
+            url, "GET", timeout=self.api.timeout, transport=self.api.transport
+        )
+        return Chapter.chapter_from_dict(resp, self.client)
 
     def get_manga_volumes_and_chapters(self, manga_id: str, **kwargs) -> Dict[str, str]:
         """Get a series volumes and chapters
@@ -167,14 +189,7 @@ class Chapter:
         Returns:
             Dict[str, str] List of Chapters per volume
         """
-        params = None
-        if "translatedLanguage" in kwargs:
-            params = {"translatedLanguage[]": kwargs["translatedLanguage"]}
-        url = f"{self.api.url}/manga/{manga_id}/aggregate"
-        resp = URLRequest.request_url(
-            url, "GET", timeout=self.api.timeout, params=params
-        )
-        return resp["volumes"]
+        return _fetch_aggregate(self.api, manga_id, **kwargs)["volumes"]
 
     def fetch_chapter_images(self) -> List[str]:  # maybe make this an async function?
         """
@@ -190,8 +205,10 @@ class Chapter:
         -----------
         `ApiError`
         """
-        url = f"https://api.mangadex.org/at-home/server/{self.chapter_id}"
-        image_server_url = URLRequest.request_url(url, "GET", timeout=5)
+        url = f"{self.api.url}/at-home/server/{self.chapter_id}"
+        image_server_url = URLRequest.request_url(
+            url, "GET", timeout=self.api.timeout, transport=self.api.transport
+        )
         self.hash = image_server_url["chapter"]["hash"]
         self.data = image_server_url["chapter"]["data"]
         image_server_url = image_server_url["baseUrl"].replace("\\", "")
@@ -219,9 +236,14 @@ class Chapter:
         headers = self.auth.get_bearer_token()
         headers["Content-Type"] = "application/json"
         resp = URLRequest.request_url(
-            url, "PUT", params=body, headers=headers, timeout=self.api.timeout
+            url,
+            "PUT",
+            params=body,
+            headers=headers,
+            timeout=self.api.timeout,
+            transport=self.api.transport,
         )
-        return self.chapter_from_dict(resp["data"]) if not obj_return else None
+        return self.chapter_from_dict(resp["data"], self.client) if not obj_return else None
 
     def delete_chapter(self, chapter_id: str) -> None:
         """Delete a chapter
@@ -238,6 +260,7 @@ class Chapter:
             "DELETE",
             headers=self.auth.get_bearer_token(),
             timeout=self.api.timeout,
+            transport=self.api.transport,
         )
         if resp["result"] == "error":
             raise ValueError(resp["errors"]["detail"])
@@ -245,12 +268,247 @@ class Chapter:
             return None
 
 
+def _fetch_aggregate(api: Api, manga_id: str, **kwargs) -> dict:
+    params = {}
+    if kwargs.get("translatedLanguage") is not None:
+        params["translatedLanguage[]"] = kwargs["translatedLanguage"]
+    if kwargs.get("groups") is not None:
+        params["groups[]"] = kwargs["groups"]
+    url = f"{api.url}/manga/{manga_id}/aggregate"
+    return URLRequest.request_url(
+        url, "GET", timeout=api.timeout, transport=api.transport, params=params
+    )
+
+
+def _number_key(value: Union[str, None]) -> tuple:
+    """Sort key for volume and chapter numbers, unnumbered ("none") last"""
+    if value is None or value == "none":
+        return (2, 0.0, "")
+    try:
+        return (0, float(value), value)
+    except ValueError:
+        return (1, 0.0, value)
+
+
+class AggregateChapter:
+    """A chapter entry of an `Aggregate`"""
+
+    __slots__ = ("volume", "chapter", "chapter_id", "others", "count", "position")
+
+    def __init__(
+        self, volume: str, chapter: str, chapter_id: str, others: List[str], count: int
+    ) -> None:
+        self.volume = volume
+        self.chapter = chapter
+        self.chapter_id = chapter_id
+        self.others = others
+        self.count = count
+        self.position = 0
+
+    def __eq__(self, other: Self) -> bool:
+        my_vals = [self.volume, self.chapter, self.chapter_id]
+        other_vals = [other.volume, other.chapter, other.chapter_id]
+        return my_vals == other_vals
+
+    def __ne__(self, other: Self) -> bool:
+        return not self.__eq__(other)
+
+    def __repr__(self) -> str:
+        return (
+            f"AggregateChapter(volume = {self.volume}, chapter = {self.chapter}, "
+            f"chapter_id = {self.chapter_id}, others = {self.others}, count = {self.count})"
+        )
+
+
+class Aggregate:
+    """Volumes and chapters of a manga in reading order
+
+    Built once from the `/manga/{id}/aggregate` response. Chapter ids (including
+    the ``others`` releases of the same number) map to their position, so
+    lookups and next/previous navigation don't rescan the volumes.
+    """
+
+    def __init__(self) -> None:
+        self.manga_id: str = ""
+        self.raw: Dict[str, dict] = {}
+        self.volumes: List[str] = []
+        self.chapters: List[AggregateChapter] = []
+        self._positions: Dict[str, int] = {}
+        self._volume_ranges: Dict[str, tuple] = {}
+
+    @classmethod
+    @profiled("Aggregate.aggregate_from_dict")
+    def aggregate_from_dict(cls, resp: dict, manga_id: str = "") -> "Aggregate":
+        """Creates an Aggregate from JSON
+
+        Args:
+            resp: Raw response of the aggregate endpoint, or its ``volumes``
+            manga_id: The manga the response belongs to
+
+        Returns:
+            Aggregate: Ordered volumes and chapters
+        """
+        volumes = resp.get("volumes", resp) if isinstance(resp, dict) else resp
+        if not volumes:  # the API sends [] instead of {} when there is nothing
+            volumes = {}
+
+        aggregate = cls()
+        aggregate.manga_id = manga_id
+        aggregate.raw = volumes
+
+        for volume_key in sorted(volumes, key=_number_key):
+            chapters = volumes[volume_key].get("chapters") or {}
+            if isinstance(chapters, list):
+                chapters = {elem["chapter"]: elem for elem in chapters}
+            start = len(aggregate.chapters)
+            for chapter_key in sorted(chapters, key=_number_key):
+                elem = chapters[chapter_key]
+                entry = AggregateChapter(
+                    volume=volume_key,
+                    chapter=elem.get("chapter", chapter_key),
+                    chapter_id=elem["id"],
+                    others=list(elem.get("others", [])),
+                    count=elem.get("count", 1),
+                )
+                entry.position = len(aggregate.chapters)
+                aggregate.chapters.append(entry)
+                aggregate._positions.setdefault(entry.chapter_id, entry.position)
+                for other_id in entry.others:
+                    aggregate._positions.setdefault(other_id, entry.position)
+            aggregate.volumes.append(volume_key)
+            aggregate._volume_ranges[volume_key] = (start, len(aggregate.chapters))
+
+        return aggregate
+
+    def __len__(self) -> int:
+        return len(self.chapters)
+
+    def __iter__(self):
+        return iter(self.chapters)
+
+    def __contains__(self, chapter_id: str) -> bool:
+        return chapter_id in self._positions
+
+    def __eq__(self, other: Self) -> bool:
+        return [self.manga_id, self.raw] == [other.manga_id, other.raw]
+
+    def __ne__(self, other: Self) -> bool:
+        return not self.__eq__(other)
+
+    def __repr__(self) -> str:
+        return (
+            f"Aggregate(manga_id = {self.manga_id}, volumes = {len(self.volumes)}, "
+            f"chapters = {len(self.chapters)})"
+        )
+
+    def position(self, chapter_id: str) -> int:
+        """Position of a chapter in reading order
+
+        Raises:
+            KeyError: Raised when the chapter isn't part of the aggregate
+        """
+        return self._positions[chapter_id]
+
+    def get_chapter(self, chapter_id: str) -> AggregateChapter:
+        """The entry of a chapter, or of the release it is an alternative to"""
+        return self.chapters[self._positions[chapter_id]]
+
+    def next_chapter(self, chapter_id: str) -> Union[AggregateChapter, None]:
+        """The chapter after the given one, or None if it is the last"""
+        position = self._positions[chapter_id] + 1
+        return self.chapters[position] if position < len(self.chapters) else None
+
+    def previous_chapter(self, chapter_id: str) -> Union[AggregateChapter, None]:
+        """The chapter before the given one, or None if it is the first"""
+        position = self._positions[chapter_id] - 1
+        return self.chapters[position] if position >= 0 else None
+
+    def volume_chapters(self, volume: str) -> List[AggregateChapter]:
+        """The chapters of a volume in reading order"""
+        start, end = self._volume_ranges.get(volume, (0, 0))
+        return self.chapters[start:end]
+
+
+class AggregateCache:
+    """Thread safe LRU cache of `Aggregate` keyed by (manga_id, languages, groups)
+
+    Entries older than ``ttl`` are fetched again; when the volumes didn't change
+    the already built `Aggregate` is kept, so its indexes are not rebuilt.
+    """
+
+    def __init__(self, ttl: float = 300.0, max_size: int = 1024) -> None:
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries: "OrderedDict[tuple, list]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(
+        manga_id: str,
+        languages: Union[List[str], None] = None,
+        groups: Union[List[str], None] = None,
+    ) -> tuple:
+        """Cache key of an aggregate request"""
+        return (
+            manga_id,
+            tuple(sorted(languages)) if languages else (),
+            tuple(sorted(groups)) if groups else (),
+        )
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: tuple, fetch) -> Aggregate:
+        """Returns the cached aggregate, fetching it when missing or stale
+
+        Args:
+            key: Key made by `AggregateCache.key`
+            fetch: Callable returning the raw aggregate response
+
+        Returns:
+            Aggregate: The aggregate
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                if now - entry[0] < self.ttl:
+                    cache_lookup(f"/manga/{key[0]}/aggregate", True)
+                    return entry[1]
+
+        cache_lookup(f"/manga/{key[0]}/aggregate", False)
+        resp = fetch()
+        volumes = resp.get("volumes", resp) or {}
+        if entry is not None and entry[1].raw == volumes:
+            aggregate = entry[1]
+        else:
+            aggregate = Aggregate.aggregate_from_dict(resp, manga_id=key[0])
+
+        with self._lock:
+            self._entries[key] = [time.monotonic(), aggregate]
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return aggregate
+
+    def invalidate(self, manga_id: Union[str, None] = None) -> None:
+        """Drops the cached aggregates of a manga, or every entry"""
+        with self._lock:
+            if manga_id is None:
+                self._entries.clear()
+                return
+            for key in [key for key in self._entries if key[0] == manga_id]:
+                del self._entries[key]
+
+
 class Cover:
     """Class used to get series covers."""
 
-    def __init__(self, auth: Union[Auth, None] = None) -> None:
-        self.auth = auth
-        self.api = Api()
+    def __init__(self, auth: Union[Auth, None] = None, client=None) -> None:
+        self.auth = client.auth if auth is None and client is not None else auth
+        self.api = client.api if client is not None else Api.shared()
+        self.client = client
 
         self.cover_id: str = ""
         self.volume: str = ""
@@ -260,13 +518,16 @@ class Cover:
         self.updated_at: datetime.datetime
         self.manga_id: str = ""
         self.locale: str = ""
+        self.version: int = 1
 
     @classmethod
-    def cover_from_dict(cls, data: dict) -> "Cover":
+    @profiled("Cover.cover_from_dict")
+    def cover_from_dict(cls, data: dict, client=None) -> "Cover":
         """Get cover from json
 
         Args:
             data (dict): Raw JSON data
+            client (optional): Client whose api and auth the Cover uses, `Api.shared()` by default
 
         Raises:
             ValueError: Raised when the data provided is not a Cover JSON
@@ -282,7 +543,7 @@ class Cover:
         if data["type"] != "cover_art" or not data:
             raise ValueError("The data provided is not a cover")
 
-        cover = cls()
+        cover = cls(client=client)
 
         attributes = data["attributes"]
 
@@ -291,6 +552,7 @@ class Cover:
         cover.file_name = attributes["fileName"]
         cover.locale = attributes["locale"]
         cover.description = attributes["description"]
+        cover.version = attributes.get("version", 1)
         cover.created_at = parse(attributes["createdAt"])
         cover.updated_at = parse(attributes["updatedAt"])
         cover.manga_id = data["relationships"][0]["id"]
@@ -298,7 +560,8 @@ class Cover:
         return cover
 
     @staticmethod
-    def create_coverart_list(resp: dict) -> List["Cover"]:
+    @profiled("Cover.create_coverart_list")
+    def create_coverart_list(resp: dict, client=None) -> List["Cover"]:
         """Creates a list of CoverArt from JSON
 
         Returns:
@@ -308,7 +571,7 @@ class Cover:
         resp = resp["data"]
         coverimage_list = []
         for elem in resp:
-            coverimage_list.append(Cover.cover_from_dict(elem))
+            coverimage_list.append(Cover.cover_from_dict(elem, client))
         return coverimage_list
 
     def __repr__(self) -> str:
@@ -316,17 +579,6 @@ class Cover:
                             file_name = {self.file_name}, description = {self.description}, \
                             createdAt = {self.created_at}, updatedAt = {self.updated_at})"
 
-    @staticmethod
-    def __parse_coverart_params(params: Dict[str, str]) -> Dict[str, str]:
-        if "manga" in params:
-            params["manga[]"] = params.pop("manga")
-        if "ids" in params:
-            params["ids[]"] = params.pop("ids")
-        if "uploaders" in params:
-            params["uploaders[]"] = params.pop("uploaders")
-
-        return params
-
     def fetch_cover_image(self, quality: str = "source") -> str:
         """Returns URLS of cover art
 
@@ -352,12 +604,16 @@ class Cover:
         Returns:
             List["Cover"]: List of CoverArts
         """
-        params = self.__parse_coverart_params(kwargs)
+        params = COVER_LIST.normalize(kwargs)
         url = f"{self.api.url}/cover"
         resp = URLRequest.request_url(
-            url, "GET", params=params, timeout=self.api.timeout
+            url,
+            "GET",
+            params=params,
+            timeout=self.api.timeout,
+            transport=self.api.transport,
         )
-        return self.create_coverart_list(resp)
+        return self.create_coverart_list(resp, self.client)
 
     def get_cover(self, cover_id: str) -> "Cover":
         """Get a cover image
@@ -369,8 +625,10 @@ class Cover:
             Cover: Cover information
         """
         url = f"{self.api.url}/cover/{cover_id}"
-        resp = URLRequest.request_url(url, "GET", timeout=self.api.timeout)
-        return self.cover_from_dict(resp)
+        resp = URLRequest.request_url(
+            url, "GET", timeout=self.api.timeout, transport=self.api.transport
+        )
+        return self.cover_from_dict(resp, self.client)
 
     def upload_cover(
         self, manga_id: str, file_name: str, obj_return: bool = False
@@ -395,8 +653,9 @@ class Cover:
             params={"file": file},
             headers=self.auth.get_bearer_token(),
             timeout=self.api.timeout,
+            transport=self.api.transport,
         )
-        return self.cover_from_dict(resp) if obj_return else None
+        return self.cover_from_dict(resp, self.client) if obj_return else None
 
     def edit_cover(
         self,
@@ -434,8 +693,9 @@ class Cover:
             params=params,
             headers=self.auth.get_bearer_token(),
             timeout=self.api.timeout,
+            transport=self.api.transport,
         )
-        return self.cover_from_dict(resp) if obj_return else None
+        return self.cover_from_dict(resp, self.client) if obj_return else None
 
     def delete_cover(self, cover_id: Union[str, "Cover"]):
         """Deletes a Cover
@@ -453,6 +713,7 @@ class Cover:
             "DELETE",
             headers=self.auth.get_bearer_token(),
             timeout=self.api.timeout,
+            transport=self.api.transport,
         )
         if resp["result"] == "error":
             raise ValueError(resp["errors"]["detail"])
@@ -462,10 +723,12 @@ class Cover:
 
 class Tag:
     """Class for getting Tags"""
-    def __init__(self) -> None:
+    def __init__(self, client=None) -> None:
         """Class used to get and parse tags"""
 
-        self.api = Api()
+        self.api = client.api if client is not None else Api.shared()
+
+        self.client = client
 
         self.tag_id: str = ""
         self.name: Dict[str, str] = {}
@@ -473,16 +736,18 @@ class Tag:
         self.group: str = ""
 
     @classmethod
-    def tag_from_dict(cls, resp: dict) -> "Tag":
+    @profiled("Tag.tag_from_dict")
+    def tag_from_dict(cls, resp: dict, client=None) -> "Tag":
         """Creates a Tag from a JSON
 
         Args:
             resp: Raw data from JSON
+            client: Client whose api the Tag uses, `Api.shared()` by default
 
         Returns:
             Tag: Tag information
         """
-        tag = cls()
+        tag = cls(client=client)
         try:
             resp = resp["data"]
         except KeyError:
@@ -501,11 +766,13 @@ class Tag:
         return tag
 
     @staticmethod
-    def create_tag_list(resp) -> List["Tag"]:
+    @profiled("Tag.create_tag_list")
+    def create_tag_list(resp, client=None) -> List["Tag"]:
         """Create a Tag list from JSON
 
         Args:
             resp: Response from Tag list
+            client: Client whose api the Tags use, `Api.shared()` by default
 
         Returns:
             List[Tag]: Tag list
@@ -517,7 +784,7 @@ class Tag:
             pass
 
         for tag in resp:
-            tag_list.append(Tag.tag_from_dict(tag))
+            tag_list.append(Tag.tag_from_dict(tag, client))
         return tag_list
 
     def __eq__(self, other: Self) -> bool:
@@ -538,15 +805,24 @@ class Tag:
             List[Tag]: Tag list
         """
         url = f"{self.api.url}/manga/tag"
-        resp = URLRequest.request_url(url, "GET", timeout=self.api.timeout)
-        return Tag.create_tag_list(resp)
+        resp = URLRequest.request_url(
+            url, "GET", timeout=self.api.timeout, transport=self.api.transport
+        )
+        return Tag.create_tag_list(resp, self.client)
 
 
 class Manga:
     """Class for getting Manga Info"""
-    def __init__(self, auth: Union[Auth, None] = None):
-        self.auth = auth
-        self.api = Api()
+
+    aggregate_cache = AggregateCache()
+
+    def __init__(self, auth: Union[Auth, None] = None, client=None):
+        self.auth = client.auth if auth is None and client is not None else auth
+        self.api = client.api if client is not None else Api.shared()
+        self.client = client
+        if client is not None:
+            self.aggregate_cache = client.aggregate_cache
+        self.user_state = client.user_state if client is not None else None
 
         self.manga_id: str = ""
         self.title: Dict[str, str] = {}
@@ -570,7 +846,8 @@ class Manga:
         self.cover_id: str = ""
 
     @classmethod
-    def manga_from_dict(cls, data: dict):
+    @profiled("Manga.manga_from_dict")
+    def manga_from_dict(cls, data: dict, client=None):
         """
         Creates a Manga Object from a JSON
         """
@@ -584,7 +861,7 @@ class Manga:
 
         attributes = data["attributes"]
 
-        manga = cls()
+        manga = cls(client=client)
 
         manga.manga_id = data["id"]
         manga.title = attributes["title"]
@@ -603,7 +880,8 @@ class Manga:
         manga.status = attributes["status"]
         manga.year = attributes["year"]
         manga.content_rating = attributes["contentRating"]
-        manga.tags = Tag.create_tag_list(attributes["tags"])
+        manga.tags = Tag.create_tag_list(attributes["tags"], client)
+        manga.version = attributes.get("version", 1)
         manga.created_at = parse(attributes["createdAt"])
         manga.updated_at = parse(attributes["updatedAt"])
 
@@ -618,58 +896,15 @@ class Manga:
         return manga
 
     @staticmethod
-    def __parse_manga_params(params: dict) -> dict:
-        if "authors" in params:
-            temp = params.pop("authors")
-            params["authors[]"] = temp
-        if "artist" in params:
-            temp = params.pop("artist")
-            params["artist[]"] = temp
-        if "excludedTags" in params:
-            temp = params.pop("excludedTags")
-            params["excludedTags[]"] = temp
-        if "originalLanguage" in params:
-            temp = params.pop("originalLanguage")
-            params["originalLanguage[]"] = temp
-        if "includedTags" in params:
-            temp = params.pop("includedTags")
-            params["includedTags[]"] = temp
-        if "publicationDemographic" in params:
-            temp = params.pop("publicationDemographic")
-            params["publicationDemographic[]"] = temp
-        if "ids" in params:
-            temp = params.pop("ids")
-            params["ids[]"] = temp
-        if "altTitles" in params:
-            temp = params.pop("altTitles")
-            params["altTitles[]"] = temp
-        if "description" in params:
-            temp = params.pop("description")
-            params["description[]"] = temp
-        if "authors" in params:
-            temp = params.pop("authors")
-            params["authors[]"] = temp
-        if "artists" in params:
-            temp = params.pop("artists")
-            params["artists[]"] = temp
-        if "translatedLanguage" in params:
-            temp = params.pop("translatedLanguage")
-            params["availableTranslatedLanguage[]"] = temp
-        if "status" in params:
-            params["status[]"] = params.pop("status")
-        if "contentRating" in params:
-            params["contentRating[]"] = params.pop("contentRating")
-        return params
-
-    @staticmethod
-    def create_manga_list(resp) -> List["Manga"]:
+    @profiled("Manga.create_manga_list")
+    def create_manga_list(resp, client=None) -> List["Manga"]:
         """
         Creates a manga list from a JSON
         """
         resp = resp["data"]
         manga_list = []
         for elem in resp:
-            manga_list.append(Manga.manga_from_dict(elem))
+            manga_list.append(Manga.manga_from_dict(elem, client))
         return manga_list
 
     @property
@@ -735,13 +970,35 @@ class Manga:
             ApiError: An error occurred with the API.
             MangaError: An error occurred specific to Manga.
         """
-        params = kwargs
-        params = self.__parse_manga_params(params)
+        params = MANGA.normalize(kwargs)
         url = f"{self.api.url}/manga"
         resp = URLRequest.request_url(
-            url, "GET", params=params, timeout=self.api.timeout
+            url,
+            "GET",
+            params=params,
+            timeout=self.api.timeout,
+            transport=self.api.transport,
+        )
+        return Manga.create_manga_list(resp, self.client)
+
+    def stream_manga_list(self, **kwargs) -> StreamedPage:
+        """
+        Search a list of Manga, decoding them one at a time as they arrive
+
+        Takes the same parameters as `get_manga_list`.
+
+        Returns:
+            StreamedPage: Iterable of Manga objects, ``meta`` holds ``total``
+        """
+        params = MANGA.normalize(kwargs)
+        url = f"{self.api.url}/manga"
+        return URLRequest.stream_url(
+            url,
+            timeout=self.api.timeout,
+            transport=self.api.transport,
+            params=params,
+            decoder=functools.partial(Manga.manga_from_dict, client=self.client),
         )
-        return Manga.create_manga_list(resp)
 
     def manga_feed(self, manga_id: str, **kwargs) -> List[Chapter]:
         """
@@ -771,12 +1028,37 @@ class Manga:
             manga_id:
             manga_id:
         """
-        kwargs = self.__parse_manga_params(kwargs)
+        kwargs = FEED.normalize(kwargs)
         url = f"{self.api.url}/manga/{manga_id}/feed"
         resp = URLRequest.request_url(
-            url, "GET", timeout=self.api.timeout, params=kwargs
+            url,
+            "GET",
+            timeout=self.api.timeout,
+            transport=self.api.transport,
+            params=kwargs,
+        )
+        return Chapter.create_chapter_list(resp, self.client)
+
+    def stream_manga_feed(self, manga_id: str, **kwargs) -> StreamedPage:
+        """
+        Get the manga feed, decoding the chapters one at a time as they arrive
+
+        Takes the same parameters as `manga_feed`. Use it for large pages
+        (``limit=500`` with ``includes``) to keep memory bounded.
+
+        Returns
+        -------------
+        `StreamedPage` Iterable of Chapter Objects, ``meta`` holds ``total``
+        """
+        kwargs = FEED.normalize(kwargs)
+        url = f"{self.api.url}/manga/{manga_id}/feed"
+        return URLRequest.stream_url(
+            url,
+            timeout=self.api.timeout,
+            transport=self.api.transport,
+            params=kwargs,
+            decoder=functools.partial(Chapter.chapter_from_dict, client=self.client),
         )
-        return Chapter.create_chapter_list(resp)
 
     def get_manga_by_id(self, manga_id: str) -> "Manga":
         """
@@ -795,8 +1077,10 @@ class Manga:
         `ApiError` `MangaError`
         """
         url = f"{self.api.url}/manga/{manga_id}"
-        resp = URLRequest.request_url(url, "GET", timeout=self.api.timeout)
-        return Manga.manga_from_dict(resp)
+        resp = URLRequest.request_url(
+            url, "GET", timeout=self.api.timeout, transport=self.api.transport
+        )
+        return Manga.manga_from_dict(resp, self.client)
 
     def random_manga(self) -> "Manga":
         """
@@ -811,8 +1095,10 @@ class Manga:
         `ApiError` `MangaError`
         """
         url = f"{self.api.url}/manga/random"
-        resp = URLRequest.request_url(url, "GET", timeout=self.api.timeout)
-        return Manga.manga_from_dict(resp)
+        resp = URLRequest.request_url(
+            url, "GET", timeout=self.api.timeout, transport=self.api.transport
+        )
+        return Manga.manga_from_dict(resp, self.client)
 
     def create_manga(self, title: str, **kwargs) -> "Manga":
         """
@@ -842,7 +1128,7 @@ class Manga:
         ------------
         `Manga`. A manga object if `ObjReturn` is set to `True`
         """
-        params = self.__parse_manga_params(kwargs)
+        params = MANGA_BODY.normalize(kwargs)
         url = f"{self.api.url}/manga"
         params["title"] = title
         resp = URLRequest.request_url(
@@ -851,8 +1137,9 @@ class Manga:
             params=params,
             headers=self.auth.get_bearer_token(),
             timeout=self.api.timeout,
+            transport=self.api.transport,
         )
-        return Manga.manga_from_dict(resp)
+        return Manga.manga_from_dict(resp, self.client)
 
     def get_manga_volumes_and_chapters(self, manga_id: str, **kwargs) -> Dict[str, str]:
         """
@@ -867,14 +1154,43 @@ class Manga:
         ------------
         `Dict[str, str]`. A dictionary with the volumes and the chapter id's
         """
-        params = None
-        if "translatedLanguage" in kwargs:
-            params = {"translatedLanguage[]": kwargs["translatedLanguage"]}
-        url = f"{self.api.url}/manga/{manga_id}/aggregate"
-        resp = URLRequest.request_url(
-            url, "GET", timeout=self.api.timeout, params=params
+        return _fetch_aggregate(self.api, manga_id, **kwargs)["volumes"]
+
+    def get_aggregate(
+        self,
+        manga_id: str,
+        translatedLanguage: Union[List[str], None] = None,
+        groups: Union[List[str], None] = None,
+        cache: bool = True,
+    ) -> "Aggregate":
+        """
+        Get a manga volumes and chapters as an `Aggregate`
+
+        Parameters
+        ------------
+        manga_id : `str`. The manga id
+        translatedLanguage : `List[str]`. Only count these languages
+        groups : `List[str]`. Only count releases of these groups
+        cache : `bool`. Default `True`. Reuse the result cached in `self.aggregate_cache`
+
+        Returns
+        ------------
+        `Aggregate`. Ordered volumes and chapters with next/previous navigation
+        """
+        key = AggregateCache.key(manga_id, translatedLanguage, groups)
+        if cache:
+            return self.aggregate_cache.get(
+                key,
+                lambda: _fetch_aggregate(
+                    self.api, manga_id, translatedLanguage=translatedLanguage, groups=groups
+                ),
+            )
+        return Aggregate.aggregate_from_dict(
+            _fetch_aggregate(
+                self.api, manga_id, translatedLanguage=translatedLanguage, groups=groups
+            ),
+            manga_id=manga_id,
         )
-        return resp["volumes"]
 
     def update_manga(
         self, manga_id: str, ObjReturn: bool = False, **kwargs
@@ -910,7 +1226,7 @@ class Manga:
         ------------
         `Manga`. A manga object if `ObjReturn` is set to `True`
         """
-        kwargs = self.__parse_manga_params(kwargs)
+        kwargs = MANGA_BODY.normalize(kwargs)
         url = f"{self.api.url}/manga/{manga_id}"
         resp = URLRequest.request_url(
             url,
@@ -918,9 +1234,10 @@ class Manga:
             params=kwargs,
             headers=self.auth.get_bearer_token(),
             timeout=self.api.timeout,
+            transport=self.api.transport,
         )
         if ObjReturn:
-            return Manga.manga_from_dict(resp)
+            return Manga.manga_from_dict(resp, self.client)
 
     def delete_manga(self, manga_id: str) -> None:
         """
@@ -937,10 +1254,10 @@ class Manga:
             "DELETE",
             headers=self.auth.get_bearer_token(),
             timeout=self.api.timeout,
+            transport=self.api.transport,
         )
 
     def get_manga_read_markers(self, manga_id: str) -> List[Chapter]:
-        # this needs a performance update
         """
         A list of Chapter ids That are marked from the given manga id
 
@@ -950,33 +1267,130 @@ class Manga:
 
         Returns
         -------------
-        `List[Chapters]`. A list of chapters that are marked as read
+        `List[Chapters]`. A list of chapters that are marked as read, of every
+        content rating. Read chapters the API doesn't list anymore (deleted ones)
+        are left out
         """
         url = f"{self.api.url}/manga/{manga_id}/read"
         resp = URLRequest.request_url(
-            url, "GET", timeout=self.api.timeout, headers=self.auth.get_bearer_token()
+            url,
+            "GET",
+            timeout=self.api.timeout,
+            transport=self.api.transport,
+            headers=self.auth.get_bearer_token(),
         )
         chap_ids = resp["data"]
-        chapter = Chapter()
-        return [chapter.get_chapter_by_id(chap_id) for chap_id in chap_ids]
+        chapter = Chapter(client=self.client)
+        # one request per 100 chapters instead of one per chapter, of every
+        # rating: the list's default filter would hide read pornographic chapters
+        chapters = {}
+        for start in range(0, len(chap_ids), 100):
+            chunk = chap_ids[start:start + 100]
+            for chap in chapter.get_chapter_list(
+                ids=chunk, limit=len(chunk), contentRating=list(CONTENT_RATINGS)
+            ):
+                chapters[chap.chapter_id] = chap
+        return [chapters[chap_id] for chap_id in chap_ids if chap_id in chapters]
+
+    def get_read_markers(self, manga_ids: List[str]) -> Dict[str, List[str]]:
+        """
+        The ids of the chapters marked as read, for many manga at once
+
+        Parameters
+        ------------
+        manga_ids : `List[str]`. The Manga ids, 100 per request
 
-    def get_manga_reading_status(self, manga_id: Union[str, int]) -> str:
+        Returns
+        -------------
+        `Dict[str, List[str]]`. The read chapter ids of every manga
+        """
+        url = f"{self.api.url}/manga/read"
+        markers = {manga_id: [] for manga_id in manga_ids}
+        for start in range(0, len(manga_ids), 100):
+            resp = URLRequest.request_url(
+                url,
+                "GET",
+                params={"ids[]": manga_ids[start:start + 100], "grouped": "true"},
+                headers=self.auth.get_bearer_token(),
+                timeout=self.api.timeout,
+                transport=self.api.transport,
+            )
+            # the API answers [] instead of {} when nothing was read
+            markers.update(resp["data"] or {})
+        return markers
+
+    def mark_chapters_read(
+        self,
+        manga_id: str,
+        read: Iterable[str] = (),
+        unread: Iterable[str] = (),
+        update_history: bool = False,
+        chunk_size: int = 500,
+    ) -> int:
+        """
+        Marks chapters of a manga as read and unread, ``chunk_size`` chapters per request
+
+        Parameters
+        ------------
+        manga_id : `str`. The Manga id
+        read : `Iterable[str]`. Chapter ids to mark as read
+        unread : `Iterable[str]`. Chapter ids to mark as unread
+        update_history : `bool`. Also add the chapters to the reading history
+
+        Returns
+        -------------
+        `int`. Number of requests sent
+        """
+        read, unread = list(read), list(unread)
+        url = f"{self.api.url}/manga/{manga_id}/read"
+        if update_history:
+            url = f"{url}?updateHistory=true"
+        headers = dict(self.auth.get_bearer_token() or {}, **{"Content-Type": "application/json"})
+        sent = 0
+        for start in range(0, max(len(read), len(unread)), chunk_size):
+            URLRequest.request_url(
+                url,
+                "POST",
+                params={
+                    "chapterIdsRead": read[start:start + chunk_size],
+                    "chapterIdsUnread": unread[start:start + chunk_size],
+                },
+                headers=headers,
+                timeout=self.api.timeout,
+                transport=self.api.transport,
+                json_body=True,
+            )
+            sent += 1
+        return sent
+
+    def get_manga_reading_status(self, manga_id: Union[str, int], cache: bool = True) -> str:
         """
         Get a manga reading status given its id
 
         Parameters
         ------------
         manga_id : `str`. The manga id
+        cache : `bool`. Default `True`. Answer from the client's `UserStateCache`
 
         Returns
         ------------
         `str` The manga reading status
         """
         url = f"{self.api.url}/manga/{manga_id}/status"
-        resp = URLRequest.request_url(
-            url, "GET", headers=self.auth.get_bearer_token(), timeout=self.api.timeout
-        )
-        return resp["status"]
+
+        def fetch() -> str:
+            resp = URLRequest.request_url(
+                url,
+                "GET",
+                headers=self.auth.get_bearer_token(),
+                timeout=self.api.timeout,
+                transport=self.api.transport,
+            )
+            return resp["status"]
+
+        if cache and self.user_state is not None:
+            return self.user_state.get(self.auth, ("status", manga_id), fetch, url)
+        return fetch()
 
     def get_all_manga_reading_status(
         self, status: Union[str, None] = None
@@ -1000,17 +1414,18 @@ class Manga:
             params={"status": status},
             headers=self.auth.get_bearer_token(),
             timeout=self.api.timeout,
+            transport=self.api.transport,
         )
         return resp["statuses"]
 
-    def update_manga_reading_status(self, manga_id: str, status: str) -> None:
+    def update_manga_reading_status(self, manga_id: str, status: Union[str, None]) -> None:
         """
         Update the reading status of a manga
 
         Parameters
         -------------
         manga_id : `str`. The manga id.\n
-        status : `str`. Values : `"reading"` `"on_hold"` `"plan_to_read"` `"dropped"` `"re_reading"` `"completed"`
+        status : `str`. Values : `"reading"` `"on_hold"` `"plan_to_read"` `"dropped"` `"re_reading"` `"completed"`, `None` removes the status
 
         Raises
         -------------
@@ -1023,32 +1438,92 @@ class Manga:
             params={"status": status},
             headers=self.auth.get_bearer_token(),
             timeout=self.api.timeout,
+            transport=self.api.transport,
             json_body=True
         )
+        if self.user_state is not None:
+            self.user_state.set(self.auth, ("status", manga_id), status)
 
 
 class MangaList(Manga):
     """Class for getting user's Manga List"""
-    def __init__(self, auth=Auth):
-        super().__init__(auth=auth)
+    def __init__(self, auth: Union[Auth, None] = None, client=None):
+        super().__init__(auth=auth, client=client)
+
+    def get_my_mangalist(self, cache: bool = True, **kwargs) -> List["Manga"]:
+        """
+        Get the manga you follow
 
-    def get_my_mangalist(self, **kwargs) -> List["Manga"]:
+        Parameters
+        ------------
+        cache : `bool`. Default `True`. Answer from the client's `UserStateCache`
+
+        ### QueryParams:
+        limit : `int`. Up to 100
+        offset : `int`
+
+        Returns
+        -------------
+        `List[Manga]`
+        """
         url = f"{self.api.url}/user/follows/manga"
+
+        def fetch() -> List["Manga"]:
+            resp = URLRequest.request_url(
+                url,
+                "GET",
+                timeout=self.api.timeout,
+                transport=self.api.transport,
+                params=kwargs,
+                headers=self.auth.get_bearer_token(),
+            )
+            return self.create_manga_list(resp, self.client)
+
+        if cache and self.user_state is not None:
+            key = ("mangalist", freeze(kwargs))
+            return list(self.user_state.get(self.auth, key, fetch, url))
+        return fetch()
+
+    def get_my_manga_feed(self, **kwargs) -> List[Chapter]:
+        """
+        Get the chapters of every followed manga
+
+        Parameters
+        ------------
+        ### QueryParams:
+
+        limit : `int`. Up to 500
+        offset : `int`
+        translatedLanguage : `List[str]`. The translated languages to query
+        createdAtSince : `str`. Datetime String with the following format YYYY-MM-DDTHH:MM:SS
+        updatedAtSince : `str`. Datetime String with the following format YYYY-MM-DDTHH:MM:SS
+        publishAtSince : `str`. Datetime String with the following format YYYY-MM-DDTHH:MM:SS
+        order : `Dict[str, str]`. e.g. `{"publishAt": "asc"}`
+
+        Returns
+        -------------
+        `List[Chapter]` A list of Chapter Objects
+        """
+        params = FEED.normalize(kwargs)
+        url = f"{self.api.url}/user/follows/manga/feed"
         resp = URLRequest.request_url(
             url,
             "GET",
             timeout=self.api.timeout,
-            params=kwargs,
+            transport=self.api.transport,
+            params=params,
             headers=self.auth.get_bearer_token(),
         )
-        return self.create_manga_list(resp)
+        return Chapter.create_chapter_list(resp, self.client)
 
 
 class CustomList:
     """Class for getting users' custom lists"""
-    def __init__(self, auth: Union[Auth, None] = None):
-        self.auth = auth
-        self.api = Api()
+    def __init__(self, auth: Union[Auth, None] = None, client=None):
+        self.auth = client.auth if auth is None and client is not None else auth
+        self.api = client.api if client is not None else Api.shared()
+        self.client = client
+        self.user_state = client.user_state if client is not None else None
         self.list_id: str = ""
         self.name: str = ""
         self.visibility: str = ""
@@ -1056,14 +1531,15 @@ class CustomList:
         self.mangas: List[str] = []
 
     @classmethod
-    def list_from_dict(cls, data: dict) -> Self:
+    @profiled("CustomList.list_from_dict")
+    def list_from_dict(cls, data: dict, client=None) -> Self:
         """
         Creates a CustomList from a JSON
         """
         if data["type"] != "custom_list" or not data:
             raise ValueError(data, "The data provided is not a CustomList")
 
-        custom_list = cls()
+        custom_list = cls(client=client)
 
         attributes = data["attributes"]
         relationships = data["relationships"]
@@ -1080,26 +1556,29 @@ class CustomList:
         return custom_list
 
     @staticmethod
-    def create_customlist_list(resp) -> List["CustomList"]:
+    @profiled("CustomList.create_customlist_list")
+    def create_customlist_list(resp, client=None) -> List["CustomList"]:
         """
         Creates a list of CustomList from a JSON
         """
         resp = resp["data"]
         custom_lists = []
         for elem in resp:
-            custom_lists.append(CustomList.list_from_dict(elem))
+            custom_lists.append(CustomList.list_from_dict(elem, client))
         return custom_lists
 
     def __repr__(self) -> str:
         return f"CustomList(id = {self.list_id}, name = {self.name},\
                 visibility = {self.visibility}, owner = {self.owner}, Manga = List[Manga])"
 
-    def get_my_customlists(self, **kwargs) -> List["CustomList"]:
+    def get_my_customlists(self, cache: bool = True, **kwargs) -> List["CustomList"]:
         """
         Get my custom lists
 
         Parameters
         ------------
+        cache : `bool`. Default `True`. Answer from the client's `UserStateCache`
+
         ### QueryParams:
         limit : `int`. The limit of custom lists to return
         offset : `int`. The amount of offset
@@ -1109,14 +1588,46 @@ class CustomList:
         `List[CustomList]`
         """
         url = f"{self.api.url}/user/list"
-        resp = URLRequest.request_url(
-            url,
-            "GET",
-            params=kwargs,
-            headers=self.auth.get_bearer_token(),
-            timeout=self.api.timeout,
-        )
-        return self.create_customlist_list(resp)
+
+        def fetch() -> List["CustomList"]:
+            resp = URLRequest.request_url(
+                url,
+                "GET",
+                params=kwargs,
+                headers=self.auth.get_bearer_token(),
+                timeout=self.api.timeout,
+                transport=self.api.transport,
+            )
+            return self.create_customlist_list(resp, self.client)
+
+        if cache and self.user_state is not None:
+            key = ("customlists", freeze(kwargs))
+            return list(self.user_state.get(self.auth, key, fetch, url))
+        return fetch()
+
+    def __update_cached_list(self, list_id: str, change) -> None:
+        # applies a write to the list wherever get_my_customlists cached it
+        if self.user_state is None:
+            return
+
+        def apply(key, custom_lists):
+            updated = []
+            for custom_list in custom_lists:
+                if custom_list.list_id == list_id:
+                    custom_list = change(copy.copy(custom_list))
+                if custom_list is not None:
+                    updated.append(custom_list)
+            return updated
+
+        self.user_state.update(self.auth, "customlists", apply)
+
+    def __set_members(self, list_id: str, manga_id: str, member: bool) -> None:
+        def change(custom_list):
+            mangas = [other for other in custom_list.mangas if other != manga_id]
+            custom_list.mangas = mangas + [manga_id] if member else mangas
+            return custom_list
+
+        self.__update_cached_list(list_id, change)
 
     def get_user_customlists(self, user_id: str, **kwargs) -> List["CustomList"]:
         """
@@ -1141,8 +1652,9 @@ class CustomList:
             params=kwargs,
             headers=self.auth.get_bearer_token(),
             timeout=self.api.timeout,
+            transport=self.api.transport,
         )
-        return self.create_customlist_list(resp)
+        return self.create_customlist_list(resp, self.client)
 
     def add_manga_to_customlist(self, manga_id: str, list_id: str) -> None:
         """
@@ -1153,10 +1665,15 @@ class CustomList:
         manga_id : `str`. The manga id.
         list_id : `str`. The list id.
         """
-        url = f"{self.api.url}/{manga_id}/list{list_id}"
+        url = f"{self.api.url}/manga/{manga_id}/list/{list_id}"
         URLRequest.request_url(
-            url, "POST", headers=self.auth.get_bearer_token(), timeout=self.api.timeout
+            url,
+            "POST",
+            headers=self.auth.get_bearer_token(),
+            timeout=self.api.timeout,
+            transport=self.api.transport,
         )
+        self.__set_members(list_id, manga_id, True)
 
     def remove_manga_from_customlist(self, manga_id: str, list_id: str) -> None:
         """
@@ -1173,7 +1690,9 @@ class CustomList:
             "DELETE",
             headers=self.auth.get_bearer_token(),
             timeout=self.api.timeout,
+            transport=self.api.transport,
         )
+        self.__set_members(list_id, manga_id, False)
 
     def create_customlist(
         self,
@@ -1200,7 +1719,17 @@ class CustomList:
             "visibility": visibility,
             "manga[]": manga,
         }
-        URLRequest.request_url(url, "POST", params=params, timeout=self.api.timeout)
+        URLRequest.request_url(
+            url,
+            "POST",
+            params=params,
+            headers=self.auth.get_bearer_token(),
+            timeout=self.api.timeout,
+            transport=self.api.transport,
+        )
+        if self.user_state is not None:
+            # where the new list lands in the pages is up to the API
+            self.user_state.invalidate(self.auth, "customlists")
 
     def get_customlist(self, customlist_id: str, **kwargs) -> "CustomList":
         """
@@ -1221,9 +1750,58 @@ class CustomList:
         """
         url = f"{self.api.url}/list/{customlist_id}"
         resp = URLRequest.request_url(
-            url, "GET", timeout=self.api.timeout, params=kwargs
+            url,
+            "GET",
+            timeout=self.api.timeout,
+            transport=self.api.transport,
+            params=kwargs,
+            # private lists are only visible to their owner
+            headers=self.auth.get_bearer_token() if self.auth is not None else None,
         )
-        return CustomList.list_from_dict(resp["data"])
+        return CustomList.list_from_dict(resp["data"], self.client)
+
+    def stream_customlist_manga(
+        self, customlist_id: str, chunk_size: int = 100, **kwargs
+    ) -> Iterator["Manga"]:
+        """
+        Get the Manga of a custom list, in list order
+
+        The list is read once, then its Manga are requested ``chunk_size`` ids
+        at a time and decoded as they arrive, so only one chunk is held in
+        memory. Manga that no longer exist are skipped.
+
+        Parameters
+        ------------
+        customlist_id : `str`. The id of the custom list
+        chunk_size : `int`. Manga per request, up to 100
+
+        ### QueryParams:
+        includes : `List[str]`. e.g. `["cover_art", "author"]`
+        contentRating : `List[str]`. Every rating by default
+
+        Returns
+        ------------
+        `Iterator[Manga]`
+        """
+        if not 0 < chunk_size <= 100:
+            raise ValueError("chunk_size must be between 1 and 100")
+        kwargs.setdefault("contentRating", list(CONTENT_RATINGS))
+        manga_ids = self.get_customlist(customlist_id).mangas
+        url = f"{self.api.url}/manga"
+        for start in range(0, len(manga_ids), chunk_size):
+            chunk = manga_ids[start:start + chunk_size]
+            params = MANGA.normalize(dict(kwargs, ids=chunk, limit=len(chunk)))
+            with URLRequest.stream_url(
+                url,
+                timeout=self.api.timeout,
+                transport=self.api.transport,
+                params=params,
+                decoder=functools.partial(Manga.manga_from_dict, client=self.client),
+            ) as page:
+                found = {manga.manga_id: manga for manga in page}
+            for manga_id in chunk:
+                if manga_id in found:
+                    yield found[manga_id]
 
     def update_customlist(self, customlist_id: str, **kwargs) -> "CustomList":
         """
@@ -1248,8 +1826,11 @@ class CustomList:
             params=kwargs,
             headers=self.auth.get_bearer_token(),
             timeout=self.api.timeout,
+            transport=self.api.transport,
         )
-        return CustomList.list_from_dict(resp["data"])
+        updated = CustomList.list_from_dict(resp["data"], self.client)
+        self.__update_cached_list(customlist_id, lambda custom_list: updated)
+        return updated
 
     def delete_customlist(self, customlist_id: str) -> None:
         """
@@ -1259,10 +1840,12 @@ class CustomList:
         ------------
         customlist_id : `str`. The custom list id
         """
-        url = f"{self.api.url}/list{customlist_id}"
+        url = f"{self.api.url}/list/{customlist_id}"
         URLRequest.request_url(
             url,
             "DELETE",
             headers=self.auth.get_bearer_token(),
             timeout=self.api.timeout,
+            transport=self.api.transport,
         )
+        self.__update_cached_list(customlist_id, lambda custom_list: None)
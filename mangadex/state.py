@@ -0,0 +1,182 @@
+"""Module caching the state of logged in users, kept up to date by their own writes"""
+from __future__ import absolute_import
+
+import logging
+import threading
+import time
+import weakref
+
+from typing_extensions import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from .metrics import cache_lookup
+
+logger = logging.getLogger("mangadex")
+
+
+class _Entry:
+    __slots__ = ("value", "fetched_at", "version", "refreshing")
+
+    def __init__(self, value: Any) -> None:
+        self.value = value
+        self.fetched_at = time.monotonic()
+        # bumped by every local write, a fetch started before one is dropped
+        self.version = 0
+        self.refreshing = False
+
+
+class UserStateCache:
+    """Thread safe cache of what the API says about the logged in user
+
+    Entries are partitioned by `Auth`, so users sharing a client never see
+    each other's state, and keyed by a tuple starting with the name of the
+    read (``("me",)``, ``("status", manga_id)``...). A read older than ``ttl``
+    is still answered from the cache while it is fetched again in the
+    background (stale while revalidate). The write methods of the services
+    update the entries they affect once the API accepted them, or drop them
+    when the new value can't be known locally, so a user always reads their
+    own writes.
+    """
+
+    def __init__(
+        self, ttl: float = 60.0, submit: Optional[Callable[[Callable[[], None]], Any]] = None
+    ) -> None:
+        """User state cache
+
+        Args:
+            ttl (float, optional): Seconds before an entry is revalidated. Defaults to 60.
+            submit (Callable, optional): Runs a revalidation in the background, e.g. the
+                ``submit`` of an executor. A new daemon thread by default.
+        """
+        self.ttl = ttl
+        self.submit = submit
+        self._partitions: "weakref.WeakKeyDictionary[Any, Dict[Tuple, _Entry]]" = (
+            weakref.WeakKeyDictionary()
+        )
+        # writes per user and read name (None for all of them), a fetch started
+        # before one is not stored
+        self._writes: "weakref.WeakKeyDictionary[Any, Dict[Optional[str], int]]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        return f"UserStateCache(ttl = {self.ttl}, users = {len(self._partitions)})"
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(len(entries) for entries in self._partitions.values())
+
+    def __entries(self, auth: Any) -> Dict[Tuple, _Entry]:
+        entries = self._partitions.get(auth)
+        if entries is None:
+            entries = self._partitions[auth] = {}
+        return entries
+
+    def __written(self, auth: Any, name: Optional[str]) -> None:
+        writes = self._writes.get(auth)
+        if writes is None:
+            writes = self._writes[auth] = {}
+        writes[name] = writes.get(name, 0) + 1
+
+    def __write_count(self, auth: Any, name: str) -> Tuple[int, int]:
+        writes = self._writes.get(auth, {})
+        return writes.get(name, 0), writes.get(None, 0)
+
+    def get(
+        self, auth: Any, key: Tuple[Hashable, ...], fetch: Callable[[], Any], path: str
+    ) -> Any:
+        """Returns the cached value, fetching it when missing and revalidating it when stale
+
+        Args:
+            auth (Auth): The user the value belongs to.
+            key (tuple): Name of the read and its arguments.
+            fetch (Callable): Sends the read, returning the value to cache.
+            path (str): Path of the read, for the cache metrics.
+
+        Returns:
+            Any: The value
+        """
+        with self._lock:
+            entry = self.__entries(auth).get(key)
+            if entry is not None:
+                revalidate = not entry.refreshing and (
+                    time.monotonic() - entry.fetched_at >= self.ttl
+                )
+                entry.refreshing = entry.refreshing or revalidate
+                value = entry.value
+            writes = self.__write_count(auth, key[0])
+        cache_lookup(path, entry is not None)
+        if entry is not None:
+            if revalidate:
+                self.__revalidate(key, entry, fetch)
+            return value
+
+        value = fetch()
+        with self._lock:
+            entries = self.__entries(auth)
+            if key not in entries and self.__write_count(auth, key[0]) == writes:
+                entries[key] = _Entry(value)
+        return value
+
+    def __revalidate(self, key: Tuple, entry: _Entry, fetch: Callable[[], Any]) -> None:
+        version = entry.version
+
+        def run() -> None:
+            try:
+                value = fetch()
+            except Exception:
+                logger.warning("mangadex revalidation of %s failed", key[0], exc_info=True)
+                with self._lock:
+                    entry.refreshing = False
+                return
+            with self._lock:
+                entry.refreshing = False
+                if entry.version == version:
+                    entry.value = value
+                    entry.fetched_at = time.monotonic()
+
+        try:
+            if self.submit is not None:
+                self.submit(run)
+            else:
+                threading.Thread(target=run, name="mangadex-revalidate", daemon=True).start()
+        except RuntimeError:
+            # the executor was shut down, the next read tries again
+            entry.refreshing = False
+
+    def set(self, auth: Any, key: Tuple[Hashable, ...], value: Any) -> None:
+        """Stores the value a successful write left on the server"""
+        with self._lock:
+            self.__written(auth, key[0])
+            entries = self.__entries(auth)
+            entry = entries.get(key)
+            if entry is None:
+                entries[key] = _Entry(value)
+            else:
+                entry.value = value
+                entry.version += 1
+
+    def update(self, auth: Any, name: str, change: Callable[[Tuple, Any], Any]) -> None:
+        """Applies a successful write to every cached entry of ``name``
+
+        Args:
+            auth (Auth): The user who wrote.
+            name (str): First item of the keys to update.
+            change (Callable): Takes the key and the cached value, returns the new value.
+        """
+        with self._lock:
+            self.__written(auth, name)
+            for key, entry in self.__entries(auth).items():
+                if key[0] == name:
+                    entry.value = change(key, entry.value)
+                    entry.version += 1
+
+    def invalidate(self, auth: Any = None, name: Optional[str] = None) -> None:
+        """Drops the entries of ``name``, or all of them, of one user or of every user"""
+        with self._lock:
+            auths = list(self._partitions) if auth is None else [auth]
+            for user in auths:
+                self.__written(user, name)
+                entries = self._partitions.get(user, {})
+                for key in [key for key in entries if name is None or key[0] == name]:
+                    del entries[key]
@@ -0,0 +1,630 @@
+"""Module providing a local SQLite mirror of MangaDex metadata"""
+from __future__ import absolute_import
+
+import datetime
+import json
+import sqlite3
+import threading
+
+from dateutil.parser import parse
+from typing_extensions import Any, Dict, Iterable, List, Union
+
+from .people import Author, ScanlationGroup
+from .series import Chapter, Cover, Manga, Tag
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS manga (
+    id TEXT PRIMARY KEY,
+    title TEXT,
+    alt_titles TEXT,
+    description TEXT,
+    is_locked INTEGER,
+    links TEXT,
+    original_language TEXT,
+    last_volume TEXT,
+    last_chapter TEXT,
+    publication_demographic TEXT,
+    status TEXT,
+    year INTEGER,
+    content_rating TEXT,
+    author_ids TEXT,
+    artist_ids TEXT,
+    cover_id TEXT,
+    version INTEGER,
+    created_at TEXT,
+    updated_at TEXT
+);
+CREATE INDEX IF NOT EXISTS manga_status ON manga (status);
+CREATE INDEX IF NOT EXISTS manga_content_rating ON manga (content_rating);
+CREATE INDEX IF NOT EXISTS manga_original_language ON manga (original_language);
+CREATE INDEX IF NOT EXISTS manga_created_at ON manga (created_at);
+CREATE INDEX IF NOT EXISTS manga_updated_at ON manga (updated_at);
+
+CREATE TABLE IF NOT EXISTS tag (
+    id TEXT PRIMARY KEY,
+    name TEXT,
+    description TEXT,
+    group_name TEXT
+);
+
+CREATE TABLE IF NOT EXISTS manga_tag (
+    manga_id TEXT NOT NULL,
+    tag_id TEXT NOT NULL,
+    PRIMARY KEY (manga_id, tag_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS manga_tag_tag ON manga_tag (tag_id, manga_id);
+
+CREATE TABLE IF NOT EXISTS chapter (
+    id TEXT PRIMARY KEY,
+    manga_id TEXT,
+    title TEXT,
+    volume TEXT,
+    chapter REAL,
+    translated_language TEXT,
+    group_id TEXT,
+    uploader TEXT,
+    pages INTEGER,
+    version INTEGER,
+    publish_at TEXT,
+    created_at TEXT,
+    updated_at TEXT
+);
+CREATE INDEX IF NOT EXISTS chapter_manga ON chapter (manga_id, translated_language);
+
+CREATE TABLE IF NOT EXISTS author (
+    id TEXT PRIMARY KEY,
+    name TEXT,
+    image_url TEXT,
+    bio TEXT,
+    manga_ids TEXT,
+    version INTEGER,
+    created_at TEXT,
+    updated_at TEXT
+);
+
+CREATE TABLE IF NOT EXISTS scanlation_group (
+    id TEXT PRIMARY KEY,
+    name TEXT,
+    website TEXT,
+    discord TEXT,
+    twitter TEXT,
+    manga_updates TEXT,
+    email TEXT,
+    bio TEXT,
+    focused_language TEXT,
+    official INTEGER,
+    ex_licensed INTEGER,
+    verified INTEGER,
+    inactive INTEGER,
+    publish_delay INTEGER,
+    relationships TEXT,
+    version INTEGER,
+    created_at TEXT,
+    updated_at TEXT
+);
+
+CREATE TABLE IF NOT EXISTS cover (
+    id TEXT PRIMARY KEY,
+    manga_id TEXT,
+    volume TEXT,
+    file_name TEXT,
+    description TEXT,
+    locale TEXT,
+    version INTEGER,
+    created_at TEXT,
+    updated_at TEXT
+);
+CREATE INDEX IF NOT EXISTS cover_manga ON cover (manga_id);
+
+CREATE TABLE IF NOT EXISTS feed_cursor (
+    user_id TEXT PRIMARY KEY,
+    cursor TEXT,
+    seen TEXT
+);
+"""
+
+# (column, attribute, kind) for every mirrored table. ``kind`` tells how the
+# value is stored: "" as is, "json" serialized, "date" as UTC ISO-8601 text
+# (so it sorts and compares as a string) and "bool" as an integer.
+_TABLES = {
+    "manga": (Manga, [
+        ("id", "manga_id", ""),
+        ("title", "title", "json"),
+        ("alt_titles", "alt_titles", "json"),
+        ("description", "description", "json"),
+        ("is_locked", "is_locked", "bool"),
+        ("links", "links", "json"),
+        ("original_language", "original_language", ""),
+        ("last_volume", "last_volume", ""),
+        ("last_chapter", "last_chapter", ""),
+        ("publication_demographic", "publication_demographic", ""),
+        ("status", "status", ""),
+        ("year", "year", ""),
+        ("content_rating", "content_rating", ""),
+        ("author_ids", "author_id", "json"),
+        ("artist_ids", "artist_id", "json"),
+        ("cover_id", "cover_id", ""),
+        ("version", "version", ""),
+        ("created_at", "created_at", "date"),
+        ("updated_at", "updated_at", "date"),
+    ]),
+    "tag": (Tag, [
+        ("id", "tag_id", ""),
+        ("name", "name", "json"),
+        ("description", "description", "json"),
+        ("group_name", "group", ""),
+    ]),
+    "chapter": (Chapter, [
+        ("id", "chapter_id", ""),
+        ("manga_id", "manga_id", ""),
+        ("title", "title", ""),
+        ("volume", "volume", ""),
+        ("chapter", "chapter", ""),
+        ("translated_language", "translated_language", ""),
+        ("group_id", "group_id", ""),
+        ("uploader", "uploader", ""),
+        ("pages", "pages", ""),
+        ("version", "version", ""),
+        ("publish_at", "publish_at", "date"),
+        ("created_at", "created_at", "date"),
+        ("updated_at", "updated_at", "date"),
+    ]),
+    "author": (Author, [
+        ("id", "author_id", ""),
+        ("name", "name", ""),
+        ("image_url", "image_url", ""),
+        ("bio", "bio", "json"),
+        ("manga_ids", "mangas", "json"),
+        ("version", "version", ""),
+        ("created_at", "created_at", "date"),
+        ("updated_at", "updated_at", "date"),
+    ]),
+    "scanlation_group": (ScanlationGroup, [
+        ("id", "group_id", ""),
+        ("name", "name", "json"),
+        ("website", "website", ""),
+        ("discord", "discord", ""),
+        ("twitter", "twitter", ""),
+        ("manga_updates", "manga_updates", ""),
+        ("email", "email", ""),
+        ("bio", "bio", ""),
+        ("focused_language", "focused_language", "json"),
+        ("official", "official", "bool"),
+        ("ex_licensed", "ex_licensed", "bool"),
+        ("verified", "verified", "bool"),
+        ("inactive", "inactive", "bool"),
+        ("publish_delay", "publish_delay", ""),
+        ("relationships", "relationships", "json"),
+        ("version", "version", ""),
+        ("created_at", "created_at", "date"),
+        ("updated_at", "updated_at", "date"),
+    ]),
+    "cover": (Cover, [
+        ("id", "cover_id", ""),
+        ("manga_id", "manga_id", ""),
+        ("volume", "volume", ""),
+        ("file_name", "file_name", ""),
+        ("description", "description", ""),
+        ("locale", "locale", ""),
+        ("version", "version", ""),
+        ("created_at", "created_at", "date"),
+        ("updated_at", "updated_at", "date"),
+    ]),
+}
+
+_TABLE_BY_CLASS = {spec[0]: table for table, spec in _TABLES.items()}
+
+_MANGA_ORDER = {
+    "createdAt": "created_at",
+    "updatedAt": "updated_at",
+    "year": "year",
+}
+
+# SQLite builds before 3.32 cap bound parameters at 999
+_CHUNK = 500
+
+
+def _dump_date(value: Union[datetime.datetime, str, None]) -> Union[str, None]:
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = parse(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=datetime.timezone.utc)
+    return value.astimezone(datetime.timezone.utc).isoformat()
+
+
+def _dump(value: Any, kind: str) -> Any:
+    if kind == "json":
+        return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+    if kind == "date":
+        return _dump_date(value)
+    if kind == "bool":
+        return None if value is None else int(value in (True, "true"))
+    return value
+
+
+def _load(value: Any, kind: str) -> Any:
+    if value is None:
+        return None
+    if kind == "json":
+        return json.loads(value)
+    if kind == "date":
+        return datetime.datetime.fromisoformat(value)
+    if kind == "bool":
+        return bool(value)
+    return value
+
+
+def _as_list(value: Union[str, Iterable[str]]) -> List[str]:
+    if isinstance(value, str):
+        return [value]
+    return list(value)
+
+
+def _chunks(values: List[Any], size: int = _CHUNK) -> Iterable[List[Any]]:
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _upsert_sql(table: str, columns: List[str]) -> str:
+    names = ", ".join(columns)
+    marks = ", ".join("?" for _ in columns)
+    updates = ", ".join(f"{col} = excluded.{col}" for col in columns if col != "id")
+    sql = f"INSERT INTO {table} ({names}) VALUES ({marks}) ON CONFLICT(id) DO UPDATE SET {updates}"
+    if "updated_at" in columns:
+        # only newer data replaces what is stored, ties are broken by version
+        sql += (
+            f" WHERE {table}.updated_at IS NULL"
+            f" OR excluded.updated_at > {table}.updated_at"
+            f" OR (excluded.updated_at = {table}.updated_at"
+            f" AND excluded.version > {table}.version)"
+        )
+    return sql
+
+
+class SQLiteStore:
+    """Persists parsed MangaDex objects into indexed SQLite tables
+
+    Objects are upserted by ``updatedAt`` (and ``version`` on ties) so replaying
+    older responses never overwrites newer data. Reads never touch the network.
+    """
+
+    def __init__(self, path: str = ":memory:") -> None:
+        """Opens (or creates) the mirror database
+
+        Args:
+            path (str, optional): Database file. Defaults to an in memory database.
+        """
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._sql = {
+            table: _upsert_sql(table, [col for col, _, _ in columns])
+            for table, (_, columns) in _TABLES.items()
+        }
+
+    def __enter__(self) -> "SQLiteStore":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __repr__(self) -> str:
+        return f"SQLiteStore(path = {self.path})"
+
+    def close(self) -> None:
+        """Closes the database connection"""
+        with self._lock:
+            self._conn.close()
+
+    # Writers
+
+    def save(self, obj: Union[Manga, Chapter, Tag, Author, ScanlationGroup, Cover]) -> None:
+        """Upserts a single parsed object
+
+        Args:
+            obj: A Manga, Chapter, Tag, Author, ScanlationGroup or Cover
+        """
+        self.save_many([obj])
+
+    def save_many(self, objs: Iterable[Any]) -> int:
+        """Upserts parsed objects in a single transaction
+
+        Args:
+            objs: Manga, Chapter, Tag, Author, ScanlationGroup or Cover objects
+
+        Raises:
+            TypeError: Raised when an object of an unsupported type is given
+
+        Returns:
+            int: The number of rows that were inserted or updated
+        """
+        changed = 0
+        with self._lock, self._conn:
+            cursor = self._conn.cursor()
+            for obj in objs:
+                table = _TABLE_BY_CLASS.get(type(obj))
+                if table is None:
+                    for cls, name in _TABLE_BY_CLASS.items():
+                        if isinstance(obj, cls):
+                            table = name
+                            break
+                    else:
+                        raise TypeError(f"Cannot store objects of type {type(obj).__name__}")
+
+                cursor.execute(self._sql[table], self.__to_row(table, obj))
+                updated = cursor.rowcount > 0
+                changed += cursor.rowcount
+                if table == "manga":
+                    self.__save_manga_tags(cursor, obj, updated)
+        return changed
+
+    def __save_manga_tags(self, cursor: sqlite3.Cursor, manga: Manga, updated: bool) -> None:
+        if manga.tags:
+            cursor.executemany(
+                self._sql["tag"], [self.__to_row("tag", tag) for tag in manga.tags]
+            )
+        if not updated:
+            return
+        cursor.execute("DELETE FROM manga_tag WHERE manga_id = ?", (manga.manga_id,))
+        cursor.executemany(
+            "INSERT OR IGNORE INTO manga_tag (manga_id, tag_id) VALUES (?, ?)",
+            [(manga.manga_id, tag.tag_id) for tag in manga.tags],
+        )
+
+    @staticmethod
+    def __to_row(table: str, obj: Any) -> tuple:
+        _, columns = _TABLES[table]
+        return tuple(_dump(getattr(obj, attr, None), kind) for _, attr, kind in columns)
+
+    @staticmethod
+    def __from_row(table: str, row: tuple) -> Any:
+        cls, columns = _TABLES[table]
+        obj = cls()
+        for value, (_, attr, kind) in zip(row, columns):
+            setattr(obj, attr, _load(value, kind))
+        return obj
+
+    # Readers
+
+    def __select(self, table: str, where: str = "", args: tuple = (), tail: str = "") -> List[Any]:
+        _, columns = _TABLES[table]
+        names = ", ".join(f"{table}.{col}" for col, _, _ in columns)
+        sql = f"SELECT {names} FROM {table}"
+        if where:
+            sql = f"{sql} WHERE {where}"
+        with self._lock:
+            rows = self._conn.execute(f"{sql} {tail}", args).fetchall()
+        return [self.__from_row(table, row) for row in rows]
+
+    def __get(self, table: str, obj_id: str) -> Any:
+        found = self.__select(table, "id = ?", (obj_id,))
+        return found[0] if found else None
+
+    def __attach_tags(self, mangas: List[Manga]) -> List[Manga]:
+        by_id = {manga.manga_id: manga for manga in mangas}
+        for manga in mangas:
+            manga.tags = []
+        _, columns = _TABLES["tag"]
+        names = ", ".join(f"tag.{col}" for col, _, _ in columns)
+        for ids in _chunks(list(by_id)):
+            marks = ", ".join("?" for _ in ids)
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT manga_tag.manga_id, {names} FROM manga_tag"
+                    f" JOIN tag ON tag.id = manga_tag.tag_id WHERE manga_tag.manga_id IN ({marks})",
+                    ids,
+                ).fetchall()
+            for row in rows:
+                by_id[row[0]].tags.append(self.__from_row("tag", row[1:]))
+        return mangas
+
+    def get_manga_by_id(self, manga_id: str) -> Union[Manga, None]:
+        """Get a stored Manga by its id
+
+        Args:
+            manga_id (str): The manga id
+
+        Returns:
+            Union[Manga, None]: The Manga, or None if it isn't stored
+        """
+        manga = self.__get("manga", manga_id)
+        return self.__attach_tags([manga])[0] if manga is not None else None
+
+    @staticmethod
+    def __manga_filters(params: Dict[str, Any]) -> tuple:
+        params = dict(params)
+        where: List[str] = []
+        args: List[Any] = []
+
+        columns = {
+            "ids": "id",
+            "status": "status",
+            "contentRating": "content_rating",
+            "originalLanguage": "original_language",
+            "publicationDemographic": "publication_demographic",
+        }
+        for key, column in columns.items():
+            values = params.pop(key, None)
+            if values is None:
+                continue
+            values = _as_list(values)
+            where.append(f"{column} IN ({', '.join('?' for _ in values)})")
+            args.extend(values)
+
+        for key, default_mode, negate in (
+            ("includedTags", "AND", False),
+            ("excludedTags", "OR", True),
+        ):
+            tags = params.pop(key, None)
+            mode = params.pop(f"{key}Mode", default_mode).upper()
+            if not tags:
+                continue
+            tags = _as_list(tags)
+            subquery = (
+                f"SELECT manga_id FROM manga_tag WHERE tag_id IN ({', '.join('?' for _ in tags)})"
+            )
+            args.extend(tags)
+            if mode == "AND":
+                subquery += " GROUP BY manga_id HAVING COUNT(*) = ?"
+                args.append(len(set(tags)))
+            where.append(f"id {'NOT IN' if negate else 'IN'} ({subquery})")
+
+        if params.get("year") is not None:
+            where.append("year = ?")
+            args.append(int(params.pop("year")))
+        for key, column in (("createdAtSince", "created_at"), ("updatedAtSince", "updated_at")):
+            since = params.pop(key, None)
+            if since is not None:
+                where.append(f"{column} >= ?")
+                args.append(_dump_date(since))
+
+        return " AND ".join(where), tuple(args), params
+
+    def get_manga_list(self, **kwargs) -> List[Manga]:
+        """Search the stored Manga. Mirrors the filters of `Manga.get_manga_list`
+
+        Args:
+            limit (int): Limit the number of results. Defaults to 10.
+            offset (int): Offset the results by this number.
+            ids (List[str]): List of manga IDs.
+            includedTags (List[Tag.id]): Tags to include.
+            includedTagsMode (str): "AND" (default) or "OR".
+            excludedTags (List[Tag.id]): Tags to exclude.
+            excludedTagsMode (str): "AND" or "OR" (default).
+            status (List[str]): Status of manga.
+            contentRating (List[str]): Content rating.
+            originalLanguage (List[str]): Original language of the manga.
+            publicationDemographic (List[str]): Demographic of publication.
+            year (int): Year of publication.
+            createdAtSince (str): Datetime string in the format YYYY-MM-DDTHH:MM:SS.
+            updatedAtSince (str): Datetime string in the format YYYY-MM-DDTHH:MM:SS.
+            order (Dict[str, str]): Ordering by createdAt, updatedAt or year, e.g.
+                ``{"createdAt": "desc"}``.
+
+        Raises:
+            ValueError: Raised when a filter or an order is not supported locally,
+                e.g. latestUploadedChapter, which is not stored
+
+        Returns:
+            List[Manga]: A list of Manga objects.
+        """
+        limit = int(kwargs.pop("limit", 10))
+        offset = int(kwargs.pop("offset", 0))
+        order = kwargs.pop("order", None) or {"createdAt": "asc"}
+        where, args, unknown = self.__manga_filters(kwargs)
+        if unknown:
+            raise ValueError(f"Unsupported local filters: {', '.join(unknown)}")
+
+        ordering = []
+        for key, direction in order.items():
+            if key not in _MANGA_ORDER or direction.lower() not in ("asc", "desc"):
+                raise ValueError(f"Unsupported order: {key}={direction}")
+            ordering.append(f"{_MANGA_ORDER[key]} {direction.upper()}")
+        ordering.append("id ASC")
+
+        tail = f"ORDER BY {', '.join(ordering)} LIMIT ? OFFSET ?"
+        mangas = self.__select("manga", where, args + (limit, offset), tail)
+        return self.__attach_tags(mangas)
+
+    def count_manga(self, **kwargs) -> int:
+        """Counts the stored Manga matching the `get_manga_list` filters
+
+        Returns:
+            int: Number of matches
+        """
+        where, args, unknown = self.__manga_filters(kwargs)
+        if unknown:
+            raise ValueError(f"Unsupported local filters: {', '.join(unknown)}")
+        sql = "SELECT COUNT(*) FROM manga" + (f" WHERE {where}" if where else "")
+        with self._lock:
+            return self._conn.execute(sql, args).fetchone()[0]
+
+    def manga_feed(self, manga_id: str, **kwargs) -> List[Chapter]:
+        """Get the stored chapters of a manga in reading order
+
+        Args:
+            manga_id (str): The manga id
+            translatedLanguage (List[str]): The translated languages to return
+            limit (int): Limit the number of results.
+            offset (int): Offset the results by this number.
+
+        Returns:
+            List[Chapter]: A list of Chapter objects
+        """
+        where = "manga_id = ?"
+        args: List[Any] = [manga_id]
+        if kwargs.get("translatedLanguage"):
+            languages = _as_list(kwargs["translatedLanguage"])
+            where += f" AND translated_language IN ({', '.join('?' for _ in languages)})"
+            args.extend(languages)
+        tail = "ORDER BY CAST(volume AS REAL), chapter, id LIMIT ? OFFSET ?"
+        args.extend((int(kwargs.get("limit", -1)), int(kwargs.get("offset", 0))))
+        return self.__select("chapter", where, tuple(args), tail)
+
+    def get_chapter_by_id(self, chapter_id: str) -> Union[Chapter, None]:
+        """Get a stored Chapter by its id"""
+        return self.__get("chapter", chapter_id)
+
+    def get_author_by_id(self, author_id: str) -> Union[Author, None]:
+        """Get a stored Author by its id"""
+        return self.__get("author", author_id)
+
+    def get_group_by_id(self, group_id: str) -> Union[ScanlationGroup, None]:
+        """Get a stored ScanlationGroup by its id"""
+        return self.__get("scanlation_group", group_id)
+
+    def get_cover(self, cover_id: str) -> Union[Cover, None]:
+        """Get a stored Cover by its id"""
+        return self.__get("cover", cover_id)
+
+    def get_manga_covers(self, manga_id: str) -> List[Cover]:
+        """Get the stored covers of a manga"""
+        return self.__select("cover", "manga_id = ?", (manga_id,), "ORDER BY volume")
+
+    def get_feed_cursor(self, user_id: str) -> tuple:
+        """Get the persisted feed position of a user
+
+        Args:
+            user_id (str): The user id
+
+        Returns:
+            tuple: The cursor datetime (or None) and a dict of the chapter ids
+                already seen around it, mapped to their publish date
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT cursor, seen FROM feed_cursor WHERE user_id = ?", (user_id,)
+            ).fetchone()
+        if row is None:
+            return None, {}
+        return _load(row[0], "date"), _load(row[1], "json") or {}
+
+    def set_feed_cursor(
+        self, user_id: str, cursor: datetime.datetime, seen: Dict[str, str]
+    ) -> None:
+        """Persists the feed position of a user
+
+        Args:
+            user_id (str): The user id
+            cursor (datetime.datetime): Publish date of the newest chapter seen
+            seen (Dict[str, str]): Chapter ids already seen around the cursor
+        """
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO feed_cursor (user_id, cursor, seen) VALUES (?, ?, ?)",
+                (user_id, _dump_date(cursor), _dump(seen, "json")),
+            )
+
+    def tag_list(self) -> List[Tag]:
+        """Get the stored tags
+
+        Returns:
+            List[Tag]: Tag list
+        """
+        return self.__select("tag", tail="ORDER BY group_name, id")
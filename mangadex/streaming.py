@@ -0,0 +1,162 @@
+"""Module for decoding large collection responses incrementally"""
+from __future__ import absolute_import
+
+import codecs
+import json
+import re
+
+from typing_extensions import Any, Callable, Dict, Iterator, Union
+
+_DATA_KEY = re.compile(r'"data"\s*:\s*\[')
+_SEPARATORS = re.compile(r"[\s,]*")
+
+
+def accept_encoding() -> str:
+    """``Accept-Encoding`` value with every encoding urllib3 can decode here
+
+    gzip and deflate always, br with brotli installed and zstd with zstandard
+    installed (``pip install mangadex[compression]``).
+    """
+    try:
+        from urllib3.util.request import ACCEPT_ENCODING
+    except ImportError:
+        return "gzip, deflate"
+    return ", ".join(encoding.strip() for encoding in ACCEPT_ENCODING.split(","))
+
+
+def _text_chunks(resp, chunk_size: int) -> Iterator[str]:
+    # iter_content undoes the Content-Encoding; utf-8 sequences may still be
+    # split between chunks, the incremental decoder keeps them whole
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    for chunk in resp.iter_content(chunk_size):
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+class StreamedPage:
+    """A collection response whose ``data`` items are decoded one at a time
+
+    Only one network chunk and the item being decoded are kept in memory, so the
+    peak memory of a 500 item feed page stays bounded. Items are passed through
+    ``decoder`` when one is given. The other keys of the
+    response (``total``, ``limit``, ``offset``...) are in ``meta``, complete once
+    the items were iterated. A response without a ``data`` array is kept whole
+    in ``meta`` and yields nothing.
+
+    Usage::
+
+        page = manga.stream_manga_feed(manga_id, limit=500)
+        for chapter in page:
+            ...
+        page.meta["total"]
+    """
+
+    def __init__(
+        self,
+        resp,
+        chunk_size: int = 64 * 1024,
+        decoder: Union[Callable[[dict], Any], None] = None,
+    ) -> None:
+        self.resp = resp
+        self.chunk_size = chunk_size
+        self.decoder = decoder
+        self.meta: Dict[str, Any] = {}
+        self._started = False
+
+    def __repr__(self) -> str:
+        return f"StreamedPage(url = {self.resp.url}, meta = {self.meta})"
+
+    def __enter__(self) -> "StreamedPage":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Releases the connection, also when the items were not all read"""
+        self.resp.close()
+
+    def __iter__(self) -> Iterator[Any]:
+        if self._started:
+            raise RuntimeError("A StreamedPage can only be iterated once")
+        self._started = True
+        try:
+            if self.decoder is None:
+                yield from self.__items()
+            else:
+                for item in self.__items():
+                    yield self.decoder(item)
+        finally:
+            self.close()
+
+    def __items(self) -> Iterator[Any]:
+        decoder = json.JSONDecoder()
+        chunks = _text_chunks(self.resp, self.chunk_size)
+        buf = ""
+        exhausted = False
+
+        def more() -> bool:
+            nonlocal buf, exhausted
+            chunk = next(chunks, None)
+            if chunk is None:
+                exhausted = True
+                return False
+            buf += chunk
+            return True
+
+        # the "data" array, at the top level of the object
+        search_from = 0
+        while True:
+            match = _DATA_KEY.search(buf, search_from)
+            if match is not None:
+                try:
+                    self.meta = json.loads(buf[: match.start()] + '"data": null}')
+                except json.JSONDecodeError:
+                    # "data" nested in an earlier value
+                    search_from = match.end()
+                    continue
+                self.meta.pop("data")
+                break
+            if not more():
+                self.meta = json.loads(buf) if buf.strip() else {}
+                return
+
+        buf = buf[match.end():]
+        pos = 0
+        while True:
+            pos = _SEPARATORS.match(buf, pos).end()
+            if pos >= len(buf):
+                if not more():
+                    raise ValueError("Truncated response: the data array is not closed")
+                continue
+            if buf[pos] == "]":
+                pos += 1
+                break
+            try:
+                item, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                item, end = None, None
+            # a value ending with the buffer may continue in the next chunk
+            if end is None or (end == len(buf) and not exhausted):
+                buf = buf[pos:]
+                pos = 0
+                if more():
+                    continue
+                if end is None:
+                    raise ValueError("Truncated response: incomplete item in the data array")
+                item, end = decoder.raw_decode(buf, 0)
+            yield item
+            pos = end
+            if pos > self.chunk_size:
+                buf = buf[pos:]
+                pos = 0
+
+        rest = (buf[pos:] + "".join(chunks)).strip()
+        if rest.startswith(","):
+            rest = rest[1:]
+        self.meta.update(json.loads("{" + rest) if rest != "}" else {})
+
@@ -0,0 +1,298 @@
+"""Module synchronizing local reading state with the logged in user's account"""
+from __future__ import absolute_import
+
+import logging
+import threading
+
+from typing_extensions import Any, Callable, Dict, Iterable, Optional, Union
+
+logger = logging.getLogger("mangadex")
+
+READING_STATUSES = ("reading", "on_hold", "plan_to_read", "dropped", "re_reading", "completed")
+
+
+class SyncReport:
+    """What a sync changed, per manga (per kind for `sync_follows`)
+
+    ``added`` and ``removed`` hold what was sent for each manga, ``errors`` the
+    ids whose update failed and why. Manga already in the desired state
+    appear in neither.
+    """
+
+    __slots__ = ("added", "removed", "errors", "requests")
+
+    def __init__(self) -> None:
+        self.added: Dict[str, Any] = {}
+        self.removed: Dict[str, Any] = {}
+        self.errors: Dict[str, BaseException] = {}
+        self.requests = 0
+
+    def __repr__(self) -> str:
+        return (
+            f"SyncReport(added = {len(self.added)}, removed = {len(self.removed)}, "
+            f"errors = {len(self.errors)}, requests = {self.requests})"
+        )
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+
+def _apply(
+    client,
+    changes: Dict[str, Any],
+    send: Callable[[str, Any], int],
+    report: SyncReport,
+    progress: Optional[Callable[[int, int, str, Optional[BaseException]], None]],
+) -> None:
+    # one call per changed manga on the client's threads, reporting as they finish
+    lock = threading.Lock()
+    done = 0
+
+    def report_progress(manga_id: str, error: Optional[BaseException]) -> None:
+        nonlocal done
+        if progress is None:
+            return
+        # a failing callback changes neither the outcome nor the error
+        try:
+            with lock:
+                done += 1
+                progress(done, len(changes), manga_id, error)
+        except Exception:
+            logger.exception("mangadex sync progress callback %r failed", progress)
+
+    def call(manga_id: str) -> int:
+        try:
+            sent = send(manga_id, changes[manga_id])
+        except Exception as e:
+            report_progress(manga_id, e)
+            raise
+        report_progress(manga_id, None)
+        return sent
+
+    for result in client.map_concurrent(call, list(changes)):
+        if result.ok:
+            report.requests += result.value
+        else:
+            report.errors[result.item] = result.error
+
+
+def sync_read_markers(
+    client,
+    desired: Dict[str, Iterable[str]],
+    exact: bool = True,
+    update_history: bool = False,
+    progress: Optional[Callable[[int, int, str, Optional[BaseException]], None]] = None,
+) -> SyncReport:
+    """Makes the read chapters of the account match ``desired``, sending only the difference
+
+    The current markers of every manga are read with one request per 100 manga,
+    then each manga that differs gets its changes in as few requests as
+    possible, several manga at once on the client's threads. A failing manga
+    doesn't stop the others, see `SyncReport.errors`.
+
+    Args:
+        client (MangaDexClient): Logged in client.
+        desired (Dict[str, Iterable[str]]): Read chapter ids, by manga id.
+        exact (bool, optional): Mark as unread the chapters read on MangaDex but not
+            in ``desired``. With False chapters are only added. Defaults to True.
+        update_history (bool, optional): Add the chapters to the reading history.
+        progress (Callable, optional): Called after each manga with the number of manga
+            done, the number to do, the manga id and its error (None when it worked).
+
+    Returns:
+        SyncReport: The chapters marked read (``added``) and unread (``removed``)
+    """
+    desired = {manga_id: set(chapter_ids) for manga_id, chapter_ids in desired.items()}
+    report = SyncReport()
+    manga_ids = list(desired)
+    remote = client.manga.get_read_markers(manga_ids)
+    report.requests += (len(manga_ids) + 99) // 100
+
+    changes = {}
+    for manga_id in manga_ids:
+        current = set(remote.get(manga_id, ()))
+        read = sorted(desired[manga_id] - current)
+        unread = sorted(current - desired[manga_id]) if exact else []
+        if read or unread:
+            changes[manga_id] = (read, unread)
+
+    def send(manga_id: str, change: tuple) -> int:
+        read, unread = change
+        return client.manga.mark_chapters_read(
+            manga_id, read=read, unread=unread, update_history=update_history
+        )
+
+    _apply(client, changes, send, report, progress)
+    for manga_id, (read, unread) in changes.items():
+        if manga_id in report.errors:
+            continue
+        if read:
+            report.added[manga_id] = read
+        if unread:
+            report.removed[manga_id] = unread
+    return report
+
+
+def sync_reading_statuses(
+    client,
+    desired: Dict[str, Union[str, None]],
+    exact: bool = False,
+    progress: Optional[Callable[[int, int, str, Optional[BaseException]], None]] = None,
+) -> SyncReport:
+    """Makes the reading statuses of the account match ``desired``, sending only the difference
+
+    Every status is read with a single `Manga.get_all_manga_reading_status`
+    call, then only the manga whose status differs are updated, several at
+    once on the client's threads.
+
+    Args:
+        client (MangaDexClient): Logged in client.
+        desired (Dict[str, Union[str, None]]): Status by manga id, None to remove it.
+        exact (bool, optional): Also remove the statuses of manga not in ``desired``.
+            Defaults to False.
+        progress (Callable, optional): Called after each update with the number of updates
+            done, the number to do, the manga id and its error (None when it worked).
+
+    Raises:
+        ValueError: A status isn't one MangaDex knows
+
+    Returns:
+        SyncReport: The statuses set (``added``) and removed (``removed``), by manga id
+    """
+    for manga_id, status in desired.items():
+        if status is not None and status not in READING_STATUSES:
+            raise ValueError(f"Invalid reading status {status!r} for manga {manga_id}")
+    report = SyncReport()
+    remote = client.manga.get_all_manga_reading_status() or {}
+    report.requests += 1
+
+    changes = {
+        manga_id: status
+        for manga_id, status in desired.items()
+        if remote.get(manga_id) != status
+    }
+    if exact:
+        changes.update({manga_id: None for manga_id in remote if manga_id not in desired})
+
+    def send(manga_id: str, status: Union[str, None]) -> int:
+        client.manga.update_manga_reading_status(manga_id, status)
+        return 1
+
+    _apply(client, changes, send, report, progress)
+    for manga_id, status in changes.items():
+        if manga_id in report.errors:
+            continue
+        if status is None:
+            report.removed[manga_id] = remote[manga_id]
+        else:
+            report.added[manga_id] = status
+    return report
+
+
+def sync_follows(
+    client,
+    manga: Optional[Iterable[str]] = None,
+    groups: Optional[Iterable[str]] = None,
+    users: Optional[Iterable[str]] = None,
+    exact: bool = True,
+    progress: Optional[Callable[[int, int, str, Optional[BaseException]], None]] = None,
+) -> SyncReport:
+    """Makes the followed manga, groups and users match the given ids, sending only the difference
+
+    The current follows come from `Follows.followed_ids`, fetched once per kind
+    and then kept up to date by the follow calls, so a second sync against the
+    same client only sends what changed since. The kinds left to None are not
+    touched. The API only lists the first 10000 follows of a kind, so an
+    account following more can't be synchronized.
+
+    Args:
+        client (MangaDexClient): Logged in client.
+        manga (Iterable[str], optional): Manga ids to follow.
+        groups (Iterable[str], optional): Scanlation group ids to follow.
+        users (Iterable[str], optional): User ids to follow.
+        exact (bool, optional): Unfollow what isn't in the given ids. With False
+            follows are only added. Defaults to True.
+        progress (Callable, optional): Called after each follow or unfollow with the number
+            done, the number to do, the id and its error (None when it worked).
+
+    Raises:
+        ValueError: More than 10000 follows of a kind, nothing was sent
+
+    Returns:
+        SyncReport: The ids followed (``added``) and unfollowed (``removed``) by kind,
+            ``requests`` counts the follow and unfollow calls
+    """
+    desired = {
+        kind: set(ids)
+        for kind, ids in (("manga", manga), ("group", groups), ("user", users))
+        if ids is not None
+    }
+    report = SyncReport()
+    kinds = list(desired)
+    results = client.map_concurrent(client.follows.followed_ids, kinds)
+    current = {kind: result.get() for kind, result in zip(kinds, results)}
+
+    changes = {}
+    for kind, ids in desired.items():
+        changes.update({entity_id: (kind, True) for entity_id in ids - current[kind]})
+        if exact:
+            changes.update({entity_id: (kind, False) for entity_id in current[kind] - ids})
+
+    def send(entity_id: str, change: tuple) -> int:
+        kind, follow = change
+        client.follows.set_following(kind, entity_id, follow)
+        return 1
+
+    _apply(client, changes, send, report, progress)
+    for entity_id, (kind, follow) in sorted(changes.items()):
+        if entity_id not in report.errors:
+            (report.added if follow else report.removed).setdefault(kind, []).append(entity_id)
+    return report
+
+
+def sync_customlist(
+    client,
+    customlist_id: str,
+    manga_ids: Iterable[str],
+    exact: bool = True,
+    progress: Optional[Callable[[int, int, str, Optional[BaseException]], None]] = None,
+) -> SyncReport:
+    """Makes the Manga of a custom list match ``manga_ids``, sending only the difference
+
+    The list is read once, then the missing Manga are added and, with
+    ``exact``, the others removed, several at once on the client's threads.
+
+    Args:
+        client (MangaDexClient): Logged in client, owner of the list.
+        customlist_id (str): The custom list id.
+        manga_ids (Iterable[str]): Manga the list should hold.
+        exact (bool, optional): Remove the Manga not in ``manga_ids``. With False
+            Manga are only added. Defaults to True.
+        progress (Callable, optional): Called after each addition or removal with the
+            number done, the number to do, the manga id and its error (None when it worked).
+
+    Returns:
+        SyncReport: The list id of each Manga added (``added``) and removed (``removed``)
+    """
+    desired = set(manga_ids)
+    report = SyncReport()
+    current = set(client.custom_list.get_customlist(customlist_id).mangas)
+    report.requests += 1
+
+    changes = {manga_id: True for manga_id in desired - current}
+    if exact:
+        changes.update({manga_id: False for manga_id in current - desired})
+
+    def send(manga_id: str, add: bool) -> int:
+        if add:
+            client.custom_list.add_manga_to_customlist(manga_id, customlist_id)
+        else:
+            client.custom_list.remove_manga_from_customlist(manga_id, customlist_id)
+        return 1
+
+    _apply(client, changes, send, report, progress)
+    for manga_id, add in changes.items():
+        if manga_id not in report.errors:
+            (report.added if add else report.removed)[manga_id] = customlist_id
+    return report
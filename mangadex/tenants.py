@@ -0,0 +1,146 @@
+"""Module serving many MangaDex users from one process"""
+from __future__ import absolute_import
+
+import threading
+
+from typing_extensions import Dict, Hashable, List, Optional, Union
+
+from .auth import Auth
+from .client import MangaDexClient
+from .transport import FairRateLimiter, HTTP2Transport, Transport
+
+# key of the public client in the rate limiter, no tenant key can be equal to it
+_PUBLIC = object()
+
+
+class MultiTenantClient:
+    """Keeps one logged in `MangaDexClient` per user, all on the same connections
+
+    Every tenant is a `MangaDexClient.with_auth` of a shared client: one
+    connection pool and one thread pool serve everyone, public responses
+    (aggregates, identical GETs in flight) are shared, and what is cached for
+    a logged in user stays with their `Auth`. The requests of all the tenants
+    go through one `FairRateLimiter`, and each tenant's batches may only use
+    ``tenant_workers`` of the threads, so a busy tenant can't starve the others.
+
+    Usage::
+
+        tenants = md.MultiTenantClient()
+        alice = tenants.login("alice", username, password, client_id, client_secret)
+        alice.manga_list.get_my_mangalist()
+        tenants.public.manga.get_manga_list(limit=10)
+    """
+
+    def __init__(
+        self,
+        url: Optional[str] = None,
+        timeout: Optional[float] = None,
+        rate_limit: Optional[float] = 5.0,
+        burst: int = 5,
+        http2: bool = False,
+        workers: int = 8,
+        aggregate_ttl: float = 300.0,
+        user_state_ttl: Optional[float] = 60.0,
+        tenant_workers: Optional[int] = None,
+    ) -> None:
+        """Multi tenant client
+
+        Args:
+            url (str, optional): API url. Follows `Api.default_url` when not given.
+            timeout (float, optional): Request timeout. Follows `Api.default_timeout`.
+            rate_limit (float, optional): Requests per second of all the tenants together,
+                None for no limit. Defaults to 5.
+            burst (int, optional): Requests allowed at once. Defaults to 5.
+            http2 (bool, optional): Send with an `HTTP2Transport` (needs httpx).
+            workers (int, optional): Threads shared by the tenants' batches. Defaults to 8.
+            aggregate_ttl (float, optional): Seconds aggregates stay cached. Defaults to 300.
+            user_state_ttl (float, optional): See `MangaDexClient`. Defaults to 60.
+            tenant_workers (int, optional): Threads one tenant's batches may use at once.
+                Defaults to half of ``workers``.
+        """
+        self.rate_limiter = FairRateLimiter(rate_limit, burst) if rate_limit else None
+        transport_cls = HTTP2Transport if http2 else Transport
+        limiter = self.rate_limiter.tenant(_PUBLIC) if self.rate_limiter is not None else None
+        self.public = MangaDexClient(
+            url,
+            timeout,
+            transport=transport_cls(rate_limiter=limiter),
+            aggregate_ttl=aggregate_ttl,
+            workers=workers,
+            user_state_ttl=user_state_ttl,
+        )
+        self.tenant_workers = tenant_workers if tenant_workers is not None else max(1, workers // 2)
+        self._tenants: Dict[Hashable, MangaDexClient] = {}
+        self._lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        return f"MultiTenantClient(tenants = {len(self)}, rate_limiter = {self.rate_limiter})"
+
+    def __enter__(self) -> "MultiTenantClient":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self._tenants)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._tenants
+
+    def __getitem__(self, key: Hashable) -> MangaDexClient:
+        return self._tenants[key]
+
+    def keys(self) -> List[Hashable]:
+        """The keys of the tenants"""
+        with self._lock:
+            return list(self._tenants)
+
+    def tenant(self, key: Hashable, auth: Union[Auth, None] = None) -> MangaDexClient:
+        """The client of the user ``key``, created on first use
+
+        Args:
+            key (Hashable): Your identifier of the user, e.g. their id in your database.
+            auth (Auth, optional): Authentication of a new tenant. A new one by default.
+
+        Raises:
+            ValueError: ``auth`` was given for a tenant that already has another one
+
+        Returns:
+            MangaDexClient: The user's client
+        """
+        with self._lock:
+            client = self._tenants.get(key)
+            if client is None:
+                limiter = self.rate_limiter.tenant(key) if self.rate_limiter is not None else None
+                client = self._tenants[key] = self.public.with_auth(
+                    auth, rate_limiter=limiter, max_workers=self.tenant_workers
+                )
+            elif auth is not None and auth is not client.auth:
+                raise ValueError(f"Tenant {key!r} already has its authentication")
+            return client
+
+    def login(
+        self, key: Hashable, username: str, password: str, client_id: str, client_secret: str
+    ) -> MangaDexClient:
+        """Logs the user ``key`` in, see `Auth.login`
+
+        Returns:
+            MangaDexClient: The user's client
+        """
+        client = self.tenant(key)
+        client.login(username, password, client_id, client_secret)
+        return client
+
+    def remove(self, key: Hashable) -> None:
+        """Forgets a tenant and what was cached for them"""
+        with self._lock:
+            client = self._tenants.pop(key, None)
+        if client is not None and client.user_state is not None:
+            client.user_state.invalidate(client.auth)
+
+    def close(self) -> None:
+        """Forgets every tenant, closes the connections and stops the threads"""
+        with self._lock:
+            self._tenants.clear()
+        self.public.close()
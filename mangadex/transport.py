@@ -0,0 +1,483 @@
+"""Module providing the shared HTTP transport and rate limiting"""
+from __future__ import absolute_import
+
+import asyncio
+import copy
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from typing_extensions import Any, Callable, Deque, Dict, Hashable, Union
+
+from .metrics import current_event
+from .query import canonical_pairs
+from .streaming import accept_encoding
+
+logger = logging.getLogger("mangadex")
+
+
+class RateLimiter:
+    """Token bucket shared by every request of a transport
+
+    MangaDex allows about 5 requests per second per IP, with short bursts.
+    """
+
+    def __init__(self, rate: float = 5.0, burst: int = 5) -> None:
+        """Rate limiter
+
+        Args:
+            rate (float, optional): Requests per second. Defaults to 5.
+            burst (int, optional): Requests allowed at once. Defaults to 5.
+        """
+        if rate <= 0 or burst < 1:
+            raise ValueError("rate must be positive and burst at least 1")
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        return f"RateLimiter(rate = {self.rate}, burst = {self.burst})"
+
+    def reserve(self) -> float:
+        """Takes a token, returning how long the caller must wait before using it"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+    def acquire(self) -> float:
+        """Blocks until a request may be sent
+
+        Returns:
+            float: Seconds waited
+        """
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def pause(self, seconds: float) -> None:
+        """Empties the bucket for ``seconds``, e.g. after a 429 response"""
+        with self._lock:
+            self._tokens = min(self._tokens, -seconds * self.rate)
+            self._updated = time.monotonic()
+
+
+class FairRateLimiter:
+    """Token bucket shared by several tenants, which take the tokens in turn
+
+    The requests waiting for a token are queued per tenant and the tenants
+    with waiting requests are served round robin, so a tenant sending a
+    hundred requests at once delays the others by one request each, not by
+    its whole backlog. Without competition it behaves like `RateLimiter`.
+    """
+
+    def __init__(self, rate: float = 5.0, burst: int = 5) -> None:
+        """Fair rate limiter
+
+        Args:
+            rate (float, optional): Requests per second of all the tenants. Defaults to 5.
+            burst (int, optional): Requests allowed at once. Defaults to 5.
+        """
+        if rate <= 0 or burst < 1:
+            raise ValueError("rate must be positive and burst at least 1")
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        # tenants with waiting requests, the first one is served next
+        self._queues: "OrderedDict[Hashable, Deque[object]]" = OrderedDict()
+        self._condition = threading.Condition()
+
+    def __repr__(self) -> str:
+        return (
+            f"FairRateLimiter(rate = {self.rate}, burst = {self.burst}, "
+            f"waiting = {len(self._queues)})"
+        )
+
+    def tenant(self, tenant: Hashable) -> "TenantRateLimiter":
+        """The limiter of one tenant, for its `Transport`"""
+        return TenantRateLimiter(self, tenant)
+
+    def acquire(self, tenant: Hashable = None) -> float:
+        """Blocks until ``tenant`` may send a request
+
+        Returns:
+            float: Seconds waited
+        """
+        start = time.monotonic()
+        ticket = object()
+        with self._condition:
+            queue = self._queues.get(tenant)
+            if queue is None:
+                queue = self._queues[tenant] = deque()
+            queue.append(ticket)
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                turn = next(iter(self._queues)) == tenant and queue[0] is ticket
+                if turn and self._tokens >= 1:
+                    self._tokens -= 1
+                    queue.popleft()
+                    if queue:
+                        self._queues.move_to_end(tenant)
+                    else:
+                        del self._queues[tenant]
+                    self._condition.notify_all()
+                    return time.monotonic() - start
+                # until the next token, or until the tenant served before us takes it
+                missing = 1 - self._tokens if self._tokens < 1 else 1
+                self._condition.wait(missing / self.rate)
+
+    def pause(self, seconds: float) -> None:
+        """Empties the bucket of every tenant for ``seconds``, e.g. after a 429 response"""
+        with self._condition:
+            self._tokens = min(self._tokens, -seconds * self.rate)
+            self._updated = time.monotonic()
+
+
+class TenantRateLimiter:
+    """The share of one tenant of a `FairRateLimiter`"""
+
+    def __init__(self, limiter: FairRateLimiter, tenant: Hashable) -> None:
+        self.limiter = limiter
+        self.tenant = tenant
+
+    def __repr__(self) -> str:
+        return f"TenantRateLimiter(tenant = {self.tenant!r}, limiter = {self.limiter})"
+
+    def acquire(self) -> float:
+        """Blocks until the tenant may send a request, see `FairRateLimiter.acquire`"""
+        return self.limiter.acquire(self.tenant)
+
+    def pause(self, seconds: float) -> None:
+        """Pauses every tenant, a 429 is for the whole IP"""
+        self.limiter.pause(seconds)
+
+
+def coalesce_key(url: str, headers: Union[dict, None] = None) -> tuple:
+    """Key of a GET for `SingleFlight`: URL with canonical query and auth identity"""
+    parts = urlsplit(url)
+    query = urlencode(canonical_pairs(parse_qsl(parts.query, keep_blank_values=True)))
+    authorization = headers.get("Authorization") if headers else None
+    return (parts.scheme, parts.netloc, parts.path, query, authorization)
+
+
+class SingleFlight:
+    """Runs one call per key at a time, concurrent callers share its result
+
+    Threads wait on the result of the call in flight, coroutines await it, and
+    both kinds of callers can share the same call.
+    """
+
+    def __init__(self) -> None:
+        self._calls: Dict[Any, Future] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    def __join(self, key) -> tuple:
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                return future, False
+            future = self._calls[key] = Future()
+            return future, True
+
+    def __finish(self, key, future: Future, fn: Callable[[], Any]) -> None:
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+        else:
+            future.set_result(result)
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+    def do(self, key, fn: Callable[[], Any]) -> tuple:
+        """Calls ``fn`` unless a call with ``key`` is in flight
+
+        Returns:
+            tuple: The result and whether it came from another caller's call
+        """
+        future, leader = self.__join(key)
+        if leader:
+            self.__finish(key, future, fn)
+        return future.result(), not leader
+
+    async def do_async(self, key, fn: Callable[[], Any]) -> tuple:
+        """Like `do` for coroutines, ``fn`` (blocking) runs in the default executor"""
+        future, leader = self.__join(key)
+        if leader:
+            loop = asyncio.get_running_loop()
+            loop.run_in_executor(None, self.__finish, key, future, fn)
+        return await asyncio.wrap_future(future), not leader
+
+
+class Transport:
+    """Sends the requests of a `MangaDexClient`
+
+    Keeps one pooled ``requests.Session`` and one `RateLimiter` for every call,
+    and retries responses rate limited by the server (429) after the delay the
+    server asks for. Identical GETs in flight at the same time (same URL and
+    authorization) are sent once, every caller gets the same response.
+    """
+
+    def __init__(
+        self,
+        session: Union[requests.Session, None] = None,
+        rate_limiter: Union[RateLimiter, None] = None,
+        max_retries: int = 2,
+        max_retry_wait: float = 60.0,
+        pool_size: int = 10,
+        coalesce: bool = True,
+    ) -> None:
+        """Transport
+
+        Args:
+            session (requests.Session, optional): Session to send with. A new one by default.
+            rate_limiter (RateLimiter, optional): Limiter, None to send without limit.
+            max_retries (int, optional): Retries of a 429 response. Defaults to 2.
+            max_retry_wait (float, optional): Longest wait before a retry. Defaults to 60.
+            pool_size (int, optional): Connections kept per host. Defaults to 10.
+            coalesce (bool, optional): Share identical concurrent GETs. Defaults to True.
+        """
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers["Accept-Encoding"] = accept_encoding()
+        self.session = session
+        self.rate_limiter = rate_limiter
+        self.max_retries = max_retries
+        self.max_retry_wait = max_retry_wait
+        self.single_flight = SingleFlight() if coalesce else None
+        self.owns_session = True
+
+    def __repr__(self) -> str:
+        return f"Transport(rate_limiter = {self.rate_limiter}, max_retries = {self.max_retries})"
+
+    def close(self) -> None:
+        """Closes the pooled connections, unless they were shared by another transport"""
+        if self.owns_session:
+            self.session.close()
+
+    def share(self, rate_limiter) -> "Transport":
+        """A transport sending on this one's connection pool with another rate limiter
+
+        Identical GETs in flight are still sent once across both. Closing the
+        new transport leaves the pool open.
+        """
+        shared = copy.copy(self)
+        shared.rate_limiter = rate_limiter
+        shared.owns_session = False
+        return shared
+
+    def send(
+        self,
+        method: str,
+        url: str,
+        params: Any,
+        headers: Union[dict, None],
+        timeout,
+        stream: bool = False,
+    ) -> requests.Response:
+        """Sends one request, waiting for the rate limiter and retrying 429s
+
+        Streamed responses are read by a single caller, they are never shared.
+        """
+        if method != "GET" or stream or self.single_flight is None:
+            return self.__send(method, url, params, headers, timeout, stream)
+        resp, shared = self.single_flight.do(
+            coalesce_key(url, headers),
+            lambda: self.__send(method, url, params, headers, timeout),
+        )
+        if shared:
+            event = current_event()
+            if event is not None:
+                event.cache = "coalesced"
+        return resp
+
+    async def send_async(
+        self, method: str, url: str, params: Any, headers: Union[dict, None], timeout
+    ) -> requests.Response:
+        """`send` for coroutines, the request runs in the default executor
+
+        GETs coalesce with the ones in flight from threads and other coroutines.
+        """
+        if method != "GET" or self.single_flight is None:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                None, self.__send, method, url, params, headers, timeout
+            )
+        resp, _ = await self.single_flight.do_async(
+            coalesce_key(url, headers),
+            lambda: self.__send(method, url, params, headers, timeout),
+        )
+        return resp
+
+    def _request(
+        self,
+        method: str,
+        url: str,
+        params: Any,
+        headers: Union[dict, None],
+        timeout,
+        stream: bool = False,
+    ) -> requests.Response:
+        """Sends a request once, on the pooled session"""
+        from .url_models import URLRequest
+
+        return URLRequest._transmit(method, url, params, headers, timeout, self.session, stream)
+
+    def __send(
+        self,
+        method: str,
+        url: str,
+        params: Any,
+        headers: Union[dict, None],
+        timeout,
+        stream: bool = False,
+    ) -> requests.Response:
+        event = current_event()
+        attempt = 0
+        while True:
+            if self.rate_limiter is not None:
+                waited = self.rate_limiter.acquire()
+                if event is not None:
+                    event.rate_limit_wait += waited
+            resp = self._request(method, url, params, headers, timeout, stream)
+            if resp.status_code != 429 or attempt >= self.max_retries:
+                return resp
+            delay = self.retry_delay(resp)
+            if delay > self.max_retry_wait:
+                return resp
+            # only a response that is retried is thrown away
+            resp.close()
+            attempt += 1
+            if event is not None:
+                event.retries += 1
+            if self.rate_limiter is not None:
+                self.rate_limiter.pause(delay)
+            else:
+                time.sleep(delay)
+
+    @staticmethod
+    def retry_delay(resp: requests.Response) -> float:
+        """Seconds to wait before retrying a rate limited response"""
+        retry_after = resp.headers.get("X-RateLimit-Retry-After")
+        if retry_after:
+            # a unix timestamp of when requests are allowed again
+            try:
+                return max(0.0, float(retry_after) - time.time())
+            except ValueError:
+                pass
+        try:
+            return max(0.0, float(resp.headers.get("Retry-After", 1)))
+        except ValueError:
+            return 1.0
+
+
+class HTTP2Transport(Transport):
+    """`Transport` multiplexing concurrent requests over a few HTTP/2 connections
+
+    Uses httpx, an optional dependency: ``pip install httpx[http2]``. It takes
+    the same options as `Transport`; responses are converted to
+    ``requests.Response`` and errors to ``requests`` exceptions, so the rest of
+    the package sees no difference. Servers that don't negotiate HTTP/2 over TLS
+    are spoken to in HTTP/1.1, unless ``prior_knowledge`` says they speak it in
+    clear text (h2c).
+    """
+
+    def __init__(
+        self,
+        client=None,
+        rate_limiter: Union[RateLimiter, None] = None,
+        max_retries: int = 2,
+        max_retry_wait: float = 60.0,
+        pool_size: int = 10,
+        coalesce: bool = True,
+        prior_knowledge: bool = False,
+    ) -> None:
+        """HTTP/2 transport
+
+        Args:
+            client (httpx.Client, optional): Client to send with. By default a new
+                HTTP/2 client keeping up to ``pool_size`` connections.
+            prior_knowledge (bool, optional): Speak HTTP/2 to ``http://`` urls too,
+                without falling back to HTTP/1.1. Ignored when ``client`` is given.
+            Other arguments as in `Transport`.
+        """
+        try:
+            import httpx
+        except ImportError as e:
+            raise ImportError(
+                "HTTP2Transport needs httpx with HTTP/2 support: pip install httpx[http2]"
+            ) from e
+        self._httpx = httpx
+        if client is None:
+            limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+            client = httpx.Client(http1=not prior_knowledge, http2=True, limits=limits)
+        super().__init__(
+            session=client,
+            rate_limiter=rate_limiter,
+            max_retries=max_retries,
+            max_retry_wait=max_retry_wait,
+            coalesce=coalesce,
+        )
+
+    def _request(
+        self,
+        method: str,
+        url: str,
+        params: Any,
+        headers: Union[dict, None],
+        timeout,
+        stream: bool = False,
+    ) -> requests.Response:
+        """Sends a request once with httpx, mirroring `URLRequest._transmit`
+
+        Responses are always read whole, ``stream`` then iterates over memory.
+        """
+        httpx = self._httpx
+        kwargs = {}
+        if method == "POST":
+            kwargs = {"content": params} if isinstance(params, (str, bytes)) else {"data": params}
+        elif method == "PUT":
+            kwargs = {"params": params}
+        try:
+            resp = self.session.request(method, url, headers=headers, timeout=timeout, **kwargs)
+        except httpx.TimeoutException as e:
+            logger.error("%s %s failed: %s", method, url, e)
+            raise requests.Timeout(str(e)) from e
+        except httpx.HTTPError as e:
+            logger.error("%s %s failed: %s", method, url, e)
+            raise requests.ConnectionError(str(e)) from e
+        return _to_requests_response(resp)
+
+
+def _to_requests_response(resp) -> requests.Response:
+    converted = requests.Response()
+    converted.status_code = resp.status_code
+    converted.reason = resp.reason_phrase
+    converted.url = str(resp.url)
+    converted.headers = CaseInsensitiveDict(resp.headers)
+    converted.encoding = resp.encoding
+    converted.elapsed = resp.elapsed
+    converted._content = resp.content
+    converted._content_consumed = True
+    return converted
@@ -2,24 +2,25 @@
 Url handler module
 """
 
+import functools
 import json
+import logging
 
 import requests
-from typing_extensions import Any, Dict, Union
+from typing_extensions import Any, Callable, Dict, List, Union
 
 from .errors import ApiError
+from .metrics import RequestEvent, _set_current_event, active_profiler, route_template
+from .query import encode_query
+from .streaming import StreamedPage
+
+logger = logging.getLogger("mangadex")
 
 try:
     basestring
 except NameError:
-    from past.builtins import basestring
-
-try:
-    from urllib.parse import urlencode, urlparse
-except ImportError:
-    from urllib import urlencode
-
-    from urlparse import urlparse
+    # what past.builtins.basestring matches, without importing the future package
+    basestring = (str, bytes)
 
 
 class URLRequest:
@@ -27,6 +28,31 @@ class URLRequest:
     Handles the request to the server
     """
 
+    # A `Cassette` recording or replaying every request, see mangadex.cassette
+    cassette = None
+    # Callables receiving a `RequestEvent` after every request, see mangadex.metrics
+    hooks: List[Callable[[RequestEvent], None]] = []
+
+    @staticmethod
+    def add_hook(hook: Callable[[RequestEvent], None]) -> None:
+        """Calls ``hook`` with the `RequestEvent` of every request"""
+        if hook not in URLRequest.hooks:
+            URLRequest.hooks = URLRequest.hooks + [hook]
+
+    @staticmethod
+    def remove_hook(hook: Callable[[RequestEvent], None]) -> None:
+        """Stops calling ``hook``"""
+        URLRequest.hooks = [h for h in URLRequest.hooks if h is not hook]
+
+    @staticmethod
+    def emit(event: RequestEvent) -> None:
+        """Hands an event to every hook, a failing hook never breaks the request"""
+        for hook in URLRequest.hooks:
+            try:
+                hook(event)
+            except Exception:
+                logger.exception("mangadex request hook %r failed", hook)
+
     @staticmethod
     def request_url(
         url: str,
@@ -35,10 +61,16 @@ class URLRequest:
         params: Union[Dict[str, Any], None] = None,
         headers=None,
         json_body=False,
+        transport=None,
     ) -> dict:
         """
         The handler fot GET, POST, PUT and DEL
+
+        ``transport`` is the `mangadex.transport.Transport` of a client, without
+        it the request is sent on its own.
         """
+        if method not in ("GET", "POST", "DELETE", "PUT"):
+            raise ValueError(f"Method {method} is invalid")
         if params is None:
             params = {}
         params = {
@@ -50,65 +82,142 @@ class URLRequest:
 
         if method == "GET":
             url = URLRequest.__build_url(url, params)
+        resp = URLRequest._send(method, url, params, headers, timeout, transport)
+
+        if not resp.ok:
+            raise ApiError(resp)
+
+        content = resp.content
+        content = content if isinstance(content, basestring) else content.decode("utf-8")
+        profiler = active_profiler()
+        if profiler is not None:
+            return profiler.call(
+                f"json {method} {route_template(url)}", URLRequest.__parse_data, content
+            )
+        return URLRequest.__parse_data(content)
+
+    @staticmethod
+    def stream_url(
+        url: str,
+        timeout,
+        params: Union[Dict[str, Any], None] = None,
+        headers=None,
+        transport=None,
+        chunk_size: int = 64 * 1024,
+        decoder=None,
+    ) -> StreamedPage:
+        """
+        GET handler decoding the ``data`` array of the response incrementally
+
+        Returns:
+            StreamedPage: Iterable over the items of ``data``
+        """
+        url = URLRequest.__build_url(url, params or {})
+        resp = URLRequest._send("GET", url, params, headers, timeout, transport, stream=True)
+        if not resp.ok:
+            # the error body stays readable, the connection goes back to the pool
+            resp.content
+            resp.close()
+            raise ApiError(resp)
+        return StreamedPage(resp, chunk_size, decoder)
+
+    @staticmethod
+    def _send(
+        method: str,
+        url: str,
+        params: Any,
+        headers: Union[dict, None],
+        timeout,
+        transport=None,
+        stream: bool = False,
+    ) -> requests.Response:
+        """Sends the request, or replays it when a cassette is in use
+
+        When hooks are registered the request is wrapped in a `RequestEvent`,
+        which layers below can annotate through `mangadex.metrics.current_event`.
+        """
+        if not URLRequest.hooks:
+            return URLRequest.__dispatch(method, url, params, headers, timeout, transport, stream)
+
+        body = params if isinstance(params, (str, bytes)) else None
+        event = RequestEvent(method, url, len(body) if body else 0)
+        previous = _set_current_event(event)
+        try:
+            resp = URLRequest.__dispatch(
+                method, url, params, headers, timeout, transport, stream
+            )
+        except BaseException as e:
+            event.finish(error=e)
+            raise
+        else:
+            event.finish(resp, stream=stream)
+        finally:
+            _set_current_event(previous)
+            URLRequest.emit(event)
+        return resp
+
+    @staticmethod
+    def __dispatch(
+        method: str, url: str, params: Any, headers: Union[dict, None], timeout, transport, stream
+    ) -> requests.Response:
+        send = transport.send if transport is not None else URLRequest._transmit
+        if stream:
+            send = functools.partial(send, stream=True)
+        if URLRequest.cassette is not None:
+            return URLRequest.cassette.play(method, url, params, headers, timeout, send)
+        return send(method, url, params, headers, timeout)
+
+    @staticmethod
+    def _transmit(
+        method: str,
+        url: str,
+        params: Any,
+        headers: Union[dict, None],
+        timeout,
+        session: Union[requests.Session, None] = None,
+        stream: bool = False,
+    ) -> requests.Response:
+        """Sends the request with ``session``, or the requests module functions
+
+        With ``stream`` the body of a GET is left unread, see `stream_url`.
+        """
+        sender = session if session is not None else requests
+        if method == "GET":
             try:
-                resp = requests.get(url, headers=headers, timeout=timeout)
+                resp = sender.get(url, headers=headers, timeout=timeout, stream=stream)
             except requests.RequestException as e:
-                print(f"An error has occurred: {e}")
+                logger.error("%s %s failed: %s", method, url, e)
                 raise
         elif method == "POST":
             try:
-                resp = requests.post(url, data=params, headers=headers, timeout=timeout)
+                resp = sender.post(url, data=params, headers=headers, timeout=timeout)
             except requests.RequestException as e:
-                print(f"An error has occurred: {e}")
+                logger.error("%s %s failed: %s", method, url, e)
                 raise
         elif method == "DELETE":
             try:
-                resp = requests.delete(url, headers=headers, timeout=timeout)
+                resp = sender.delete(url, headers=headers, timeout=timeout)
             except requests.RequestException as e:
-                print(f"An error has occurred: {e}")
+                logger.error("%s %s failed: %s", method, url, e)
                 raise
         elif method == "PUT":
             try:
-                resp = requests.put(
+                resp = sender.put(
                     url, headers=headers, params=params, timeout=timeout
                 )
             except requests.RequestException as e:
-                print(f"An error has occurred: {e}")
+                logger.error("%s %s failed: %s", method, url, e)
                 raise
         else:
             raise ValueError(f"Method {method} is invalid")
-
-        if not resp.ok:
-            raise ApiError(resp)
-
-        content = resp.content
-        data = URLRequest.__parse_data(
-            content if isinstance(content, basestring) else content.decode("utf-8")
-        )
-        return data
+        return resp
 
     @staticmethod
     def __build_url(url: str, params: dict) -> str:
         if params and len(params) > 0:
-            url = url + "?" + URLRequest.__encode_parameters(params)
+            url = url + "?" + encode_query(params)
         return url
 
-    @staticmethod
-    def __encode_parameters(params: dict) -> str:
-        if params is None:
-            return ""
-        else:
-            params_tuple = []
-            for k, v in params.items():
-                if v is None:
-                    continue
-                if isinstance(v, (list, tuple)):
-                    for _ in v:
-                        params_tuple.append((k, _))
-                else:
-                    params_tuple.append((k, v))
-            return urlencode(params_tuple)
-
     @staticmethod
     def __parse_data(content):
         try:
@@ -0,0 +1,216 @@
+"""Module providing a watcher that emits new chapters of followed manga"""
+from __future__ import absolute_import
+
+import asyncio
+import datetime
+import threading
+
+from typing_extensions import AsyncIterator, Callable, Dict, Iterator, List, Union
+
+from .auth import Auth
+from .people import User
+from .query import CONTENT_RATINGS, RESULT_WINDOW
+from .series import Chapter, MangaList
+
+_DATE_FORMAT = "%Y-%m-%dT%H:%M:%S"
+
+
+def _utc(value: datetime.datetime) -> datetime.datetime:
+    if value.tzinfo is None:
+        return value.replace(tzinfo=datetime.timezone.utc)
+    return value.astimezone(datetime.timezone.utc)
+
+
+class FeedWatcher:
+    """Polls the aggregated followed manga feed and emits only new chapters
+
+    A single paginated request to `/user/follows/manga/feed` replaces one
+    `manga_feed` call per followed title, so the cost of a poll depends on the
+    number of new chapters, not on the number of follows. The position in the
+    feed is a ``publishAt`` cursor, persisted per user when a `SQLiteStore` is
+    given, and the polling interval adapts to the observed release rate.
+    """
+
+    def __init__(
+        self,
+        auth: Auth,
+        store=None,
+        user_id: Union[str, None] = None,
+        callback: Union[Callable[[Chapter], None], None] = None,
+        translated_language: Union[List[str], None] = None,
+        since: Union[datetime.datetime, None] = None,
+        min_interval: float = 60.0,
+        max_interval: float = 3600.0,
+        overlap: float = 300.0,
+        page_size: int = 100,
+        smoothing: float = 0.3,
+        client=None,
+    ) -> None:
+        """Feed watcher
+
+        Args:
+            auth (Auth): Authentication of the user whose follows are watched
+            store (SQLiteStore, optional): Persists the cursor and every new chapter.
+            user_id (str, optional): Key of the persisted cursor. Defaults to the
+                id of the logged in user.
+            callback (Callable[[Chapter], None], optional): Called for every new chapter.
+            translated_language (List[str], optional): Only watch these languages.
+            since (datetime.datetime, optional): Where to start when no cursor is
+                stored. Defaults to now, so history is not replayed.
+            min_interval (float, optional): Shortest polling interval, in seconds.
+            max_interval (float, optional): Longest polling interval, in seconds.
+            overlap (float, optional): Seconds re-read behind the cursor so chapters
+                indexed late are not missed. Defaults to 300.
+            page_size (int, optional): Chapters per request, up to 500. Defaults to 100.
+            smoothing (float, optional): Weight of the last poll in the release rate.
+            client (MangaDexClient, optional): Client whose transport and caches to use.
+        """
+        self.auth = auth
+        self.store = store
+        self.user_id = user_id
+        self.callback = callback
+        self.translated_language = translated_language
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.overlap = datetime.timedelta(seconds=overlap)
+        self.page_size = page_size
+        self.smoothing = smoothing
+
+        self.interval = min_interval
+        self.release_rate = 0.0  # chapters per second
+        self.client = client
+        self.mangalist = MangaList(auth=auth, client=client)
+
+        self._since = _utc(since) if since is not None else None
+        self._cursor: Union[datetime.datetime, None] = None
+        self._seen: Dict[str, str] = {}
+        self._loaded = False
+        self._last_poll: Union[datetime.datetime, None] = None
+        self._stop = threading.Event()
+
+    def __repr__(self) -> str:
+        return (
+            f"FeedWatcher(user_id = {self.user_id}, cursor = {self._cursor}, "
+            f"interval = {self.interval})"
+        )
+
+    @property
+    def cursor(self) -> Union[datetime.datetime, None]:
+        """Publish date of the newest chapter emitted so far"""
+        return self._cursor
+
+    def __load(self) -> None:
+        if self._loaded:
+            return
+        if self.user_id is None and self.store is not None:
+            self.user_id = User(auth=self.auth, client=self.client).me().id
+        if self.store is not None:
+            self._cursor, self._seen = self.store.get_feed_cursor(self.user_id)
+        if self._cursor is None:
+            self._cursor = self._since or datetime.datetime.now(datetime.timezone.utc)
+        self._loaded = True
+
+    def __fetch(self, since: datetime.datetime, offset: int) -> List[Chapter]:
+        params = {
+            "limit": self.page_size,
+            "offset": offset,
+            "publishAtSince": since.strftime(_DATE_FORMAT),
+            "order": {"publishAt": "asc"},
+            # the feed leaves erotica and pornographic chapters out by default
+            "contentRating": list(CONTENT_RATINGS),
+        }
+        if self.translated_language:
+            params["translatedLanguage"] = self.translated_language
+        return self.mangalist.get_my_manga_feed(**params)
+
+    def poll(self) -> List[Chapter]:
+        """Fetches the chapters published since the last poll
+
+        Returns:
+            List[Chapter]: The new chapters, oldest first
+        """
+        self.__load()
+        now = datetime.datetime.now(datetime.timezone.utc)
+        new_chapters: List[Chapter] = []
+        since = self._cursor - self.overlap
+        offset = 0
+        while True:
+            page = self.__fetch(since, offset)
+            for chapter in page:
+                published = _utc(chapter.publish_at) if chapter.publish_at else now
+                if chapter.chapter_id in self._seen or published < since:
+                    continue
+                self._seen[chapter.chapter_id] = published.isoformat(timespec="microseconds")
+                if published > self._cursor:
+                    self._cursor = published
+                new_chapters.append(chapter)
+            if len(page) < self.page_size:
+                break
+            offset += self.page_size
+            if offset + self.page_size > RESULT_WINDOW:
+                # restart the window from the cursor reached so far
+                since, offset = self._cursor - self.overlap, 0
+
+        horizon = (self._cursor - self.overlap).isoformat(timespec="microseconds")
+        self._seen = {
+            chapter_id: published
+            for chapter_id, published in self._seen.items()
+            if published >= horizon
+        }
+        if self.store is not None:
+            if new_chapters:
+                self.store.save_many(new_chapters)
+            self.store.set_feed_cursor(self.user_id, self._cursor, self._seen)
+
+        self.__adapt(len(new_chapters), now)
+        if self.callback is not None:
+            for chapter in new_chapters:
+                self.callback(chapter)
+        return new_chapters
+
+    def __adapt(self, new_count: int, now: datetime.datetime) -> None:
+        elapsed = (now - self._last_poll).total_seconds() if self._last_poll else self.interval
+        self._last_poll = now
+        rate = new_count / elapsed if elapsed > 0 else 0.0
+        self.release_rate = self.smoothing * rate + (1 - self.smoothing) * self.release_rate
+        # aim for roughly one new chapter per poll
+        interval = 1 / self.release_rate if self.release_rate > 0 else self.max_interval
+        self.interval = min(max(interval, self.min_interval), self.max_interval)
+
+    def stop(self) -> None:
+        """Stops `run`, `watch` or `stream` after the current poll"""
+        self._stop.set()
+
+    def run(self) -> None:
+        """Polls until `stop` is called, passing new chapters to the callback"""
+        for _ in self.watch():
+            pass
+
+    def watch(self) -> Iterator[Chapter]:
+        """Polls until `stop` is called
+
+        Yields:
+            Chapter: Every new chapter
+        """
+        self._stop.clear()
+        while not self._stop.is_set():
+            for chapter in self.poll():
+                yield chapter
+            self._stop.wait(self.interval)
+
+    async def stream(self) -> AsyncIterator[Chapter]:
+        """Polls until `stop` is called, without blocking the event loop
+
+        Yields:
+            Chapter: Every new chapter
+        """
+        loop = asyncio.get_running_loop()
+        self._stop.clear()
+        while not self._stop.is_set():
+            for chapter in await loop.run_in_executor(None, self.poll):
+                yield chapter
+            waited = 0.0
+            while waited < self.interval and not self._stop.is_set():
+                step = min(1.0, self.interval - waited)
+                await asyncio.sleep(step)
+                waited += step
@@ -16,7 +16,7 @@ setup(
     description=DESCRIPTION,
     long_description=LONG_DESCRIPTION,
     long_description_content_type="text/markdown",
-    packages=find_packages(),
+    packages=find_packages(exclude=["benchmarks", "benchmarks.*", "test"]),
     install_requires=[
         "requests",
         "future",
@@ -24,6 +24,11 @@ setup(
         "pytest",
         "typing-extensions",
     ],
+    extras_require={
+        "http2": ["httpx[http2]"],
+        "compression": ["brotli", "zstandard"],
+        "otel": ["opentelemetry-api"],
+    },
     source="https://github.com/EMACC99/mangadex",
     download_url="https://github.com/EMACC99/mangadex/releases",
     documentation="https://github.com/EMACC99/mangadex/wiki",
@@ -32,7 +37,6 @@ setup(
     clasifiers=[
         "License :: MIT License",
         "Operating System :: OS Independent",
-        "Programming Language :: Python :: 3.6",
         "Programming Language :: Python :: 3.7",
         "Programming Language :: Python :: 3.8",
         "Programming Language :: Python :: 3.9",
@@ -42,5 +46,5 @@ setup(
         "Topic :: Wrapper",
     ],
     zip_safe=False,
-    python_requires=">=3.6",
+    python_requires=">=3.7",
 )
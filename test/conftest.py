@@ -0,0 +1,24 @@
+"""
+Shared fixtures for the offline tests
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import mangadex as md  # noqa: E402
+from benchmarks import Dataset, FakeMangaDex  # noqa: E402
+
+
+@pytest.fixture
+def fake_mangadex():
+    """A local stand-in server that every new `Api` points to"""
+    server = FakeMangaDex(Dataset(mangas=8, chapters_per_manga=6)).start()
+    default_url = md.Api.default_url
+    md.Api.default_url = server.url
+    yield server
+    md.Api.default_url = default_url
+    server.stop()
@@ -2,9 +2,17 @@
 Module for unit and integration tests
 """
 
+import asyncio
+import datetime
+import json
 import os
+import subprocess
+import sys
+import threading
+import time
 
 import pytest
+import requests
 from dotenv import load_dotenv
 
 import mangadex as md
@@ -315,3 +323,1254 @@ class Test_Errors:
             self.follows.follow_manga(manga_id=manga_id)
         except AttributeError:
             pass
+
+
+def _tag_json(tag_id, name, group="genre"):
+    return {
+        "id": tag_id,
+        "type": "tag",
+        "attributes": {"name": {"en": name}, "description": {}, "group": group, "version": 1},
+        "relationships": [],
+    }
+
+
+def _manga_json(manga_id, title, tags=(), updated_at="2022-01-01T00:00:00+00:00", **attributes):
+    attrs = {
+        "title": {"en": title},
+        "altTitles": [],
+        "description": {"en": ""},
+        "isLocked": False,
+        "links": {},
+        "originalLanguage": "ja",
+        "lastVolume": "",
+        "lastChapter": "",
+        "publicationDemographic": None,
+        "status": "ongoing",
+        "year": 2020,
+        "contentRating": "safe",
+        "tags": list(tags),
+        "version": 1,
+        "createdAt": "2021-01-01T00:00:00+00:00",
+        "updatedAt": updated_at,
+    }
+    attrs.update(attributes)
+    return {"id": manga_id, "type": "manga", "attributes": attrs, "relationships": []}
+
+
+def _chapter_json(chapter_id, manga_id, chapter, volume=None, language="en", group_id="g1", **attributes):
+    attrs = {
+        "title": "",
+        "volume": volume,
+        "chapter": chapter,
+        "translatedLanguage": language,
+        "pages": 20,
+        "version": 1,
+        "publishAt": "2022-01-01T00:00:00+00:00",
+        "createdAt": "2022-01-01T00:00:00+00:00",
+        "updatedAt": "2022-01-01T00:00:00+00:00",
+    }
+    attrs.update(attributes)
+    return {
+        "id": chapter_id,
+        "type": "chapter",
+        "attributes": attrs,
+        "relationships": [
+            {"id": group_id, "type": "scanlation_group"},
+            {"id": manga_id, "type": "manga"},
+        ],
+    }
+
+
+class TestStorage:
+    """
+    Class for testing the local SQLite mirror
+    """
+
+    romance = _tag_json("t-romance", "Romance")
+    oneshot = _tag_json("t-oneshot", "Oneshot", group="format")
+
+    def make_store(self):
+        store = md.SQLiteStore()
+        store.save_many([
+            md.Manga.manga_from_dict(_manga_json("m1", "First", [self.romance, self.oneshot])),
+            md.Manga.manga_from_dict(_manga_json("m2", "Second", [self.romance], status="completed")),
+            md.Manga.manga_from_dict(_manga_json("m3", "Third", originalLanguage="ko")),
+        ])
+        return store
+
+    def test_RoundTrip(self):
+        store = self.make_store()
+        manga = store.get_manga_by_id("m1")
+
+        assert manga == md.Manga.manga_from_dict(_manga_json("m1", "First"))
+        assert sorted(tag.tag_id for tag in manga.tags) == ["t-oneshot", "t-romance"]
+        assert store.get_manga_by_id("missing") is None
+
+    def test_Filters(self):
+        store = self.make_store()
+
+        def ids(**kwargs):
+            return [manga.manga_id for manga in store.get_manga_list(**kwargs)]
+
+        assert ids(includedTags=["t-romance", "t-oneshot"]) == ["m1"]
+        assert ids(includedTags=["t-romance", "t-oneshot"], includedTagsMode="OR") == ["m1", "m2"]
+        assert ids(excludedTags=["t-oneshot"]) == ["m2", "m3"]
+        assert ids(status=["completed"]) == ["m2"]
+        assert ids(originalLanguage="ko") == ["m3"]
+        assert store.count_manga(contentRating=["safe"]) == 3
+        with pytest.raises(ValueError):
+            store.get_manga_list(title="First")
+        with pytest.raises(ValueError):
+            store.get_manga_list(order={"latestUploadedChapter": "desc"})
+
+    def test_UpsertKeepsNewest(self):
+        store = self.make_store()
+        newer = _manga_json("m1", "Renamed", updated_at="2023-01-01T00:00:00+00:00")
+        older = _manga_json("m1", "Stale", updated_at="2020-01-01T00:00:00+00:00")
+
+        assert store.save_many([md.Manga.manga_from_dict(newer)]) == 1
+        assert store.save_many([md.Manga.manga_from_dict(older)]) == 0
+        manga = store.get_manga_by_id("m1")
+        assert manga.title == {"en": "Renamed"}
+        assert manga.tags == []
+
+    def test_Groups(self):
+        from benchmarks import Dataset
+
+        store = md.SQLiteStore()
+        group = md.ScanlationGroup.group_from_dict(next(iter(Dataset(mangas=1).groups.values())))
+        store.save_many([group])
+        saved = store.get_group_by_id(group.group_id)
+        assert saved.focused_language == group.focused_language
+        # the old attribute name still reads
+        assert saved.focusedLanguage == group.focused_language
+
+    def test_Feed(self):
+        store = md.SQLiteStore()
+        store.save_many(
+            md.Chapter.chapter_from_dict(_chapter_json(f"c{number}-{lang}", "m1", str(number), language=lang))
+            for number, lang in ((2, "en"), (1, "en"), (1, "es"))
+        )
+        feed = store.manga_feed("m1", translatedLanguage=["en"])
+
+        assert [chapter.chapter_id for chapter in feed] == ["c1-en", "c2-en"]
+        assert feed[0].pages == 20
+
+
+class TestTitleIndex:
+    """
+    Class for testing the offline title search
+    """
+
+    index = md.TitleIndex.from_mangas([
+        md.Manga.manga_from_dict(
+            _manga_json("m1", "Iris Zero", altTitles=[{"ja-ro": "Airisu Zero"}])
+        ),
+        md.Manga.manga_from_dict(_manga_json("m2", "Solo Leveling")),
+        md.Manga.manga_from_dict(_manga_json("m3", "Zero no Tsukaima")),
+    ])
+
+    def test_Prefix(self):
+        assert [m.manga_id for m in self.index.search("zer")] == ["m1", "m3"]
+        assert [m.manga_id for m in self.index.search("iris ze")] == ["m1"]
+
+    def test_Languages(self):
+        assert [m.manga_id for m in self.index.search("airisu", languages=["en"])] == []
+        assert [m.manga_id for m in self.index.search("airisu", languages=["ja-ro"])] == ["m1"]
+
+    def test_Fuzzy(self):
+        assert self.index.search("levling") == []
+        assert [m.manga_id for m in self.index.search("levling", fuzzy=True)] == ["m2"]
+
+    def test_Replace(self):
+        index = md.TitleIndex.from_mangas([md.Manga.manga_from_dict(_manga_json("m1", "Old"))])
+        index.add(md.Manga.manga_from_dict(_manga_json("m1", "New")))
+
+        assert index.search("old") == []
+        assert len(index.search("new")) == 1
+
+    def test_InterleavedAddSearch(self):
+        index = md.TitleIndex.from_mangas(
+            md.Manga.manga_from_dict(_manga_json(f"b{n}", f"Batch Title{n} Word{n}"))
+            for n in range(40)
+        )
+        assert len(index.search("title3", limit=20)) == 11
+        for n in range(5):
+            index.add(md.Manga.manga_from_dict(_manga_json(f"n{n}", f"Zeta{n}")))
+            assert [m.manga_id for m in index.search("zeta")] == [f"n{i}" for i in range(n + 1)]
+        index.remove("n0")
+        index.add(md.Manga.manga_from_dict(_manga_json("n9", "Zetaz")))
+        index.remove("n9")
+        assert [m.manga_id for m in index.search("zeta")] == [f"n{i}" for i in range(1, 5)]
+        assert index._sorted_tokens == sorted(index._postings)
+
+
+class TestFeedWatcher:
+    """
+    Class for testing the followed feed watcher without the network
+    """
+
+    def make_watcher(self, store, feed):
+        watcher = md.FeedWatcher(
+            auth=None,
+            store=store,
+            user_id="u1",
+            since=datetime.datetime(2022, 1, 1, tzinfo=datetime.timezone.utc),
+            page_size=2,
+        )
+        calls = []
+
+        def get_my_manga_feed(**params):
+            calls.append(params)
+            chapters = [md.Chapter.chapter_from_dict(elem) for elem in feed]
+            return chapters[params["offset"]:params["offset"] + params["limit"]]
+
+        watcher.mangalist.get_my_manga_feed = get_my_manga_feed
+        return watcher, calls
+
+    def test_EmitsOnlyNewChapters(self):
+        store = md.SQLiteStore()
+        feed = [
+            _chapter_json(f"c{n}", "m1", str(n), publishAt=f"2022-01-0{n}T00:00:00+00:00")
+            for n in (1, 2, 3)
+        ]
+        watcher, calls = self.make_watcher(store, feed)
+
+        assert [c.chapter_id for c in watcher.poll()] == ["c1", "c2", "c3"]
+        assert len(calls) == 2
+        assert calls[0]["contentRating"] == list(md.query.CONTENT_RATINGS)
+        assert watcher.poll() == []
+
+        # a new process resumes from the persisted cursor
+        feed.append(_chapter_json("c4", "m1", "4", publishAt="2022-01-04T00:00:00+00:00"))
+        resumed, _ = self.make_watcher(store, feed)
+        assert [c.chapter_id for c in resumed.poll()] == ["c4"]
+        assert store.get_chapter_by_id("c4") is not None
+        assert resumed.cursor == datetime.datetime(2022, 1, 4, tzinfo=datetime.timezone.utc)
+
+    def test_AdaptsInterval(self):
+        watcher, _ = self.make_watcher(None, [])
+        watcher.poll()
+
+        assert watcher.interval == watcher.max_interval
+
+
+class TestAggregate:
+    """
+    Class for testing the aggregate model
+    """
+
+    resp = {
+        "result": "ok",
+        "volumes": {
+            "none": {"volume": "none", "count": 1, "chapters": {
+                "11": {"chapter": "11", "id": "c11", "others": [], "count": 1},
+            }},
+            "10": {"volume": "10", "count": 1, "chapters": {
+                "10": {"chapter": "10", "id": "c10", "others": [], "count": 1},
+            }},
+            "2": {"volume": "2", "count": 3, "chapters": {
+                "3": {"chapter": "3", "id": "c3", "others": ["c3-alt"], "count": 2},
+                "2.5": {"chapter": "2.5", "id": "c2.5", "others": [], "count": 1},
+            }},
+        },
+    }
+
+    def test_Ordering(self):
+        aggregate = md.Aggregate.aggregate_from_dict(self.resp, manga_id="m1")
+
+        assert aggregate.volumes == ["2", "10", "none"]
+        assert [ch.chapter_id for ch in aggregate] == ["c2.5", "c3", "c10", "c11"]
+        assert [ch.chapter for ch in aggregate.volume_chapters("2")] == ["2.5", "3"]
+
+    def test_Navigation(self):
+        aggregate = md.Aggregate.aggregate_from_dict(self.resp, manga_id="m1")
+
+        assert aggregate.position("c3-alt") == 1
+        assert aggregate.next_chapter("c3-alt").chapter_id == "c10"
+        assert aggregate.previous_chapter("c2.5") is None
+        assert aggregate.next_chapter("c11") is None
+        assert md.Aggregate.aggregate_from_dict({"result": "ok", "volumes": []}).chapters == []
+
+    def test_CacheRevalidation(self):
+        cache = md.series.AggregateCache(ttl=0)
+        key = cache.key("m1", ["en"], None)
+        calls = []
+
+        def fetch():
+            calls.append(1)
+            return self.resp
+
+        first = cache.get(key, fetch)
+        second = cache.get(key, fetch)
+
+        assert len(calls) == 2
+        assert first is second
+        cache.invalidate("m1")
+        assert len(cache) == 0
+
+
+class TestReleaseSelector:
+    """
+    Class for testing the best release selection
+    """
+
+    feed = [
+        md.Chapter.chapter_from_dict(elem)
+        for elem in (
+            _chapter_json("a2", "m1", "2", volume="1", group_id="ga", pages=10),
+            _chapter_json("b2", "m1", "2", volume="1", group_id="gb", pages=30,
+                          publishAt="2023-01-01T00:00:00+00:00"),
+            _chapter_json("a1", "m1", "1", volume="1", group_id="ga"),
+            _chapter_json("es1", "m1", "1", volume="1", language="es"),
+            _chapter_json("x", "m1", None, title="Extra"),
+        )
+    ]
+
+    def test_Newest(self):
+        assert md.ReleaseSelector().reading_order(self.feed) == ["a1", "es1", "b2", "x"]
+
+    def test_PreferredGroups(self):
+        from mangadex import releases
+
+        scorer = releases.combine(releases.prefer_groups(["ga"]), releases.most_pages)
+        selector = md.ReleaseSelector(scorer=scorer, languages=["en"])
+
+        assert selector.reading_order(self.feed) == ["a1", "a2", "x"]
+
+    def test_UntitledExtras(self):
+        from mangadex import releases
+
+        extras = [md.Chapter.chapter_from_dict(_chapter_json(i, "m1", None)) for i in ("e1", "e2")]
+
+        assert releases.release_key(extras[0]) != releases.release_key(extras[1])
+        assert sorted(md.ReleaseSelector().reading_order(extras)) == ["e1", "e2"]
+        assert releases.newest(md.Chapter()) == releases._EPOCH
+
+
+class TestFakeServer:
+    """
+    Class for testing the public calls against the local stand-in server
+    """
+
+    def test_MangaList(self, fake_mangadex):
+        mangas = md.Manga().get_manga_list(limit=5, status=["completed"])
+
+        assert [m.status for m in mangas] == ["completed", "completed"]
+        assert mangas[0] == md.Manga.manga_from_dict(fake_mangadex.dataset.mangas[mangas[0].manga_id])
+
+    def test_FeedAndImages(self, fake_mangadex):
+        manga_id = next(iter(fake_mangadex.dataset.mangas))
+        feed = md.Manga().manga_feed(manga_id, limit=100)
+        images = feed[0].fetch_chapter_images()
+
+        assert len(md.select_releases(feed)) == 6
+        assert len(images) == fake_mangadex.dataset.pages
+        assert images[0].startswith(f"{fake_mangadex.url}/data/")
+
+    def test_RateLimited(self, fake_mangadex):
+        fake_mangadex.rate_limit = 1
+        with pytest.raises(ApiError) as error:
+            for _ in range(3):
+                md.Api().ping()
+
+        assert error.value.code == 429
+
+
+class TestCassette:
+    """
+    Class for testing the record and replay transport
+    """
+
+    def test_RecordReplay(self, fake_mangadex, tmp_path):
+        path = str(tmp_path / "cassette.json.gz")
+        manga_id = next(iter(fake_mangadex.dataset.mangas))
+        with md.Cassette(path, mode="record"):
+            recorded = md.Manga().manga_feed(manga_id, limit=10)
+            md.Api().ping()
+        requests_sent = fake_mangadex.requests
+
+        with md.Cassette(path, mode="replay") as cassette:
+            replayed = md.Manga().manga_feed(manga_id, limit=10)
+            assert md.Api().ping() == "pong"
+            with pytest.raises(md.CassetteError):
+                md.Manga().manga_feed(manga_id, limit=11)
+
+        assert replayed == recorded
+        assert len(cassette) == 2
+        assert fake_mangadex.requests == requests_sent
+        assert URLRequest.cassette is None
+
+    def test_ReplaysErrors(self, fake_mangadex):
+        with md.Cassette(mode="auto"):
+            for _ in range(2):
+                with pytest.raises(ApiError) as error:
+                    md.Manga().get_manga_by_id("missing")
+                assert error.value.code == 404
+
+        assert fake_mangadex.requests == 1
+
+
+class TestMetrics:
+    """
+    Class for testing request events and metrics
+    """
+
+    def test_RouteTemplate(self):
+        from mangadex.metrics import route_template
+
+        assert (
+            route_template("https://api.mangadex.org/manga/3e1a7b5c-1f2d-4c3b-9a8e-0f1e2d3c4b5a/feed?limit=10")
+            == "/manga/{id}/feed"
+        )
+        assert route_template("https://uploads.example/data/abc123/1-x.png") == "/data/{hash}/{file}"
+
+    def test_Metrics(self, fake_mangadex):
+        events = []
+        metrics = md.Metrics().install()
+        URLRequest.add_hook(events.append)
+        try:
+            manga_id = next(iter(fake_mangadex.dataset.mangas))
+            md.Manga().get_manga_by_id(manga_id)
+            with pytest.raises(ApiError):
+                md.Manga().get_manga_by_id("missing")
+            md.Manga.aggregate_cache.invalidate()
+            md.Manga().get_aggregate(manga_id)
+            md.Manga().get_aggregate(manga_id)
+        finally:
+            metrics.uninstall()
+            URLRequest.remove_hook(events.append)
+
+        assert [(e.route, e.status, e.cache) for e in events] == [
+            ("/manga/{id}", 200, None),
+            ("/manga/missing", 404, None),
+            ("/manga/{id}/aggregate", None, "miss"),
+            ("/manga/{id}/aggregate", 200, None),
+            ("/manga/{id}/aggregate", None, "hit"),
+        ]
+        assert events[0].response_bytes > 0 and events[0].total > 0
+        assert metrics.requests.get(("GET", "/manga/{id}", "200")) == 1
+        assert metrics.cache.get(("/manga/{id}/aggregate", "hit")) == 1
+        text = metrics.render()
+        assert 'mangadex_requests_total{method="GET",route="/manga/{id}",status="200"} 1' in text
+        assert 'mangadex_request_duration_seconds_count{method="GET",route="/manga/{id}"} 1' in text
+        assert metrics.snapshot()["GET /manga/{id}"]["requests"] == 1
+
+    def test_DecodeProfiler(self, fake_mangadex):
+        metrics = md.Metrics()
+        profiler = metrics.profile_decoding(sample_rate=0.5, allocations=True)
+        try:
+            md.Manga().get_manga_list(limit=8)
+        finally:
+            profiler.disable()
+        md.Manga().get_manga_list(limit=8)
+
+        stats = metrics.snapshot()
+        assert stats["decode Manga.create_manga_list"]["calls"] == 1
+        assert stats["decode Manga.manga_from_dict"]["calls"] == 8
+        assert stats["decode Manga.manga_from_dict"]["sampled"] == 4
+        assert stats["decode Manga.manga_from_dict"]["estimated_seconds"] > 0
+        assert stats["decode dateutil.parse"]["calls"] == 16
+        assert stats["decode json GET /manga"]["calls"] == 1
+        assert 'mangadex_decode_calls_total{decoder="Tag.tag_from_dict"}' in metrics.render()
+
+
+class TestLazyImport:
+    """
+    Class for testing the lazy package attributes
+    """
+
+    def test_ImportIsLazy(self):
+        code = "import sys, mangadex; print('requests' in sys.modules, 'dateutil' in sys.modules)"
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        out = subprocess.run(
+            [sys.executable, "-c", code], cwd=root, capture_output=True, text=True, check=True
+        )
+        assert out.stdout.split() == ["False", "False"]
+
+    def test_Attributes(self):
+        from mangadex.series import Manga
+
+        assert md.Manga is Manga
+        assert "Manga" in dir(md) and "Manga" in md.__all__
+        with pytest.raises(AttributeError):
+            md.NotAClass
+
+
+class TestClient:
+    """
+    Class for testing the shared client
+    """
+
+    def test_SharedServices(self, fake_mangadex):
+        with md.MangaDexClient(rate_limit=None) as client:
+            assert client.manga is client.manga
+            assert client.api_client is client.api_client
+            assert client.manga.api is client.chapter.api is client.api
+            assert client.author.auth is client.auth
+            assert client.manga.aggregate_cache is client.aggregate_cache
+
+            manga_id = next(iter(fake_mangadex.dataset.mangas))
+            assert client.manga.get_manga_by_id(manga_id).manga_id == manga_id
+            assert len(client.chapter.get_chapter_list(manga=manga_id, limit=3)) == 3
+            assert client.ping() == "pong"
+
+    def test_DecodedEntitiesUseClient(self, fake_mangadex):
+        manga_id = next(iter(fake_mangadex.dataset.mangas))
+        author_id = next(iter(fake_mangadex.dataset.authors))
+        with md.MangaDexClient(fake_mangadex.url, rate_limit=None) as client:
+            # only the client knows the way to the server now
+            md.Api.default_url = "http://127.0.0.1:9"
+            chapter = client.manga.manga_feed(manga_id, limit=1)[0]
+            assert chapter.api is client.api
+            assert len(chapter.fetch_chapter_images()) == fake_mangadex.dataset.pages
+
+            manga = client.manga.get_manga_by_id(manga_id)
+            assert manga.api is client.api and manga.tags[0].api is client.api
+            assert manga.get_manga_by_id(manga_id).manga_id == manga_id
+            with client.manga.stream_manga_list(limit=2) as page:
+                assert all(manga.api is client.api for manga in page)
+            assert client.author.get_author_by_id(author_id).api is client.api
+
+    def test_RetriesRateLimited(self, fake_mangadex):
+        events = []
+        fake_mangadex.rate_limit = 1
+        URLRequest.add_hook(events.append)
+        try:
+            with md.MangaDexClient(rate_limit=None) as client:
+                for _ in range(3):
+                    client.ping()
+        finally:
+            URLRequest.remove_hook(events.append)
+
+        assert sum(event.retries for event in events) >= 1
+        assert all(event.status == 200 for event in events)
+
+    def test_CoalescesGets(self, fake_mangadex):
+        manga_id = next(iter(fake_mangadex.dataset.mangas))
+        fake_mangadex.latency = 0.3
+        barrier = threading.Barrier(6)
+        results = []
+
+        def fetch(client):
+            barrier.wait()
+            results.append(client.manga.get_manga_by_id(manga_id))
+
+        with md.MangaDexClient(rate_limit=None) as client:
+            threads = [threading.Thread(target=fetch, args=(client,)) for _ in range(6)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            assert fake_mangadex.requests == 1
+
+            async def gather():
+                return await asyncio.gather(
+                    *(client.call_async(client.manga.get_manga_by_id, manga_id) for _ in range(4)),
+                    client.transport.send_async(
+                        "GET", f"{client.api.url}/manga/{manga_id}", {}, None, 5
+                    ),
+                )
+
+            *mangas, resp = asyncio.run(gather())
+            assert fake_mangadex.requests == 2
+            assert resp.status_code == 200
+
+        assert len(results) == 6 and all(manga.manga_id == manga_id for manga in results + mangas)
+
+    def test_HTTP2Transport(self, fake_mangadex):
+        pytest.importorskip("httpx")
+        manga_id = next(iter(fake_mangadex.dataset.mangas))
+        with md.MangaDexClient(rate_limit=None, http2=True) as client:
+            assert isinstance(client.transport, md.HTTP2Transport)
+            assert client.manga.get_manga_by_id(manga_id).manga_id == manga_id
+            with pytest.raises(ApiError) as error:
+                client.manga.get_manga_by_id("missing")
+            assert error.value.code == 404
+
+        pytest.importorskip("h2")
+        transport = md.HTTP2Transport(prior_knowledge=True)
+        with md.MangaDexClient(rate_limit=None, transport=transport) as client:
+            response = transport.session.get(f"{fake_mangadex.url}/ping")
+            assert response.http_version == "HTTP/2"
+            mangas = client.map_concurrent(
+                client.manga.get_manga_by_id, list(fake_mangadex.dataset.mangas)
+            )
+            assert [r.value.manga_id for r in mangas] == list(fake_mangadex.dataset.mangas)
+            chapter = client.manga.manga_feed(manga_id, limit=1)[0]
+            assert len(chapter.fetch_chapter_images()) == fake_mangadex.dataset.pages
+            image = transport.session.get(chapter.fetch_chapter_images()[0])
+            assert image.http_version == "HTTP/2"
+            assert len(image.content) == len(fake_mangadex.image)
+
+        with md.MangaDexClient(url="http://127.0.0.1:9", http2=True) as client:
+            with pytest.raises(requests.ConnectionError):
+                client.ping()
+
+    def test_MapConcurrent(self, fake_mangadex):
+        manga_ids = list(fake_mangadex.dataset.mangas)[:4]
+        missing = "00000000-0000-0000-0000-000000000000"
+        with md.MangaDexClient(rate_limit=None) as client:
+            results = client.map_concurrent(
+                client.manga.get_manga_by_id, manga_ids[:2] + [missing] + manga_ids[2:]
+            )
+
+        assert [r.item for r in results] == manga_ids[:2] + [missing] + manga_ids[2:]
+        assert [r.value.manga_id for r in results if r.ok] == manga_ids
+        assert isinstance(results[2].error, md.ApiError)
+        with pytest.raises(md.ApiError):
+            results[2].get()
+
+    def test_BatchDeadlineAndCancel(self):
+        import concurrent.futures
+        import time
+
+        with md.MangaDexClient(rate_limit=None, workers=1) as client:
+            with client.batch(timeout=0.2) as batch:
+                batch.submit(time.sleep, 0.5, item="slow")
+                batch.submit(str, 1)
+            results = batch.results()
+            assert isinstance(results[0].error, concurrent.futures.TimeoutError)
+            assert results[1].item == 1
+            assert isinstance(results[1].error, concurrent.futures.TimeoutError)
+
+        with md.MangaDexClient(rate_limit=None, workers=1) as client:
+            with pytest.raises(KeyError):
+                with client.batch() as batch:
+                    batch.submit(time.sleep, 0.2)
+                    batch.submit(str, 2)
+                    raise KeyError()
+            results = batch.results()
+            assert results[0].ok
+            assert isinstance(results[1].error, concurrent.futures.CancelledError)
+
+    def test_Broker(self, fake_mangadex, tmp_path):
+        from mangadex.broker import Broker
+
+        logins = []
+
+        def token(query, body):
+            logins.append(body)
+            return 200, {
+                "access_token": f"token{len(logins)}",
+                "refresh_token": "refresh",
+                "expires_in": 900,
+            }
+
+        fake_mangadex.route("POST", r"/realms/mangadex/protocol/openid-connect/token", token)
+        path = str(tmp_path / "md.sock")
+        auth = md.Auth()
+        auth.auth_url = fake_mangadex.url
+        with Broker(path, rate=1000, burst=2, auth=auth):
+            clients = [md.MangaDexClient(broker=path) for _ in range(2)]
+            for client in clients:
+                client.login("user", "password", "id", "secret")
+            assert len(logins) == 1
+            assert clients[1].auth.get_bearer_token() == {"Authorization": "Bearer token1"}
+
+            clients[0].auth.refresh_login()
+            clients[1].auth.refresh_login()  # token1 is stale, token2 is kept
+            assert len(logins) == 2 and b"refresh_token" in logins[1]
+            assert clients[1].auth.get_bearer_token() == {"Authorization": "Bearer token2"}
+
+            limiter = clients[0].transport.rate_limiter
+            assert limiter.reserve() == 0 and clients[1].transport.rate_limiter.reserve() == 0
+            assert limiter.reserve() > 0
+            assert clients[1].ping() == "pong"
+            with pytest.raises(md.BrokerError):
+                clients[0].broker.call("nope")
+            for client in clients:
+                client.close()
+
+        with pytest.raises(md.BrokerError):
+            md.BrokerRateLimiter(path).reserve()
+
+    def test_RateLimiter(self):
+        limiter = md.RateLimiter(rate=10, burst=2)
+        assert limiter.reserve() == 0 and limiter.reserve() == 0
+        assert 0.05 < limiter.reserve() <= 0.1
+
+
+class TestStreaming:
+    """
+    Class for testing the incremental decoding of collections
+    """
+
+    @staticmethod
+    def _response(body: dict) -> requests.Response:
+        resp = requests.Response()
+        resp.status_code = 200
+        resp._content = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        resp._content_consumed = True
+        return resp
+
+    def test_StreamedPage(self):
+        from mangadex.streaming import StreamedPage
+
+        body = {
+            "result": "ok",
+            "extra": {"data": [1]},
+            "data": [{"id": i, "title": "ようこそ, [ok]"} for i in range(20)] + [7, "x"],
+            "total": 22,
+        }
+        page = StreamedPage(self._response(body), chunk_size=7)
+        assert list(page) == body["data"]
+        assert page.meta == {"result": "ok", "extra": {"data": [1]}, "total": 22}
+        with pytest.raises(RuntimeError):
+            list(page)
+
+        entity = StreamedPage(self._response({"result": "ok", "data": {"id": 1}}))
+        assert list(entity) == [] and entity.meta["data"] == {"id": 1}
+
+    def test_StreamMangaFeed(self, fake_mangadex):
+        fake_mangadex.compress = True
+        manga_id = next(iter(fake_mangadex.dataset.mangas))
+        events = []
+        URLRequest.add_hook(events.append)
+        try:
+            with md.MangaDexClient(rate_limit=None) as client:
+                page = client.manga.stream_manga_feed(manga_id, limit=4)
+                chapters = list(page)
+                expected = client.manga.manga_feed(manga_id, limit=4)
+        finally:
+            URLRequest.remove_hook(events.append)
+
+        assert [c.chapter_id for c in chapters] == [c.chapter_id for c in expected]
+        assert page.meta["limit"] == 4 and page.meta["total"] >= 4
+        assert events[0].content_encoding == "gzip"
+
+    def test_StreamErrors(self, fake_mangadex):
+        transport = md.Transport(max_retry_wait=0)
+        with md.MangaDexClient(transport=transport) as client:
+            with pytest.raises(ApiError) as error:
+                client.manga.stream_manga_feed("missing")
+            assert error.value.code == 404
+            assert error.value.resp.json()["errors"][0]["status"] == 404
+
+            # a 429 not worth waiting for is returned with its body
+            fake_mangadex.rate_limit = 1
+            with pytest.raises(ApiError) as error:
+                client.manga.stream_manga_list(limit=1)
+            assert error.value.code == 429
+            assert error.value.resp.json()["errors"][0]["status"] == 429
+
+
+class TestQuery:
+    """
+    Class for testing the query parameter schemas
+    """
+
+    def test_EncodeQuery(self):
+        from mangadex.query import encode_query
+
+        first = encode_query(
+            {"limit": 10, "ids[]": ["b", "a", "b"], "order": {"title": "asc", "year": "desc"}}
+        )
+        second = encode_query(
+            {"order": {"title": "asc", "year": "desc"}, "ids[]": ("a", "b"), "limit": 10}
+        )
+        assert first == second
+        assert first == "ids%5B%5D=a&ids%5B%5D=b&limit=10&order%5Btitle%5D=asc&order%5Byear%5D=desc"
+        # the first order key is the main sort, it is not moved
+        assert encode_query({"order": {"year": "desc", "title": "asc"}}).startswith("order%5Byear")
+        assert encode_query({"flag": True}) == "flag=True" and encode_query({"flag": 1}) == "flag=1"
+        assert encode_query({"title": None}) == ""
+
+    def test_QuerySchema(self):
+        from mangadex.query import FEED, MANGA
+
+        kwargs = {"ids": ["a"], "translatedLanguage": ["en"], "limit": 5}
+        params = MANGA.normalize(kwargs)
+        assert params == {"ids[]": ["a"], "availableTranslatedLanguage[]": ["en"], "limit": 5}
+        assert "ids" in kwargs
+        params["title"] = "changed"
+        assert "title" not in MANGA.normalize(kwargs)
+        params["ids[]"].append("b")
+        MANGA.normalize({"order": {"title": "asc"}})["order"]["year"] = "desc"
+        assert MANGA.normalize(kwargs)["ids[]"] == ["a"]
+        assert MANGA.normalize({"order": {"title": "asc"}})["order"] == {"title": "asc"}
+        assert FEED.normalize({"translatedLanguage": ["en"]}) == {"translatedLanguage[]": ["en"]}
+
+        for bad in ({"limit": 101}, {"offset": -1}, {"offset": 9950, "limit": 100},
+                    {"order": {"title": "up"}}):
+            with pytest.raises(ValueError):
+                MANGA.normalize(bad)
+        assert FEED.normalize({"limit": 500})["limit"] == 500
+
+
+class TestCrawler:
+    """
+    Class for testing the partitioned catalog crawler
+    """
+
+    def test_Partitions(self):
+        end = datetime.datetime(2018, 1, 3, tzinfo=datetime.timezone.utc)
+        partitions = md.partition_catalog(end=end, step=datetime.timedelta(days=1))
+        assert len(partitions) == 4 * 2
+        assert len({p.key for p in partitions}) == len(partitions)
+        assert partitions[0].until == partitions[1].since and partitions[1].until is None
+        restored = md.Partition.from_dict(partitions[0].to_dict())
+        assert (restored.key, restored.filters, restored.until) == (
+            partitions[0].key, partitions[0].filters, partitions[0].until
+        )
+
+    def test_Crawl(self, fake_mangadex, tmp_path):
+        dataset = fake_mangadex.dataset
+        end = datetime.datetime(2018, 1, 2, 6, tzinfo=datetime.timezone.utc)
+        seen = []
+        lock = threading.Lock()
+
+        def sink(objs):
+            with lock:
+                seen.extend(objs)
+
+        with md.SQLiteWorkQueue(str(tmp_path / "queue.db")) as queue:
+            assert queue.put(md.partition_catalog(end=end, step=datetime.timedelta(hours=8))) == 16
+            assert queue.put(md.partition_catalog(end=end, step=datetime.timedelta(hours=8))) == 0
+            with md.MangaDexClient(rate_limit=None) as client:
+                crawlers = [
+                    md.Crawler(
+                        client,
+                        queue,
+                        sink,
+                        page_size=1,
+                        feed_page_size=2,
+                        window=3,
+                        worker=f"worker{index}",
+                    )
+                    for index in range(2)
+                ]
+                threads = [threading.Thread(target=crawler.run) for crawler in crawlers]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+            assert queue.stats() == {"done": 16}
+
+        manga_ids = [obj.manga_id for obj in seen if isinstance(obj, md.Manga)]
+        chapter_ids = [obj.chapter_id for obj in seen if isinstance(obj, md.Chapter)]
+        assert sorted(manga_ids) == sorted(dataset.mangas)
+        assert sorted(chapter_ids) == sorted(dataset.chapters)
+
+    def test_ResumesFromCheckpoint(self, fake_mangadex):
+        queue = md.SQLiteWorkQueue(":memory:")
+        partition = md.Partition({}, datetime.datetime(2018, 1, 1))
+        queue.put([partition])
+        claimed, cursor = queue.claim("crashed", lease=60)
+        assert cursor == {} and queue.claim("other", lease=60) is None
+        queue.checkpoint(claimed.key, "crashed", {"since": "2018-01-01T00:00:00", "offset": 4}, 0)
+
+        seen = []
+        with md.MangaDexClient(rate_limit=None) as client:
+            crawler = md.Crawler(
+                client, queue, seen.extend, feeds=False, page_size=2, worker="resumed"
+            )
+            assert crawler.run() == 1
+        assert not queue.checkpoint(claimed.key, "crashed", {}, 60)
+        assert [manga.manga_id for manga in seen] == list(fake_mangadex.dataset.mangas)[4:]
+
+    def test_FeedRestartsInOneSecond(self, fake_mangadex):
+        dataset = fake_mangadex.dataset
+        manga_id = next(iter(dataset.mangas))
+        chapters = sorted(
+            (dataset.chapters[chapter_id] for chapter_id in dataset.feeds[manga_id]),
+            key=lambda chapter: chapter["attributes"]["createdAt"],
+        )
+        # the restart happens on the third page, the second started at that second
+        for chapter in chapters[4:]:
+            chapter["attributes"]["createdAt"] = chapters[3]["attributes"]["createdAt"]
+        seen = []
+        with md.MangaDexClient(rate_limit=None) as client:
+            crawler = md.Crawler(
+                client, md.SQLiteWorkQueue(":memory:"), seen.extend, feed_page_size=2, window=7
+            )
+            assert crawler.crawl_feed(manga_id) == len(chapters)
+        assert sorted(chapter.chapter_id for chapter in seen) == sorted(c["id"] for c in chapters)
+
+        # chapters without createdAt don't move the cursor
+        page = [json.loads(json.dumps(chapter)) for chapter in chapters[:2]]
+        page[1]["attributes"]["createdAt"] = None
+        page[1]["attributes"]["publishAt"] = None
+
+        def feed(query, body, manga_id):
+            data = page if query["createdAtSince"] == ["2018-01-01T00:00:00"] else []
+            return 200, {"result": "ok", "response": "collection", "data": data,
+                         "limit": 2, "offset": 0, "total": len(data)}
+
+        fake_mangadex.route("GET", r"/manga/(?P<manga_id>[\w-]+)/feed", feed)
+        seen.clear()
+        with md.MangaDexClient(rate_limit=None) as client:
+            crawler = md.Crawler(
+                client, md.SQLiteWorkQueue(":memory:"), seen.extend, feed_page_size=2, window=3
+            )
+            assert crawler.crawl_feed(manga_id) == 2
+
+    def test_IncompleteQueue(self):
+        class PutOnly(md.WorkQueue):
+            def put(self, partitions):
+                return 0
+
+        with pytest.raises(TypeError):
+            PutOnly()
+
+
+class TestQueryPlanner:
+    """
+    Class for testing searches past the results window
+    """
+
+    def test_Manga(self, fake_mangadex):
+        dataset = fake_mangadex.dataset
+        with md.MangaDexClient(rate_limit=None) as client:
+            planner = md.QueryPlanner(client, window=3, page_size=2)
+            slices = planner.plan_manga()
+            assert len(slices) > 1 and all(0 < piece.count <= 3 for piece in slices)
+            assert sum(piece.count for piece in slices) == len(dataset.mangas)
+
+            mangas = planner.manga()
+            assert [manga.manga_id for manga in mangas] == list(dataset.mangas)
+            safe = planner.manga(contentRating=["safe"])
+            assert {manga.content_rating for manga in safe} == {"safe"}
+            with pytest.raises(ValueError):
+                planner.manga(limit=10)
+
+    def test_Chapters(self, fake_mangadex):
+        manga_id = next(iter(fake_mangadex.dataset.mangas))
+        with md.MangaDexClient(rate_limit=None) as client:
+            chapters = md.QueryPlanner(client, window=4, page_size=3).chapters(manga=manga_id)
+            expected = client.manga.manga_feed(manga_id, limit=100)
+        assert sorted(c.chapter_id for c in chapters) == sorted(c.chapter_id for c in expected)
+
+
+class TestSync:
+    """
+    Class for testing the account synchronization helpers
+    """
+
+    def test_ReadMarkers(self, fake_mangadex):
+        dataset = fake_mangadex.dataset
+        first, second, third = list(dataset.mangas)[:3]
+        feeds = {manga_id: dataset.feeds[manga_id] for manga_id in (first, second, third)}
+        fake_mangadex.read_markers = {first: set(feeds[first][:3]), second: set(feeds[second][:2])}
+        desired = {first: feeds[first][1:4], second: feeds[second][:2], third: feeds[third][:1]}
+
+        with md.MangaDexClient(rate_limit=None) as client:
+            fake_mangadex.log.clear()
+            report = md.sync_read_markers(client, desired)
+            assert report.ok and report.requests == 3
+            assert report.added == {first: [feeds[first][3]], third: [feeds[third][0]]}
+            assert report.removed == {first: [feeds[first][0]]}
+            assert [entry[0] for entry in fake_mangadex.log].count("POST") == 2
+            assert {k: set(v) for k, v in fake_mangadex.read_markers.items()} == {
+                k: set(v) for k, v in desired.items()
+            }
+            assert md.sync_read_markers(client, desired).requests == 1
+
+            queries = []
+
+            def chapter_list(query, body):
+                queries.append(query)
+                return fake_mangadex._chapter_list(query, body)
+
+            fake_mangadex.route("GET", r"/chapter", chapter_list)
+            read = client.manga.get_manga_read_markers(first)
+            assert [chapter.chapter_id for chapter in read] == sorted(feeds[first][1:4])
+            assert set(queries[0]["contentRating[]"]) == set(md.query.CONTENT_RATINGS)
+            assert all(chapter.client is client for chapter in read)
+
+    def test_ReadingStatuses(self, fake_mangadex):
+        first, second, third, fourth = list(fake_mangadex.dataset.mangas)[:4]
+        fake_mangadex.statuses = {first: "reading", second: "completed", fourth: "dropped"}
+        desired = {first: "reading", second: "on_hold", third: "plan_to_read"}
+        progress = []
+
+        with md.MangaDexClient(rate_limit=None) as client:
+            fake_mangadex.log.clear()
+            report = md.sync_reading_statuses(
+                client, desired, progress=lambda *args: progress.append(args)
+            )
+            assert report.ok and report.requests == 3
+            assert report.added == {second: "on_hold", third: "plan_to_read"}
+            assert sorted(done for done, *_ in progress) == [1, 2]
+            assert all(total == 2 and error is None for _, total, _, error in progress)
+            assert fake_mangadex.statuses == dict(desired, **{fourth: "dropped"})
+
+            report = md.sync_reading_statuses(client, desired, exact=True)
+            assert report.removed == {fourth: "dropped"} and report.requests == 2
+            assert fake_mangadex.statuses == desired
+            assert client.manga.get_manga_reading_status(third) == "plan_to_read"
+            with pytest.raises(ValueError):
+                md.sync_reading_statuses(client, {first: "finished"})
+
+            def failing(done, total, manga_id, error):
+                raise RuntimeError("progress bar closed")
+
+            # the callback's error neither fails a sent update nor hides a failure
+            report = md.sync_reading_statuses(client, {first: "dropped"}, progress=failing)
+            assert report.ok and fake_mangadex.statuses[first] == "dropped"
+            def broken(query, body, manga_id):
+                return 500, {"result": "error", "errors": [], "status": 500, "reason": "boom"}
+
+            fake_mangadex.route("POST", r"/manga/(?P<manga_id>[\w-]+)/status", broken)
+            report = md.sync_reading_statuses(client, {first: "reading"}, progress=failing)
+            assert isinstance(report.errors[first], ApiError)
+
+    def test_Follows(self, fake_mangadex):
+        dataset = fake_mangadex.dataset
+        mangas = list(dataset.mangas)
+        groups = list(dataset.groups)
+        fake_mangadex.followed_groups = groups[:2]
+        # the dataset follows the even manga
+        manga = [mangas[0], mangas[1]]
+
+        with md.MangaDexClient(rate_limit=None) as client:
+            fake_mangadex.log.clear()
+            report = md.sync_follows(
+                client, manga=manga, groups=groups[1:3], users=[dataset.user["id"]]
+            )
+            assert report.ok and report.requests == 7
+            assert report.added == {
+                "manga": [mangas[1]],
+                "group": [groups[2]],
+                "user": [dataset.user["id"]],
+            }
+            assert report.removed == {"manga": sorted(mangas[2::2]), "group": [groups[0]]}
+            assert [entry[0] for entry in fake_mangadex.log].count("GET") == 3
+            assert set(dataset.follows) == set(manga)
+            assert fake_mangadex.followed_groups == groups[1:3]
+
+            # the cache followed the writes, nothing is fetched or sent again
+            fake_mangadex.log.clear()
+            assert md.sync_follows(client, manga=manga, groups=groups[1:3]).requests == 0
+            assert fake_mangadex.log == []
+
+            client.follows.unfollow_group(groups[1])
+            assert client.follows.followed_ids("group") == {groups[2]}
+            assert md.sync_follows(client, manga=[mangas[3]], exact=False).added == {
+                "manga": [mangas[3]]
+            }
+            assert client.follows.followed_ids("manga", refresh=True) == set(manga + [mangas[3]])
+            with pytest.raises(ValueError):
+                client.follows.followed_ids("author")
+
+    def test_FollowsPastWindow(self, fake_mangadex):
+        fake_mangadex.route(
+            "GET",
+            r"/user/follows/group",
+            lambda query, body: (200, {"result": "ok", "data": [], "total": 10001}),
+        )
+        with md.MangaDexClient(rate_limit=None) as client:
+            fake_mangadex.log.clear()
+            with pytest.raises(ValueError):
+                md.sync_follows(client, groups=[])
+            assert [method for method, _ in fake_mangadex.log] == ["GET"]
+
+    def test_CustomList(self, fake_mangadex):
+        dataset = fake_mangadex.dataset
+        mangas = list(dataset.mangas)
+        list_id = next(iter(dataset.custom_lists))
+        # the dataset's list holds the odd manga
+        desired = [mangas[5], mangas[1], mangas[0], mangas[2]]
+
+        with md.MangaDexClient(rate_limit=None) as client:
+            fake_mangadex.log.clear()
+            report = md.sync_customlist(client, list_id, desired)
+            assert report.ok and report.requests == 5
+            assert report.added == {mangas[0]: list_id, mangas[2]: list_id}
+            assert report.removed == {mangas[3]: list_id, mangas[7]: list_id}
+            assert set(client.custom_list.get_customlist(list_id).mangas) == set(desired)
+            assert md.sync_customlist(client, list_id, desired).requests == 1
+
+            order = client.custom_list.get_customlist(list_id).mangas
+            fake_mangadex.log.clear()
+            hydrated = list(client.custom_list.stream_customlist_manga(list_id, chunk_size=3))
+            assert [manga.manga_id for manga in hydrated] == order
+            assert [path for _, path in fake_mangadex.log] == [f"/list/{list_id}"] + ["/manga"] * 2
+
+
+class TestUserState:
+    """
+    Class for testing the cache of the logged in user's state
+    """
+
+    def test_WriteThrough(self, fake_mangadex):
+        dataset = fake_mangadex.dataset
+        mangas = list(dataset.mangas)
+        list_id = next(iter(dataset.custom_lists))
+
+        with md.MangaDexClient(rate_limit=None) as client:
+            fake_mangadex.log.clear()
+            assert client.user.me().username == client.user.me().username == "benchmark"
+            followed = client.manga_list.get_my_mangalist(limit=100)
+            assert client.manga_list.get_my_mangalist(limit=100) == followed
+            assert client.manga.get_manga_reading_status(mangas[0]) is None
+            assert client.custom_list.get_my_customlists()[0].list_id == list_id
+            assert len(fake_mangadex.log) == 4
+
+            # reads after our own writes are answered locally
+            client.follows.unfollow_manga(mangas[0])
+            client.manga.update_manga_reading_status(mangas[0], "reading")
+            client.custom_list.add_manga_to_customlist(mangas[0], list_id)
+            fake_mangadex.log.clear()
+            assert [manga.manga_id for manga in client.manga_list.get_my_mangalist(limit=100)] == [
+                manga.manga_id for manga in followed[1:]
+            ]
+            assert client.manga.get_manga_reading_status(mangas[0]) == "reading"
+            assert mangas[0] in client.custom_list.get_my_customlists()[0].mangas
+            # an unfollow shifts the pages of the list, it is fetched again
+            assert fake_mangadex.log == [("GET", "/user/follows/manga")]
+
+            pages = [client.manga_list.get_my_mangalist(limit=2, offset=o) for o in (0, 2)]
+            client.follows.unfollow_manga(pages[0][0].manga_id)
+            second = client.manga_list.get_my_mangalist(limit=2, offset=2)
+            assert second != pages[1]
+            assert second == client.manga_list.get_my_mangalist(limit=2, offset=2, cache=False)
+
+            client.follows.follow_manga(mangas[1])
+            fake_mangadex.log.clear()
+            assert mangas[1] in {
+                manga.manga_id for manga in client.manga_list.get_my_mangalist(limit=100)
+            }
+            assert fake_mangadex.log == [("GET", "/user/follows/manga")]
+
+            # another user of the client has its own entries
+            assert md.User(auth=md.Auth(), client=client).me().username == "benchmark"
+            assert len(fake_mangadex.log) == 2
+
+    def test_WriteDuringFetch(self):
+        cache = md.UserStateCache()
+        auth = md.Auth()
+        started, release = threading.Event(), threading.Event()
+
+        def slow_fetch():
+            started.set()
+            release.wait(5)
+            return ["m1", "m2"]
+
+        for write in (
+            lambda: cache.update(auth, "mangalist", lambda key, mangas: mangas[1:]),
+            lambda: cache.set(auth, ("mangalist", "other"), ["m2"]),
+            lambda: cache.invalidate(auth, "mangalist"),
+            lambda: cache.invalidate(),
+        ):
+            started.clear()
+            release.clear()
+            reader = threading.Thread(target=cache.get, args=(auth, ("mangalist",), slow_fetch, ""))
+            reader.start()
+            assert started.wait(5)
+            write()
+            release.set()
+            reader.join()
+            # the value fetched before the write is not kept
+            assert cache.get(auth, ("mangalist",), lambda: ["m2"], "") == ["m2"]
+            cache.invalidate(auth)
+
+    def test_Revalidation(self, fake_mangadex):
+        with md.MangaDexClient(rate_limit=None, user_state_ttl=0) as client:
+            assert client.user.me().username == "benchmark"
+            fake_mangadex.dataset.user["attributes"]["username"] = "renamed"
+            # the stale value is answered while it is fetched again
+            assert client.user.me().username == "benchmark"
+            deadline = time.monotonic() + 5
+            while client.user.me().username != "renamed":
+                assert time.monotonic() < deadline
+                time.sleep(0.01)
+            assert client.user.me(cache=False).username == "renamed"
+
+        with md.MangaDexClient(rate_limit=None, user_state_ttl=None) as client:
+            fake_mangadex.log.clear()
+            client.user.me()
+            client.user.me()
+            assert len(fake_mangadex.log) == 2
+
+
+class TestMultiTenant:
+    """
+    Class for testing the multi tenant client
+    """
+
+    def test_FairRateLimiter(self):
+        limiter = md.FairRateLimiter(rate=50, burst=1)
+        granted = []
+        lock = threading.Lock()
+
+        def request(tenant):
+            limiter.tenant(tenant).acquire()
+            with lock:
+                granted.append(tenant)
+
+        threads = [threading.Thread(target=request, args=("busy",)) for _ in range(20)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.05)
+        joined = len(granted)
+        quiet = [threading.Thread(target=request, args=("quiet",)) for _ in range(2)]
+        for thread in quiet:
+            thread.start()
+        for thread in threads + quiet:
+            thread.join()
+        # served in turn with the busy tenant instead of after its backlog
+        positions = [index for index, tenant in enumerate(granted) if tenant == "quiet"]
+        assert len(granted) == 22 and positions[-1] <= joined + 5
+
+    def test_Tenants(self, fake_mangadex):
+        manga_id = next(iter(fake_mangadex.dataset.mangas))
+        with md.MultiTenantClient(rate_limit=1000, burst=100) as tenants:
+            alice, bob = tenants.tenant("alice"), tenants.tenant("bob")
+            alice.auth.set_bearer_token({"Authorization": "Bearer alice"})
+            bob.auth.set_bearer_token({"Authorization": "Bearer bob"})
+            assert tenants.tenant("alice") is alice and len(tenants) == 2
+            assert alice.transport.session is bob.transport.session is tenants.public.transport.session
+            assert alice.transport.rate_limiter.tenant == "alice"
+
+            fake_mangadex.log.clear()
+            # the user state stays with each tenant, public responses are shared
+            alice.user.me()
+            alice.user.me()
+            bob.user.me()
+            alice.manga.get_aggregate(manga_id)
+            bob.manga.get_aggregate(manga_id)
+            tenants.public.manga.get_aggregate(manga_id)
+            assert [path for _, path in fake_mangadex.log] == [
+                "/user/me",
+                "/user/me",
+                f"/manga/{manga_id}/aggregate",
+            ]
+
+            alice.close()
+            assert bob.user.me(cache=False).username == "benchmark"
+            with pytest.raises(ValueError):
+                tenants.tenant("bob", auth=md.Auth())
+            tenants.remove("alice")
+            assert "alice" not in tenants and tenants.keys() == ["bob"]
+            # a tenant keyed None doesn't share the public client's turn
+            assert tenants.tenant(None).transport.rate_limiter.tenant is None
+            assert tenants.public.transport.rate_limiter.tenant is not None
+
+    def test_TenantWorkers(self):
+        running, most = {"busy": 0, "quiet": 0}, {"busy": 0, "quiet": 0}
+        lock = threading.Lock()
+
+        def call(tenant, seconds):
+            with lock:
+                running[tenant] += 1
+                most[tenant] = max(most[tenant], running[tenant])
+            time.sleep(seconds)
+            with lock:
+                running[tenant] -= 1
+            return tenant
+
+        with md.MultiTenantClient(rate_limit=None, workers=4, tenant_workers=2) as tenants:
+            busy, quiet = tenants.tenant("busy"), tenants.tenant("quiet")
+            backlog = threading.Thread(
+                target=busy.map_concurrent, args=(lambda _: call("busy", 0.1), range(10))
+            )
+            backlog.start()
+            time.sleep(0.05)
+            start = time.monotonic()
+            results = quiet.map_concurrent(lambda _: call("quiet", 0.01), range(4))
+            # the busy tenant's backlog (0.5s) holds only its half of the threads
+            assert time.monotonic() - start < 0.25
+            backlog.join()
+        assert [r.value for r in results] == ["quiet"] * 4
+        assert most == {"busy": 2, "quiet": 2}